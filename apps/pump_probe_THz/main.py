@@ -68,6 +68,10 @@ ft_stage_name: str = app_config["FourierTransformDelayLine"]
 pp_stage_name: str = app_config["PumpProbeDelayLine"]
 boxcar_name: str = app_config["Boxcar"]
 single_point_sample_size = app_config["SinglePointSampleSize"]
+# order of the delay scans, see labctrl.methods.scan, snake saves the FT stage flying back after every PP delay
+scan_ordering = app_config.get("ScanOrdering", "raster")
+# points the FFT and figures of the scan may lag behind acquisition, 0 processes every point before moving on
+scan_pipeline = app_config.get("ScanPipeline", 0)
 # Create a reference to app_config in lstat so that other modules can access it
 lstat.stat[app_name] = app_config
 
@@ -152,6 +156,8 @@ class THzExperiment:
         }
 
         self.data = THzExpData(lcfg, lstat)
+        # indices of the FT delays scanned since the PP delay stepped
+        self.ft_run = list()
 
         self.start = Button(label="Start THz Pump Probe",
                             button_type='success')
@@ -171,106 +177,122 @@ class THzExperiment:
             # ======== Begin ziUHF only data sampling ========
             lstat.expmsg("[THz][ziUHF Only] Retriving Signal from sensor...")
             self.boxcar.switch_working_mode("Baseline Enabled Boxcar")
-            self.data.original_signal = self.boxcar.get_boxcar_data(
+            original_signal = self.boxcar.get_boxcar_data(
                 single_point_sample_size)
             lstat.expmsg("[THz][ziUHF Only] Retriving Delta from sensor...")
             self.boxcar.switch_working_mode("Baseline Disabled Boxcar")
             delta = self.boxcar.get_boxcar_data(single_point_sample_size)
-            self.data.original_background = self.data.original_signal - delta
             # ======== End ziUHF only data sampling ========
 
-            # aliases for delay stage states
-            pp = lstat.stat[pp_stage_name]
-            ft = lstat.stat[ft_stage_name]
-
-            self.data.time_domain_signal[pp["iDelay"], ft["iDelay"]] = np.average(
-                self.data.original_signal)
-            self.data.time_domain_signal_sum[pp["iDelay"], ft["iDelay"]] += np.average(
-                self.data.original_signal)
-            self.data.time_domain_background[pp["iDelay"], ft["iDelay"]] = np.average(
-                self.data.original_background)
-            self.data.time_domain_background_sum[pp["iDelay"], ft["iDelay"]] += np.average(
-                self.data.original_background)
-            self.data.time_domain_delta[pp["iDelay"], ft["iDelay"]] = np.average(
-                delta)
-            self.data.time_domain_delta_sum[pp["iDelay"], ft["iDelay"]] += np.average(
-                delta)
-
-            # update preview figures after single sampling
-            self.preview.original_signal.update(
-                self.data.original_x, self.data.original_signal, lstat)
-            self.preview.original_background.update(
-                self.data.original_x, self.data.original_background, lstat)
-            self.preview.signal.update(
-                self.data.ft_delays, self.data.time_domain_signal[pp["iDelay"], :], lstat)
-            self.preview.background.update(
-                self.data.ft_delays, self.data.time_domain_background[pp["iDelay"], :], lstat)
-            self.preview.delta.update(
-                self.data.ft_delays, self.data.time_domain_delta[pp["iDelay"], :], lstat)
-
-            # call FFT at real-time for preview. At least 5 points is needed for FFT
-            if ft["iDelay"] > 5:
-                N = ft["iDelay"] + 1
-                T = ft["ScanList"][1] - ft["ScanList"][0]
-                xf = fftfreq(N, T)
-                xf = fftshift(xf)
-                yf_signal = fft(
-                    self.data.time_domain_signal[pp["iDelay"], 0:N])
-                yf_signal = fftshift(yf_signal)
-                yf_signal = yf_signal / N
-                yf_signal_abs = np.abs(yf_signal)
-                yf_signal_phase = np.arctan(
-                    yf_signal.imag/yf_signal.real)
-                yf_background = fft(
-                    self.data.time_domain_background[pp["iDelay"], 0:N])
-                yf_background = fftshift(yf_background)
-                yf_background = yf_background / N
-                yf_background_abs = np.abs(yf_background)
-                yf_background_phase = np.arctan(
-                    yf_background.imag/yf_background.real)
-                yf_delta_od = -np.log10(yf_signal_abs/yf_background_abs)
-                self.preview.ft_signal.update(xf, yf_signal_abs, lstat)
-                self.preview.ft_background.update(xf, yf_background_abs, lstat)
-                self.preview.ft_delta_od.update(xf, yf_delta_od, lstat)
-                # copy fft result to output buffer if end of THz FT scan
-                if ft["iDelay"] + 1 == len(ft["ScanList"]):
-                    self.data.fft_real_signal[pp["iDelay"], :] = np.copy(
-                        yf_signal.real)
-                    self.data.fft_imag_signal[pp["iDelay"], :] = np.copy(
-                        yf_signal.imag)
-                    self.data.fft_abs_signal[pp["iDelay"], :] = np.copy(
-                        yf_signal_abs)
-                    self.data.fft_phase_signal[pp["iDelay"], :] = np.copy(
-                        yf_signal_phase)
-                    self.data.fft_real_background[pp["iDelay"], :] = np.copy(
-                        yf_background.real)
-                    self.data.fft_imag_background[pp["iDelay"], :] = np.copy(
-                        yf_background.imag)
-                    self.data.fft_abs_background[pp["iDelay"], :] = np.copy(
-                        yf_background_abs)
-                    self.data.fft_phase_background[pp["iDelay"], :] = np.copy(
-                        yf_background_phase)
-                    self.data.fft_abs_delta_od = yf_delta_od
-                    self.data.pp_delta_od[pp["iDelay"], :] = np.copy(
-                        yf_delta_od)
-                    # update pump probe preview figure if end of FT scan
-                    self.preview.pump_probe.update(
-                        self.data.pp_delta_od,
-                        self.data.fft_freqs_min, self.data.fft_freqs_max,
-                        self.data.pp_delays_min, self.data.pp_delays_max,
-                        lstat
-                    )
-
-            # if this the end of delay scan, call export
-            if pp["iDelay"] + 1 == len(pp["ScanList"]):
-                lstat.expmsg("End of delay scan round, exporting data...")
-                self.data.export("scandata/" + lcfg.config["basic"]["FileStem"] +
-                                 "-Round{rd}".format(rd=lstat.stat["basic"]["iRound"]))
+            # copies of the delay stage states, the scan moves on to the next point while this one is processed
+            pp = dict(lstat.stat[pp_stage_name])
+            ft = dict(lstat.stat[ft_stage_name])
+            i_round = lstat.stat["basic"]["iRound"]
+
+            def process():
+                self.data.original_signal = original_signal
+                self.data.original_background = original_signal - delta
+
+                self.data.time_domain_signal[pp["iDelay"], ft["iDelay"]] = np.average(
+                    self.data.original_signal)
+                self.data.time_domain_signal_sum[pp["iDelay"], ft["iDelay"]] += np.average(
+                    self.data.original_signal)
+                self.data.time_domain_background[pp["iDelay"], ft["iDelay"]] = np.average(
+                    self.data.original_background)
+                self.data.time_domain_background_sum[pp["iDelay"], ft["iDelay"]] += np.average(
+                    self.data.original_background)
+                self.data.time_domain_delta[pp["iDelay"], ft["iDelay"]] = np.average(
+                    delta)
+                self.data.time_domain_delta_sum[pp["iDelay"], ft["iDelay"]] += np.average(
+                    delta)
+
+                # update preview figures after single sampling
+                self.preview.original_signal.update(
+                    self.data.original_x, self.data.original_signal, lstat)
+                self.preview.original_background.update(
+                    self.data.original_x, self.data.original_background, lstat)
+                self.preview.signal.update(
+                    self.data.ft_delays, self.data.time_domain_signal[pp["iDelay"], :], lstat)
+                self.preview.background.update(
+                    self.data.ft_delays, self.data.time_domain_background[pp["iDelay"], :], lstat)
+                self.preview.delta.update(
+                    self.data.ft_delays, self.data.time_domain_delta[pp["iDelay"], :], lstat)
+
+                # the FT delays scanned in this run, backwards every other run with snake ordering
+                if ft["iStep"] == 0:
+                    self.ft_run = list()
+                self.ft_run.append(ft["iDelay"])
+                ft_start, ft_stop = min(self.ft_run), max(self.ft_run) + 1
+
+                # call FFT at real-time for preview. At least 5 points is needed for FFT
+                if ft["iStep"] > 5 and ft_stop - ft_start == len(self.ft_run):
+                    N = ft_stop - ft_start
+                    T = ft["ScanList"][1] - ft["ScanList"][0]
+                    xf = fftfreq(N, T)
+                    xf = fftshift(xf)
+                    yf_signal = fft(
+                        self.data.time_domain_signal[pp["iDelay"], ft_start:ft_stop])
+                    yf_signal = fftshift(yf_signal)
+                    yf_signal = yf_signal / N
+                    yf_signal_abs = np.abs(yf_signal)
+                    yf_signal_phase = np.arctan(
+                        yf_signal.imag/yf_signal.real)
+                    yf_background = fft(
+                        self.data.time_domain_background[pp["iDelay"], ft_start:ft_stop])
+                    yf_background = fftshift(yf_background)
+                    yf_background = yf_background / N
+                    yf_background_abs = np.abs(yf_background)
+                    yf_background_phase = np.arctan(
+                        yf_background.imag/yf_background.real)
+                    yf_delta_od = -np.log10(yf_signal_abs/yf_background_abs)
+                    self.preview.ft_signal.update(xf, yf_signal_abs, lstat)
+                    self.preview.ft_background.update(xf, yf_background_abs, lstat)
+                    self.preview.ft_delta_od.update(xf, yf_delta_od, lstat)
+                    # copy fft result to output buffer if end of THz FT scan
+                    if ft["LastStep"] and N == len(ft["ScanList"]):
+                        self.data.fft_real_signal[pp["iDelay"], :] = np.copy(
+                            yf_signal.real)
+                        self.data.fft_imag_signal[pp["iDelay"], :] = np.copy(
+                            yf_signal.imag)
+                        self.data.fft_abs_signal[pp["iDelay"], :] = np.copy(
+                            yf_signal_abs)
+                        self.data.fft_phase_signal[pp["iDelay"], :] = np.copy(
+                            yf_signal_phase)
+                        self.data.fft_real_background[pp["iDelay"], :] = np.copy(
+                            yf_background.real)
+                        self.data.fft_imag_background[pp["iDelay"], :] = np.copy(
+                            yf_background.imag)
+                        self.data.fft_abs_background[pp["iDelay"], :] = np.copy(
+                            yf_background_abs)
+                        self.data.fft_phase_background[pp["iDelay"], :] = np.copy(
+                            yf_background_phase)
+                        self.data.fft_abs_delta_od = yf_delta_od
+                        self.data.pp_delta_od[pp["iDelay"], :] = np.copy(
+                            yf_delta_od)
+                        # update pump probe preview figure if end of FT scan
+                        self.preview.pump_probe.update(
+                            self.data.pp_delta_od,
+                            self.data.fft_freqs_min, self.data.fft_freqs_max,
+                            self.data.pp_delays_min, self.data.pp_delays_max,
+                            lstat
+                        )
+
+                # if this the end of delay scan, call export
+                if pp["LastStep"] and ft["LastStep"]:
+                    lstat.expmsg("End of delay scan round, exporting data...")
+                    self.data.export("scandata/" + lcfg.config["basic"]["FileStem"] +
+                                     "-Round{rd}".format(rd=i_round))
+
+            return process
 
         def task():
             lstat.expmsg("Allocating memory for experiment")
             self.data = THzExpData(lcfg, lstat)
-            lstat.expmsg("Starting experiment")
+            unit_operation.ordering = scan_ordering
+            unit_operation.pipeline = scan_pipeline
+            plan = unit_operation.plan()
+            lstat.expmsg("Starting experiment, {} points in {} ordering, {:.0f} s of delay stage travel".format(
+                len(plan), scan_ordering, plan.estimate()))
             meta = dict()
             meta["TERMINATE"] = False
             unit_operation(meta=meta)
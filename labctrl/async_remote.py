@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""async_remote.py:
+This module provides AsyncRemote, an awaitable view of the Remote* component clients, so that calls to different
+devices can run concurrently and the dead time per scan point is that of the slowest device instead of the sum.
+
+    stage = AsyncRemote(RemoteLinearStage(config_stage))
+    boxcar = AsyncRemote(RemoteBoxcarController(config_boxcar))
+    moved, data = await asyncio.gather(stage.moveabs(10.0), boxcar.get_new_data(1000))
+
+Every method of the wrapped client becomes a coroutine function with the same arguments. The blocking call runs in a
+worker thread and goes through the pooled session of RemoteClient, so there is no need for an asynchronous HTTP
+library. Every device has its own single worker thread, so calls to the same device are still executed one at a time
+in the order they are issued, since the servers are written to handle one command after another.
+
+Scan decorators and unit operations run in a plain thread without an event loop, they can use run_concurrently:
+
+    moved, data = run_concurrently(stage.moveabs(10.0), boxcar.get_new_data(1000))
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+
+class AsyncRemote():
+    """Wraps a Remote* client, every method of which is available as a coroutine function."""
+
+    def __init__(self, remote) -> None:
+        self.remote = remote
+        # one worker per device serializes its calls in order, and works across event loops, e.g. run_concurrently
+        # creates a new loop every time.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="AsyncRemote")
+
+    def __getattr__(self, name):
+        attr = getattr(self.remote, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, partial(attr, *args, **kwargs))
+
+        call.__name__ = name
+        call.__doc__ = attr.__doc__
+        return call
+
+
+def run_concurrently(*awaitables) -> list:
+    """Runs awaitables concurrently and returns their results in order, for callers without an event loop.
+    Raises the first exception raised by any of them."""
+    async def gather_all():
+        return await asyncio.gather(*awaitables)
+    return asyncio.run(gather_all())
@@ -10,33 +10,14 @@ __email__ = "x@zzi.io"
 __version__ = "20221103"
 
 
-import requests
-import json
-import base64
 import numpy as np
-from PIL import Image
 
+from labctrl.remote_client import remote_client, RemoteDevice
 
-class RemoteCamera():
-    def __init__(self, config, max_retry=3) -> None:
-        self.host = config["Host"]
-        self.port = config["Port"]
-        self.max_retry = max_retry
-        self.api_url = 'http://{host}:{port}/'.format(
-            host=self.host, port=self.port)
 
+class RemoteCamera(RemoteDevice):
     def apicall(self, command):
-        for i in range(self.max_retry):
-            try:
-                apicall = self.api_url + command
-                response = requests.get(apicall)
-                rc = response.content.decode()
-                return json.loads(rc)
-            except requests.exceptions.ConnectionError as err:
-                print(err)
-        print("Error: Cannot connect to remote, exceeded max retry {mr}".format(
-            mr=self.max_retry))
-        raise requests.exceptions.ConnectionError
+        return remote_client.get_json(self.api_url + command, max_retry=self.max_retry)
 
     def online(self):
         """Tests if the remote server is online.
@@ -58,14 +39,17 @@ class RemoteCamera():
             raise ValueError(
                 "Unsupported working mode under current API {}".format(working_mode))
 
+    def get_arrays(self, command, arrays):
+        return remote_client.get_arrays(self.api_url + command, arrays, max_retry=self.max_retry)
+
     def get_image(self):
         """Triggers the remote camera once, and retrive the new image
+        as a read-only (height, width, 3) uint8 RGB array.
         """
-        r = self.apicall('trigAndGetBuffer')
+        r = self.get_arrays('trigAndGetBuffer', {"buffer": np.uint8})
         # print(r["message"])
-        buffer = base64.b64decode(r["buffer"])
-        image = Image.frombuffer("RGB", (r["width"], r["height"]), buffer)
-        image = np.array(image)
+        height, width = r["height"], r["width"]
+        image = r["buffer"][:height * width * 3].reshape(height, width, 3)
         return image
 
 # camera = RemoteCamera({"Host":"127.0.0.1", "Port":5058})
@@ -18,12 +18,13 @@ from bokeh.models.widgets import Button, FileInput, RadioButtonGroup, TextInput
 
 from labctrl.labconfig import LabConfig
 from labctrl.labstat import LabStat
+from labctrl.methods.scan import Axis, nest
 
 from .abstract import (AbstractBundleFilterWheelController,
                        AbstractBundleSingleFilterWheelAxis,
                        AbstractBundleSixSlots)
 from .remote import RemoteHandlerThreeAxes
-from .utils import eval_float, ignore_connection_error, eval_int, calculate_dx
+from .utils import eval_float, ignore_connection_error, eval_int, calculate_dx, calculate_rate
 
 
 class BundleBokehSixSlots(AbstractBundleSixSlots):
@@ -442,30 +443,31 @@ class BundleBokehSingleFilterWheelAxis(AbstractBundleSingleFilterWheelAxis):
                 meta[name]["Delay"] : str or float, current position
                 meta[name]["iDelay"]: int, index of current position
             """
-            def iterate(meta=dict()):
+            def coordinate(pos):
+                return config["ZeroPointAbsolutePosition"] + calculate_dx(
+                    pos, config["WorkingUnit"], config["Multiples"], config["WorkingDirection"])
+
+            def move(pos):
+                self.lstat.expmsg(
+                    "[{name}][scan_range] Setting position to {pos} {unit}".format(name=name, pos=pos, unit=config["WorkingUnit"]))
+                target_abs_pos = coordinate(pos)
+                response = self.remote_handler.axis_moveabs(
+                    name, target_abs_pos)
+                self.lstat.fmtmsg(response)
+
+            def axis():
                 if config["ScanMode"] == "Range" or config["ScanMode"] == "ExternalFile":
-                    for i, pos in enumerate(self.lstat.stat[name]["ScanList"]):
-                        if meta["TERMINATE"]:
-                            self.lstat.expmsg(
-                                "[{name}][scan_range] Received signal TERMINATE, trying graceful Thread exit".format(name=name))
-                            break
-                        self.lstat.expmsg(
-                            "[{name}][scan_range] Setting position to {pos} {unit}".format(name=name, pos=pos, unit=config["WorkingUnit"]))
-                        target_abs_pos = config["ZeroPointAbsolutePosition"] + calculate_dx(
-                            pos, config["WorkingUnit"], config["Multiples"], config["WorkingDirection"])
-                        response = self.remote_handler.axis_moveabs(
-                            name, target_abs_pos)
-                        self.lstat.fmtmsg(response)
-                        self.lstat.stat[name]["Delay"] = pos
-                        self.lstat.stat[name]["iDelay"] = i
-                        func(meta=meta)
-                else:
-                    self.lstat.expmsg(
-                        "[{name}][scan_range] Range is set manually, so no action has been taken".format(name=name))
-                    self.lstat.stat[name]["Delay"] = "ManualDelay"
-                    self.lstat.stat[name]["iDelay"] = 0
-                    func(meta=meta)
-            return iterate
+                    # Axis takes speed and acceleration in the unit of coordinate, PositionUnit per s and s^2
+                    speed = calculate_rate(config["DrivingSpeed"], config["DrivingSpeedUnit"], config["PositionUnit"])
+                    acceleration = calculate_rate(config["DrivingAcceleration"], config["DrivingAccelerationUnit"],
+                                                  config["PositionUnit"])
+                    return Axis(name, self.lstat.stat[name]["ScanList"], move=move, coordinate=coordinate,
+                                speed=speed, acceleration=acceleration)
+                self.lstat.expmsg(
+                    "[{name}][scan_range] Range is set manually, so no action has been taken".format(name=name))
+                return Axis(name, ["ManualDelay"])
+
+            return nest(axis, func, self.lstat)
 
         self.scan_range = scan_range
 
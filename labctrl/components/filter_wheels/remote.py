@@ -10,28 +10,11 @@ __email__ = "x@zzi.io"
 __version__ = "20221109"
 
 
-import requests
-import json
-
-class RemoteMultiaxisStage():
-    def __init__(self, config:dict, max_retry=3) -> None:
-        self.host = config["Host"]
-        self.port = config["Port"]
-        self.max_retry = max_retry
-        self.api_url = 'http://{host}:{port}/'.format(host=self.host, port=self.port)
+from labctrl.remote_client import remote_client, RemoteDevice
 
+class RemoteMultiaxisStage(RemoteDevice):
     def apicall(self, command:str):
-        for i in range(self.max_retry):
-            try:
-                apicall = self.api_url + command
-                response = requests.get(apicall)
-                rc = response.content.decode()
-                return json.loads(rc)
-            except requests.exceptions.ConnectionError as err:
-                print(err)
-        print("Error: Cannot connect to remote stage, exceeded max retry {mr}".format(
-            mr=self.max_retry))
-        raise requests.exceptions.ConnectionError
+        return remote_client.get_json(self.api_url + command, max_retry=self.max_retry)
 
     def online(self):
         """Tests if the remote stage server is online.
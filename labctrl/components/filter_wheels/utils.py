@@ -111,6 +111,16 @@ def calculate_dx(value: float, unit: str, multiples: float, direction: str):
     return dx
 
 
+def calculate_rate(value: float, unit: str, position_unit: str) -> float:
+    """
+    converts a speed or acceleration, e.g. in degree/s or degree/s^2, to
+    position_unit per s or per s^2, the unit the positions of the wheel are in
+    """
+    # coefficient: degree per unit
+    c = {"second": 1 / 3600, "minute": 1 / 60, "degree": 1.0, "radian": 180 / np.pi}
+    return value * c[unit.split('/')[0]] / c[position_unit]
+
+
 def ignore_connection_error(func):
     def ret():
         try:
@@ -10,32 +10,14 @@ __email__ = "x@zzi.io"
 __version__ = "20221227"
 
 
-import requests
-import json
-import base64
 import numpy as np
 
+from labctrl.remote_client import remote_client, RemoteDevice
 
-class RemoteSensor():
-    def __init__(self, config, max_retry=3) -> None:
-        self.host = config["Host"]
-        self.port = config["Port"]
-        self.max_retry = max_retry
-        self.api_url = 'http://{host}:{port}/'.format(
-            host=self.host, port=self.port)
 
+class RemoteSensor(RemoteDevice):
     def apicall(self, command):
-        for i in range(self.max_retry):
-            try:
-                apicall = self.api_url + command
-                response = requests.get(apicall)
-                rc = response.content.decode()
-                return json.loads(rc)
-            except requests.exceptions.ConnectionError as err:
-                print(err)
-        print("Error: Cannot connect to remote, exceeded max retry {mr}".format(
-            mr=self.max_retry))
-        raise requests.exceptions.ConnectionError
+        return remote_client.get_json(self.api_url + command, max_retry=self.max_retry)
 
     def online(self):
         """Tests if the remote stage server is online.
@@ -48,7 +30,4 @@ class RemoteSensor():
         return response
 
     def set_sensor_config(self, config: dict):
-        config = json.dumps(config)
-        config = base64.urlsafe_b64encode(config).decode()
-        result = self.apicall('setSensorConfig/{}'.format(config))
-        return result
+        return remote_client.post_json(self.api_url + 'setSensorConfig', config, max_retry=self.max_retry)
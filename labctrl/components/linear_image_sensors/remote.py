@@ -10,37 +10,22 @@ __email__ = "x@zzi.io"
 __version__ = "20220525"
 
 
-import requests
-import json
-import base64
 import numpy as np
 
-class RemoteLinearImageSensor():
-    def __init__(self, config, max_retry=3) -> None:
-        self.host = config["Host"]
-        self.port = config["Port"]
-        self.max_retry = max_retry
-        self.api_url = 'http://{host}:{port}/'.format(host=self.host, port=self.port)
+from labctrl.remote_client import remote_client, RemoteDevice
 
+class RemoteLinearImageSensor(RemoteDevice):
     def apicall(self, command):
-        for i in range(self.max_retry):
-            try:
-                apicall = self.api_url + command
-                response = requests.get(apicall)
-                rc = response.content.decode()
-                return json.loads(rc)
-            except requests.exceptions.ConnectionError as err:
-                print(err)
-        print("Error: Cannot connect to remote, exceeded max retry {mr}".format(
-            mr=self.max_retry))
-        raise requests.exceptions.ConnectionError
+        return remote_client.get_json(self.api_url + command, max_retry=self.max_retry)
 
     def online(self):
         """Tests if the remote stage server is online.
         Does not test if the remote server actually works, however."""
         return self.apicall('')
 
+    def get_arrays(self, command, arrays):
+        return remote_client.get_arrays(self.api_url + command, arrays, max_retry=self.max_retry)
+
     def get_image(self):
-        image = self.apicall('getImage')
-        image = np.frombuffer(base64.b64decode(image["image"]), dtype=np.float64)
-        return image
\ No newline at end of file
+        image = self.get_arrays('getImage', {"image": np.float64})
+        return image["image"]
\ No newline at end of file
@@ -10,28 +10,11 @@ __email__ = "x@zzi.io"
 __version__ = "20211110"
 
 
-import requests
-import json
-
-class RemoteLinearStage():
-    def __init__(self, config, max_retry=3) -> None:
-        self.host = config["Host"]
-        self.port = config["Port"]
-        self.max_retry = max_retry
-        self.api_url = 'http://{host}:{port}/'.format(host=self.host, port=self.port)
+from labctrl.remote_client import remote_client, RemoteDevice
 
+class RemoteLinearStage(RemoteDevice):
     def apicall(self, command):
-        for i in range(self.max_retry):
-            try:
-                apicall = self.api_url + command
-                response = requests.get(apicall)
-                rc = response.content.decode()
-                return json.loads(rc)
-            except requests.exceptions.ConnectionError as err:
-                print(err)
-        print("Error: Cannot connect to remote stage, exceeded max retry {mr}".format(
-            mr=self.max_retry))
-        raise requests.exceptions.ConnectionError
+        return remote_client.get_json(self.api_url + command, max_retry=self.max_retry)
 
     def online(self):
         """Tests if the remote stage server is online.
@@ -41,6 +24,14 @@ class RemoteLinearStage():
     def moveabs(self, pos):
         return self.apicall('moveabs/{:.6f}'.format(pos))
 
+    def move_async(self, pos):
+        """Starts moving to pos and returns at once, call .wait() on the returned RemoteJob for the result."""
+        return remote_client.submit(self.api_url, 'moveabs/{:.6f}'.format(pos), max_retry=self.max_retry)
+
+    def cancel_jobs(self):
+        """Cancels all queued moves and asks the running one to stop."""
+        return self.apicall('jobs/cancel')
+
     def set_speed(self, speed):
         pass
         # return self.apicall('setSpeed/{:.6f}'.format(speed))
@@ -109,6 +109,16 @@ def calculate_dx(dt: float, unit: str, multiples: float, direction: str) -> floa
     return dx
 
 
+def calculate_rate(value: float, unit: str, position_unit: str) -> float:
+    """
+    converts a speed or acceleration, e.g. in um/s or um/s^2, to position_unit
+    per s or per s^2, the unit the positions of the stage are in
+    """
+    # coefficient: mm per unit
+    c = {"nm": 1e-6, "um": 1e-3, "mm": 1.0}
+    return value * c[unit.split('/')[0]] / c[position_unit]
+
+
 def ignore_connection_error(func):
     def ret():
         try:
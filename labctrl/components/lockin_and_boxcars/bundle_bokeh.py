@@ -198,19 +198,19 @@ class BundleBokehBoxcar(AbstractBundleBoxcar):
         # region submit_config
         @ignore_connection_error
         def __callback_submit_config():
-            response = self.remote.set_delay_background_sampling(
-                config["DelayBackgroundSampling"])
-            lstat.fmtmsg(response)
-            response = self.remote.set_delay_integrate(
-                config["DelayIntegrate"])
-            lstat.fmtmsg(response)
-            response = self.remote.set_delay_hold(config["DelayHold"])
-            lstat.fmtmsg(response)
-            response = self.remote.set_delay_signal_sampling(
-                config["DelaySignalSampling"])
-            lstat.fmtmsg(response)
-            response = self.remote.set_delay_reset(config["DelayReset"])
-            lstat.fmtmsg(response)
+            # all delays are sent to the server in one request
+            with self.remote.batch():
+                responses = [
+                    self.remote.set_delay_background_sampling(
+                        config["DelayBackgroundSampling"]),
+                    self.remote.set_delay_integrate(config["DelayIntegrate"]),
+                    self.remote.set_delay_hold(config["DelayHold"]),
+                    self.remote.set_delay_signal_sampling(
+                        config["DelaySignalSampling"]),
+                    self.remote.set_delay_reset(config["DelayReset"]),
+                ]
+            for response in responses:
+                lstat.fmtmsg(response.result())
 
         self.submit_config.on_click(__callback_submit_config)
         # endregion submit_config
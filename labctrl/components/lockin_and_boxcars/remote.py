@@ -10,49 +10,34 @@ __email__ = "x@zzi.io"
 __version__ = "20220624"
 
 
-import requests
-import json
-import base64
 import numpy as np
 
+from labctrl.remote_client import remote_client, RemoteDevice
 
-class RemoteBoxcarController():
-    def __init__(self, config, max_retry=3) -> None:
-        self.host = config["Host"]
-        self.port = config["Port"]
-        self.max_retry = max_retry
-        self.api_url = 'http://{host}:{port}/'.format(
-            host=self.host, port=self.port)
 
+class RemoteBoxcarController(RemoteDevice):
     def apicall(self, command):
-        for i in range(self.max_retry):
-            try:
-                apicall = self.api_url + command
-                response = requests.get(apicall)
-                rc = response.content.decode()
-                return json.loads(rc)
-            except requests.exceptions.ConnectionError as err:
-                print(err)
-        print("Error: Cannot connect to remote, exceeded max retry {mr}".format(
-            mr=self.max_retry))
-        raise requests.exceptions.ConnectionError
+        return remote_client.get_json(self.api_url + command, max_retry=self.max_retry)
 
     def online(self):
         """Tests if the remote stage server is online.
         Does not test if the remote server actually works, however."""
         return self.apicall('')
 
+    def batch(self):
+        """Within `with remote.batch():` calls return Futures and are sent in one request when the block exits."""
+        return remote_client.batch(self.api_url, max_retry=self.max_retry)
+
+    def get_arrays(self, command, arrays):
+        return remote_client.get_arrays(self.api_url + command, arrays, max_retry=self.max_retry)
+
     def get_new_data(self, n_samples: int):
-        boxcar_data = self.apicall('getNewData/{}'.format(n_samples))
-        boxcar_data = np.frombuffer(base64.b64decode(
-            boxcar_data["result"]), dtype=np.float64)
-        return boxcar_data
+        boxcar_data = self.get_arrays('getNewData/{}'.format(n_samples), {"result": np.float64})
+        return boxcar_data["result"]
 
     def get_PWA_data(self):
-        PWA_data = self.apicall('getPWAData')
-        PWA_data = np.frombuffer(base64.b64decode(
-            PWA_data["result"]), dtype=np.float64)
-        return PWA_data
+        PWA_data = self.get_arrays('getPWAData', {"result": np.float64})
+        return PWA_data["result"]
 
     def set_delay_background_sampling(self, delay: float):
         return self.apicall('setDelayBackgroundSampling/{delay:.6f}'.format(delay=delay))
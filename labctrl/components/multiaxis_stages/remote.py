@@ -10,39 +10,31 @@ __email__ = "x@zzi.io"
 __version__ = "20221109"
 
 
-import requests
-import json
-
-class RemoteMultiaxisStage():
-    def __init__(self, config:dict, max_retry=3) -> None:
-        self.host = config["Host"]
-        self.port = config["Port"]
-        self.max_retry = max_retry
-        self.api_url = 'http://{host}:{port}/'.format(host=self.host, port=self.port)
+from labctrl.remote_client import remote_client, RemoteDevice
 
+class RemoteMultiaxisStage(RemoteDevice):
     def apicall(self, command:str):
-        for i in range(self.max_retry):
-            try:
-                apicall = self.api_url + command
-                response = requests.get(apicall)
-                rc = response.content.decode()
-                return json.loads(rc)
-            except requests.exceptions.ConnectionError as err:
-                print(err)
-        print("Error: Cannot connect to remote stage, exceeded max retry {mr}".format(
-            mr=self.max_retry))
-        raise requests.exceptions.ConnectionError
+        return remote_client.get_json(self.api_url + command, max_retry=self.max_retry)
 
     def online(self):
         """Tests if the remote stage server is online.
         Does not test if the remote server actually works, however."""
         return self.apicall('')
 
+    def cancel_jobs(self):
+        """Cancels all queued moves and asks the running one to stop."""
+        return self.apicall('jobs/cancel')
+
 
 class RemoteThreeAxesStage(RemoteMultiaxisStage):
     def moveabs(self, x, y, z):
         return self.apicall('moveabs/{x:.3f},{y:.3f},{z:.3f}'.format(x=x, y=y, z=z))
 
+    def move_async(self, x, y, z):
+        """Starts moving to x, y, z and returns at once, call .wait() on the returned RemoteJob for the result."""
+        return remote_client.submit(self.api_url, 'moveabs/{x:.3f},{y:.3f},{z:.3f}'.format(x=x, y=y, z=z),
+                                    max_retry=self.max_retry)
+
 
 
 # class RemoteTwoAxesStage(RemoteMultiaxisStage):
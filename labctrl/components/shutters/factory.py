@@ -15,6 +15,8 @@ from functools import wraps
 from bokeh.models.widgets import RadioButtonGroup, Button, Div
 from bokeh.layouts import column
 
+from labctrl.methods.scan import Axis, nest
+
 from .remote import RemoteShutter
 from .utils import ignore_connection_error
 
@@ -92,31 +94,28 @@ class FactoryShutter:
             shutter open and closed. If do not use shutter background, then
             just leave the shutter status as is.
             """
-            def iterate(meta=dict()):
-                if controller_name not in lstat.stat:
-                    lstat.stat[controller_name] = dict()
-                if scfg["UseShutterBackground"]:
+            def move(state):
+                if state == "ShutterOff":
                     lstat.expmsg("Background is required, turning OFF shutter")
                     response = remote.shutter_off(shutter_name)
-                    lstat.fmtmsg(response)
-                    lstat.stat[controller_name][shutter_name] = "ShutterOff"
-                    func(meta=meta)
+                else:
                     lstat.expmsg("Background is taken, turning ON shutter")
                     response = remote.shutter_on(shutter_name)
-                    lstat.fmtmsg(response)
-                    lstat.stat[controller_name][shutter_name] = "ShutterOn"
-                    func(meta=meta)
-                else:
-                    # this is wrong, because the shutter can be manually closed
-                    #  and we did not varify that before this assertion.
-                    # But this is fine because if the shutter is closed manually,
-                    #  then it is intentional for optical component tweaking.
-                    # The main task will always make sure that shutter is open
-                    #  before the experiment begins.
-                    lstat.stat[controller_name][shutter_name] = "ShutterManual"
-                    func(meta=meta)
-
-            return iterate
+                lstat.fmtmsg(response)
+
+            def axis():
+                if scfg["UseShutterBackground"]:
+                    return Axis(controller_name, ["ShutterOff", "ShutterOn"], move=move,
+                                value_key=shutter_name, index_key=None, ordering="raster")
+                # this is wrong, because the shutter can be manually closed
+                #  and we did not varify that before this assertion.
+                # But this is fine because if the shutter is closed manually,
+                #  then it is intentional for optical component tweaking.
+                # The main task will always make sure that shutter is open
+                #  before the experiment begins.
+                return Axis(controller_name, ["ShutterManual"], value_key=shutter_name, index_key=None)
+
+            return nest(axis, func, lstat)
 
         bundle.take_background = take_background
         return bundle
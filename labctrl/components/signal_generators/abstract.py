@@ -66,6 +66,13 @@ class AbstractBundleSignalGenerator(ABC):
     working_mode:                       Union[GenericRadioButtonGroup,
                                               BokehRadioButtonGroup]
     change_working_mode:                Union[GenericButton, BokehButton]
+    gain:                               Union[GenericRadioButtonGroup,
+                                              BokehRadioButtonGroup]
+    input_type:                         Union[GenericRadioButtonGroup,
+                                              BokehRadioButtonGroup]
+    timeout:                            Union[GenericRadioButtonGroup,
+                                              BokehRadioButtonGroup]
+    submit_config:                      Union[GenericButton, BokehButton]
     waveform_file:                      Union[GenericFileInput, BokehFileInput]
 
     # Interactive Elements
@@ -41,6 +41,14 @@ class BundleBokehSignalGenerator(AbstractBundleSignalGenerator):
             active=(config["WorkingModes"].index(config["WorkingMode"]))
         )
         self.change_working_mode = Button(label="Change Working Mode")
+        self.gain = RadioButtonGroup(
+            labels=config["Gains"], active=(config["Gains"].index(config["Gain"])))
+        self.input_type = RadioButtonGroup(
+            labels=config["InputTypes"], active=(config["InputTypes"].index(config["InputType"])))
+        self.timeout = RadioButtonGroup(
+            labels=config["Timeouts"], active=(config["Timeouts"].index(config["Timeout"])))
+        self.submit_config = Button(
+            label="Submit Config to Signal Generator", button_type="warning")
 
         self.test_online = Button(label="Test Signal Generator Online")
         self.waveform_file = FileInput(accept=".txt")
@@ -95,6 +103,46 @@ class BundleBokehSignalGenerator(AbstractBundleSignalGenerator):
         self.change_working_mode.on_click(__callback_change_working_mode)
         # endregion change_working_mode
 
+        # region gain
+        @update_config
+        def __callback_gain(attr, old, new):
+            config["Gain"] = config["Gains"][int(self.gain.active)]
+
+        self.gain.on_change('active', __callback_gain)
+        # endregion gain
+
+        # region input_type
+        @update_config
+        def __callback_input_type(attr, old, new):
+            config["InputType"] = config["InputTypes"][int(self.input_type.active)]
+
+        self.input_type.on_change('active', __callback_input_type)
+        # endregion input_type
+
+        # region timeout
+        @update_config
+        def __callback_timeout(attr, old, new):
+            config["Timeout"] = config["Timeouts"][int(self.timeout.active)]
+
+        self.timeout.on_change('active', __callback_timeout)
+        # endregion timeout
+
+        # region submit_config
+        @ignore_connection_error
+        def __callback_submit_config():
+            # gain, input type and timeout are sent to the server in one request
+            with self.remote.batch():
+                responses = [
+                    self.remote.set_gain(config["Gain"]),
+                    self.remote.set_input_type(config["InputType"]),
+                    self.remote.set_timeout(config["Timeout"]),
+                ]
+            for response in responses:
+                self.lstat.fmtmsg(response.result())
+
+        self.submit_config.on_click(__callback_submit_config)
+        # endregion submit_config
+
         # region test_online
         def __callback_test_online():
             try:
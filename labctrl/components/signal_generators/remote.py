@@ -10,44 +10,50 @@ __email__ = "x@zzi.io"
 __version__ = "20221208"
 
 
-import requests
 import json
-import base64
+
 import numpy as np
-from PIL import Image
+import requests
 
+from labctrl.remote_client import remote_client, RemoteDevice
 
-class RemoteSignalGenerator():
-    def __init__(self, config, max_retry=3) -> None:
-        self.host = config["Host"]
-        self.port = config["Port"]
-        self.max_retry = max_retry
-        self.api_url = 'http://{host}:{port}/'.format(
-            host=self.host, port=self.port)
 
+class RemoteSignalGenerator(RemoteDevice):
     def apicall(self, command):
-        for i in range(self.max_retry):
-            try:
-                apicall = self.api_url + command
-                response = requests.get(apicall)
-                rc = response.content.decode()
-                return json.loads(rc)
-            except requests.exceptions.ConnectionError as err:
-                print(err)
-        print("Error: Cannot connect to remote, exceeded max retry {mr}".format(
-            mr=self.max_retry))
-        raise requests.exceptions.ConnectionError
+        return remote_client.get_json(self.api_url + command, max_retry=self.max_retry)
 
     def online(self):
         """Tests if the remote server is online.
         Does not test if the remote server actually works, however."""
         return self.apicall('')
 
+    def batch(self):
+        """Within `with remote.batch():` calls return Futures and are sent in one request when the block exits."""
+        return remote_client.batch(self.api_url, max_retry=self.max_retry)
+
+    def set_gain(self, gain_option: str):
+        return self.apicall('setGain/{}'.format(gain_option))
+
+    def set_input_type(self, input_type: str):
+        return self.apicall('setInputType/{}'.format(input_type))
+
+    def set_timeout(self, timeout_option: str):
+        return self.apicall('setTimeout/{}'.format(timeout_option))
+
     def update_waveform(self, waveform: list[int]):
-        post = dict()
-        post["waveform"] = waveform
-        post_json = json.dumps(post)
-        return self.apicall('updateWaveform/{}'.format(post_json))
+        """Uploads waveform, uint8 samples, as bytes in the request body. Nothing is sent if the device already holds
+        the same waveform. Servers without uploads get it JSON-encoded in the URL path as before."""
+        samples = np.asarray(waveform)
+        if samples.size and (samples.min() < 0 or samples.max() > 255):
+            raise ValueError("Waveform samples must be within 0 - 255")
+        try:
+            return remote_client.upload(self.api_url + 'waveform', samples.astype(np.uint8).tobytes(),
+                                        max_retry=self.max_retry)
+        except requests.exceptions.HTTPError:
+            post = dict()
+            post["waveform"] = [int(v) for v in samples]
+            post_json = json.dumps(post)
+            return self.apicall('updateWaveform/{}'.format(post_json))
 
     def set_working_mode(self, working_mode):
         """
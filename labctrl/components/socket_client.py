@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""socket_client.py:
+This module provides SocketClient, the client of the socket API of device servers (see socket_channel.py next to the
+servers that support it). One TCP connection is kept open to the server, over which it pushes data streams as soon
+as new data is available, and commands are sent with their completion reported as an event, without the latency of
+polling the REST API.
+
+    client = SocketClient({"Host": "127.0.0.1", "Port": 5055})
+    client.subscribe("boxcar_data", callback=lambda result: print(result["result"]))
+    client.command("setWorkingMode/Boxcar")
+
+Subscriptions either call a callback from the reader thread with every new message, or keep the latest queue_size
+messages to be consumed with receive. Messages missed because the client or the server fell behind are counted in
+missed[topic].
+Arrays are decoded with np.frombuffer straight from the received bytes, like RemoteClient.get_arrays, so they are
+read-only.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import json
+import socket
+from collections import deque
+from concurrent.futures import Future
+from threading import Thread, Lock, Condition
+from typing import Callable
+
+from labctrl.remote_client import remote_client, arrays_nbytes, decode_arrays
+
+
+class Subscription():
+    def __init__(self, callback: Callable[[dict], None] | None, queue_size: int) -> None:
+        self.callback = callback
+        self.messages = deque(maxlen=queue_size)
+        self.cond = Condition()
+
+
+class SocketClient():
+    def __init__(self, config, max_retry=3, queue_size=16) -> None:
+        self.host = config["Host"]
+        self.port = config["Port"]
+        self.queue_size = queue_size
+        self.api_url = 'http://{host}:{port}/'.format(host=self.host, port=self.port)
+        info = remote_client.get_json(self.api_url + 'socket', max_retry=max_retry)
+        self.socket_port = info["port"]
+        self.topics = info["topics"]
+        self.sock = socket.create_connection((self.host, self.socket_port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rfile = self.sock.makefile('rb')
+        self.send_lock = Lock()
+        self.lock = Lock()
+        self.subscriptions: dict[str, Subscription] = dict()
+        self.last_seq: dict[str, int] = dict()
+        self.missed: dict[str, int] = dict()
+        # command id -> Future of its result
+        self.pending: dict[int, Future] = dict()
+        self.next_id = 0
+        self.running = True
+        self.reader_thread = Thread(target=self.reader_task, daemon=True)
+        self.reader_thread.start()
+
+    def send(self, request: dict):
+        with self.send_lock:
+            self.sock.sendall(json.dumps(request).encode() + b'\n')
+
+    def subscribe(self, topic: str, callback: Callable[[dict], None] | None = None):
+        """Subscribes to topic. callback is called from the reader thread with every new message, if it is None
+        messages are kept to be consumed with receive."""
+        if topic not in self.topics:
+            raise ValueError("Unknown topic {}, the server publishes {}".format(topic, self.topics))
+        with self.lock:
+            self.subscriptions[topic] = Subscription(callback, self.queue_size)
+            self.missed[topic] = 0
+        self.send({"op": "subscribe", "topic": topic})
+
+    def unsubscribe(self, topic: str):
+        self.send({"op": "unsubscribe", "topic": topic})
+        with self.lock:
+            self.subscriptions.pop(topic, None)
+
+    def receive(self, topic: str, timeout: float | None = None) -> dict | None:
+        """Returns the oldest kept message of topic, or None if timeout."""
+        subscription = self.subscriptions[topic]
+        with subscription.cond:
+            if not subscription.cond.wait_for(lambda: subscription.messages or not self.running, timeout):
+                return None
+            if not subscription.messages:
+                return None
+            return subscription.messages.popleft()
+
+    def command_async(self, command: str) -> Future:
+        """Sends command, a path of the REST API. The Future is done with the result when the server has executed
+        it."""
+        future = Future()
+        with self.lock:
+            if not self.running:
+                raise ConnectionError("Socket to {}:{} is closed".format(self.host, self.socket_port))
+            self.next_id += 1
+            command_id = self.next_id
+            self.pending[command_id] = future
+        self.send({"op": "command", "id": command_id, "command": command})
+        return future
+
+    def command(self, command: str, timeout: float | None = None) -> dict:
+        """Sends command and waits until it is executed, returns its result."""
+        return self.command_async(command).result(timeout)
+
+    def close(self):
+        self.running = False
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self.reader_thread.join()
+
+    def reader_task(self):
+        try:
+            while self.running:
+                line = self.rfile.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                result = message.get("result", dict())
+                if "arrays" in message:
+                    specs = message["arrays"]
+                    body = self.rfile.read(arrays_nbytes(specs))
+                    result.update(decode_arrays(specs, body))
+                event = message.get("event")
+                if event == "data":
+                    self.dispatch(message["topic"], message["seq"], result)
+                elif event == "done":
+                    with self.lock:
+                        future = self.pending.pop(message["id"], None)
+                    if future is not None:
+                        future.set_result(result)
+                elif event == "error":
+                    print("Error from socket API of {}: {}".format(self.api_url, message["message"]))
+        except (OSError, ValueError) as e:
+            if self.running:
+                print("Socket to {}:{} lost: {}".format(self.host, self.socket_port, e))
+        finally:
+            self.running = False
+            with self.lock:
+                pending, self.pending = self.pending, dict()
+                subscriptions = list(self.subscriptions.values())
+            for future in pending.values():
+                future.set_exception(ConnectionError("Socket to {}:{} is closed".format(
+                    self.host, self.socket_port)))
+            for subscription in subscriptions:
+                with subscription.cond:
+                    subscription.cond.notify_all()
+
+    def dispatch(self, topic: str, seq: int, result: dict):
+        with self.lock:
+            subscription = self.subscriptions.get(topic)
+            if subscription is None:
+                return
+            last_seq = self.last_seq.get(topic)
+            if last_seq is not None and seq > last_seq + 1:
+                self.missed[topic] += seq - last_seq - 1
+            self.last_seq[topic] = seq
+        if subscription.callback is not None:
+            subscription.callback(result)
+            return
+        with subscription.cond:
+            if len(subscription.messages) == subscription.messages.maxlen:
+                self.missed[topic] += 1
+            subscription.messages.append(result)
+            subscription.cond.notify()
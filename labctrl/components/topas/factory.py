@@ -15,6 +15,8 @@ from datetime import datetime
 from bokeh.models.widgets import RadioButtonGroup, Button, TextInput, FileInput, Div
 from bokeh.layouts import column, row
 
+from labctrl.methods.scan import Axis, nest
+
 from .remote import ProxiedTOPAS
 from .utils import ignore_connection_error, eval_float
 
@@ -225,26 +227,20 @@ class FactoryTOPAS:
 
         def scan_topas(func, meta=''):
             """decorator, when applied to fun, scan topas wavelength for func"""
-            def iterate(meta=dict()):
+            def move(target):
+                lstat.expmsg("Setting wavelength to {target} {unit}".format(target=target, unit=config["Unit"]))
+                response = set_wavelength(target)
+                lstat.fmtmsg(response)
+
+            def axis():
                 if config["Mode"] == "Range" or config["Mode"] == "ExternalFile":
-                    for i, target in enumerate(lstat.stat[name]["ScanList"]):
-                        if meta["TERMINATE"]:
-                            lstat.expmsg(
-                                "scan_topas received signal TERMINATE, trying graceful Thread exit")
-                            break
-                        lstat.expmsg("Setting wavelength to {target} {unit}".format(target=target, unit=config["Unit"]))
-                        response = set_wavelength(target)
-                        lstat.fmtmsg(response)
-                        lstat.stat[name]["Wavelength"] = target
-                        lstat.stat[name]["iWavelength"] = i
-                        func(meta=meta)
-                else:
-                    lstat.expmsg(
-                        "Topas wavelength is set manually, so no action has been taken")
-                    lstat.stat[name]["Wavelength"] = "ManualWavelength"
-                    lstat.stat[name]["iWavelength"] = 0
-                    func(meta=meta)
-            return iterate
+                    return Axis(name, lstat.stat[name]["ScanList"], move=move,
+                                value_key="Wavelength", index_key="iWavelength")
+                lstat.expmsg(
+                    "Topas wavelength is set manually, so no action has been taken")
+                return Axis(name, ["ManualWavelength"], value_key="Wavelength", index_key="iWavelength")
+
+            return nest(axis, func, lstat)
 
         bundle.scan_topas = scan_topas
 
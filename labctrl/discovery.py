@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+
+"""discovery.py:
+This module provides the singleton class DeviceRegistry, which finds device servers on the local network by the
+names of the devices, so that hosts and ports do not have to be pinned down in configs. Servers announce themselves
+with servers/*/discovery.py, see the protocol there.
+
+One query is sent for all devices and the replies are collected in a single window of timeout seconds, instead of
+one blocking search per device. Found endpoints are kept in discovered_devices.json, so the next start of the app
+uses them at once without waiting for the network, while the registry refreshes them in the background:
+
+    registry = DeviceRegistry()                 # loads discovered_devices.json
+    registry.attach(lcfg.config)
+
+Only the first start, without a cache, waits for the servers, at most a few seconds. Refreshes rewrite Host and Port
+of the configs in place, and the remotes read them on every call, see RemoteDevice in remote_client.py, so they
+follow a server that moved without being made again.
+
+Devices that are not found keep the Host and Port of their configs. The Host and Port found are only meant for the
+running app: configured returns the config with the Host and Port they replaced, to be saved instead.
+
+The registry is only made when discovery is used, see the end of labconfig.py.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import json
+import os
+import socket
+import struct
+import time
+from threading import Thread, Lock, Event
+from typing import Callable
+
+from .singleton import Singleton
+
+DISCOVERY_GROUP = '239.0.0.182'
+DISCOVERY_PORT = 7416
+# works as loopback broadcast for reused sockets
+LOOPBACK_BROADCAST = '127.255.255.255'
+
+
+class DeviceRegistry(metaclass=Singleton):
+    """Singleton class holding the endpoints of discovered device servers.
+    """
+
+    def __init__(self) -> None:
+        self.cache_file = "discovered_devices.json"
+        self.discovery_port = DISCOVERY_PORT
+        self.group = DISCOVERY_GROUP
+        # name -> {"Host", "Port", "Kind", "Guid", "LastSeen"}
+        self.endpoints: dict[str, dict] = dict()
+        self.lock = Lock()
+        self.stopped = Event()
+        self.threads: list[Thread] = list()
+        self.on_update = None
+        # name -> (Host, Port) of its config before apply replaced them, and (Host, Port) apply set
+        self.configured_endpoints: dict[str, tuple[str, int]] = dict()
+        self.applied_endpoints: dict[str, tuple[str, int]] = dict()
+        self.load_cache()
+
+    def load_cache(self):
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'r') as f:
+                    endpoints = json.load(f)
+            except (OSError, ValueError) as e:
+                print("Discovery: ignoring broken cache {}: {}".format(self.cache_file, e))
+                return
+            with self.lock:
+                self.endpoints.update(endpoints)
+
+    def save_cache(self):
+        with self.lock:
+            endpoints = dict(self.endpoints)
+        try:
+            with open(self.cache_file, 'w') as f:
+                json.dump(endpoints, f, indent=4)
+        except OSError as e:
+            print("Discovery: cannot save cache {}: {}".format(self.cache_file, e))
+
+    def resolve(self, name: str) -> tuple[str, int] | None:
+        """Returns host and port of the device name, None if it was never found."""
+        with self.lock:
+            endpoint = self.endpoints.get(name)
+        if endpoint is None:
+            return None
+        return endpoint["Host"], endpoint["Port"]
+
+    def apply(self, config: dict) -> int:
+        """Sets Host and Port of every device config in config, a dict with Name, Host and Port at any depth, to the
+        endpoint found for Name. Returns the number of configs changed."""
+        changed = 0
+        if {"Name", "Host", "Port"} <= config.keys():
+            name = config["Name"]
+            endpoint = self.resolve(name)
+            current = (config["Host"], config["Port"])
+            if endpoint is not None and current != endpoint:
+                if self.applied_endpoints.get(name) != current:
+                    # set by the configs or by the user, not by an earlier apply
+                    self.configured_endpoints[name] = current
+                config["Host"], config["Port"] = endpoint
+                self.applied_endpoints[name] = endpoint
+                changed += 1
+        for value in config.values():
+            if isinstance(value, dict):
+                changed += self.apply(value)
+        return changed
+
+    def configured(self, config: dict) -> dict:
+        """Returns a copy of config with Host and Port set by apply put back to those of the configs, so that
+        endpoints found are not saved with the configs."""
+        config = dict(config)
+        name = config.get("Name")
+        if name in self.applied_endpoints and (config.get("Host"), config.get("Port")) == self.applied_endpoints[name]:
+            config["Host"], config["Port"] = self.configured_endpoints[name]
+        for key, value in config.items():
+            if isinstance(value, dict):
+                config[key] = self.configured(value)
+        return config
+
+    def names(self, config: dict) -> list[str]:
+        """Returns Name of every device config in config, found like apply does."""
+        names = list()
+        if {"Name", "Host", "Port"} <= config.keys():
+            names.append(config["Name"])
+        for value in config.values():
+            if isinstance(value, dict):
+                names += self.names(value)
+        return names
+
+    def attach(self, config: dict, timeout: float = 3.0, interval: float = 60.0):
+        """Keeps Host and Port of the device configs in config up to date: from the cache at once, or, without a
+        cache, after waiting at most timeout seconds for their servers, then in the background, see start."""
+        if not self.endpoints:
+            self.discover(self.names(config), timeout)
+        self.apply(config)
+        self.start(on_update=lambda: self.apply(config), interval=interval)
+
+    def __socket(self, listen: bool) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        if listen:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(('', self.discovery_port))
+            try:
+                membership = struct.pack('4s4s', socket.inet_aton(self.group), socket.inet_aton('0.0.0.0'))
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+            except OSError as e:
+                print("Discovery: cannot join multicast group {}: {}".format(self.group, e))
+        return sock
+
+    def __record(self, data: bytes, sender: tuple[str, int]) -> tuple[str | None, bool]:
+        """Records an announcement, returns the name of the device, None if data is not an announcement, and whether
+        the endpoint is new or changed."""
+        try:
+            message = json.loads(data)
+            if message.get('op') != "announce":
+                return None, False
+            name = message['name']
+            endpoint = {"Host": sender[0], "Port": int(message['port']), "Kind": message.get('kind', ""),
+                        "Guid": message.get('guid'), "LastSeen": time.time()}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None, False
+        with self.lock:
+            old = self.endpoints.get(name)
+            if old is not None and old.get("Guid") == endpoint["Guid"]:
+                # the same server running, replying from another of its addresses, e.g. loopback
+                endpoint["Host"] = old["Host"]
+            self.endpoints[name] = endpoint
+        return name, old is None or (old["Host"], old["Port"]) != (endpoint["Host"], endpoint["Port"])
+
+    def discover(self, names: list[str] | None = None, timeout: float = 0.5) -> dict[str, dict]:
+        """
+        Asks the servers of names, or all servers if None, for their endpoints, waits at most timeout seconds for the
+        replies, or until all names are found. Returns the endpoints found.
+        """
+        query = json.dumps({"op": "discover", "names": names}).encode()
+        found = dict()
+        changed = False
+        sock = self.__socket(listen=False)
+        try:
+            for address in (self.group, LOOPBACK_BROADCAST):
+                try:
+                    sock.sendto(query, (address, self.discovery_port))
+                except OSError as e:
+                    print("Discovery: cannot send query to {}: {}".format(address, e))
+            deadline = time.monotonic() + timeout
+            while names is None or not set(names) <= found.keys():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                sock.settimeout(remaining)
+                try:
+                    data, sender = sock.recvfrom(4096)
+                except socket.timeout:
+                    break
+                name, new = self.__record(data, sender)
+                if name is not None:
+                    found[name] = self.endpoints[name]
+                    changed = changed or new
+        finally:
+            sock.close()
+        if changed:
+            self.updated()
+        return found
+
+    def updated(self):
+        self.save_cache()
+        if self.on_update is not None:
+            self.on_update()
+
+    def start(self, on_update: Callable[[], None] | None = None, interval: float = 60.0):
+        """Discovers all servers in the background now and every interval seconds, and listens to their
+        announcements. on_update is called when an endpoint is found or has changed."""
+        self.on_update = on_update
+        self.stopped.clear()
+        self.threads = [Thread(target=self.listener_task, daemon=True),
+                        Thread(target=self.refresh_task, args=(interval,), daemon=True)]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+
+    def refresh_task(self, interval: float):
+        while not self.stopped.is_set():
+            self.discover()
+            if self.stopped.wait(interval):
+                return
+
+    def listener_task(self):
+        sock = self.__socket(listen=True)
+        sock.settimeout(0.5)
+        try:
+            while not self.stopped.is_set():
+                try:
+                    data, sender = sock.recvfrom(4096)
+                except socket.timeout:
+                    continue
+                if self.__record(data, sender)[1]:
+                    self.updated()
+        finally:
+            sock.close()
+
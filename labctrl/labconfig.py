@@ -20,6 +20,7 @@ from functools import wraps
 
 from .singleton import Singleton
 from .labstat import lstat
+from .discovery import DeviceRegistry
 
 
 # class ExperimentType(Enum):
@@ -35,6 +36,8 @@ class LabConfig(metaclass=Singleton):
     """
 
     def __init__(self) -> None:
+        # DeviceRegistry when DeviceDiscovery is on, see the end of this file
+        self.registry: DeviceRegistry | None = None
         self.__load_default()
 
     def __load_default(self) -> None:
@@ -89,8 +92,10 @@ class LabConfig(metaclass=Singleton):
             recursive_load(config, self.config)
 
     def save_config(self, filename: str) -> None:
+        # Host and Port found by discovery are not saved, so they are gone when it is turned off
+        config = self.config if self.registry is None else self.registry.configured(self.config)
         with open(filename, 'w') as f:
-            json.dump(self.config, f, indent=4)
+            json.dump(config, f, indent=4)
 
     def refresh_config(self) -> None:
         """
@@ -122,3 +127,8 @@ if last_config_file in os.listdir():
     lcfg.load_config(last_config)
 
 lcfg.refresh_config()
+
+# find device servers by name instead of the Host and Port of the configs, see discovery.py
+if lcfg.config["basic"].get("DeviceDiscovery", False):
+    lcfg.registry = DeviceRegistry()
+    lcfg.registry.attach(lcfg.config)
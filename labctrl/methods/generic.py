@@ -15,6 +15,8 @@ __version__ = "20211130"
 from bokeh.models.widgets import TextInput
 from bokeh.layouts import column
 
+from .scan import Axis, nest
+
 
 class BundleGenericMethods:
     def __init__(self) -> None:
@@ -57,18 +59,13 @@ class FactoryGenericMethods:
             lstat.stat["basic"] = dict()
 
         def scan_rounds(func, meta=''):
-            """scan rounds for func"""
-            def iterate(meta=dict()):
-                for i, rd in enumerate(range(lcfg.config["basic"]["ScanRounds"])):
-                    if meta["TERMINATE"]:
-                        lstat.expmsg("scan_round received signal TERMINATE, trying graceful Thread exit")
-                        break
-                    lstat.expmsg("Scanning Round No.{}".format(rd))
-                    lstat.stat["basic"]["Round"] = rd
-                    lstat.stat["basic"]["iRound"] = i
-                    func(meta=meta)
-
-            return iterate
+            """scan rounds for func, rounds are always scanned in order"""
+            def axis():
+                return Axis("basic", range(lcfg.config["basic"]["ScanRounds"]),
+                            move=lambda rd: lstat.expmsg("Scanning Round No.{}".format(rd)),
+                            value_key="Round", index_key="iRound", ordering="raster")
+
+            return nest(axis, func, lstat)
 
         bundle.scan_round = scan_rounds
 
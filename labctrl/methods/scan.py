@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+
+"""scan.py:
+This module implements the scan engine of all technics.
+
+A scan is described by a ScanPlan: the axes to scan, outermost first, each an Axis with the positions to visit and
+how to move to them, and the ordering in which the positions are visited. The plan compiles to a flat list of
+ScanPoint before anything moves, so the whole scan can be inspected, counted or estimated up front, and one
+ScanExecutor drives the devices through it, calling the unit operation of the experiment at every point.
+
+The executor keeps lstat.stat in the same state the nested scan decorators did, e.g. lstat.stat[name]["Delay"] and
+lstat.stat[name]["iDelay"] of a linear stage, so unit operations read it as before. The decorators,
+generic.scan_round, scan_range of stages and filter wheels, take_background of shutters and scan_topas, are now
+thin adapters built with nest(), which only collects their axes:
+
+    @self.generic.scan_round
+    @self.pump_probe_delay_stage.scan_range
+    @self.fourier_transform_delay_stage.scan_range
+    def unit_operation(meta=dict()):
+        ...
+
+    unit_operation.ordering = "snake"
+    points = unit_operation.plan().compile()    # inspect before running
+    seconds = unit_operation.plan().estimate()  # stage travel, from DrivingSpeed and DrivingAcceleration
+    unit_operation(meta=meta)                   # runs the plan
+    unit_operation(meta=meta, start=unit_operation.executor.next)  # resumes after TERMINATE
+
+Orderings, of the positions of every axis, each time the axes outside it step:
+    raster: always from the first position to the last
+    snake: alternately forwards and backwards, so that an inner axis does not fly back to its first position
+    min_travel: sorted by coordinate, starting from the end nearer to where the axis is, the shortest way to visit
+        every position, also for unsorted lists such as external files or filter wheel positions
+    random: in a new random order every time
+With any ordering, the data of a point belongs to the indices of its positions, e.g. lstat.stat[name]["iDelay"], the
+executor also keeps lstat.stat[name]["iStep"], how many positions the axis visited before since the axes outside it
+stepped, and lstat.stat[name]["LastStep"], whether it is the last of them, to tell the end of a run.
+Axes with their own ordering, e.g. scan rounds and shutter backgrounds that are always raster, ignore the ordering
+of the plan.
+
+Pipelining: a unit operation may return a function, the processing of the point, e.g. averaging, FFT, figure updates
+and export, instead of doing it before returning. With unit_operation.pipeline = depth > 0, the executor moves to the
+next point as soon as the unit operation returns, i.e. as soon as the detector is read out, and calls the returned
+functions on a worker thread while the devices move and the next point is acquired, so the time per point is about
+the longer of move + acquire and processing instead of their sum. The functions run one at a time in the order of
+the points, and acquisition waits when depth of them are pending, so processing never falls behind by more than
+depth points. lstat.stat changes as soon as the executor moves on, so the unit operation reads what the processing
+needs from it before returning, e.g. the indices of the point:
+
+    def unit_operation(meta=dict()):
+        data = detector.get_data()
+        i = lstat.stat[name]["iDelay"]
+
+        def process():
+            result[i] = np.average(data)
+            figure.update(...)
+
+        return process
+
+    unit_operation.pipeline = 2
+
+The scan returns when every pending function is done. An error in one of them stops the scan at the next point and is
+raised by it.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+from queue import Queue
+from threading import Thread
+from typing import Any, Callable
+
+import numpy as np
+
+ORDERINGS = ("raster", "snake", "min_travel", "random")
+
+
+class Axis:
+    def __init__(self, name: str, positions: list, move: Callable[[Any], Any] | None = None,
+                 value_key: str = "Delay", index_key: str | None = "iDelay", ordering: str | None = None,
+                 coordinate: Callable[[Any], float] | None = None, speed: float | None = None,
+                 acceleration: float | None = None) -> None:
+        """
+        One dimension of a scan.
+        name is the key of lstat.stat the executor writes the current position to, as value_key, and its index in
+        positions as index_key, None writes no index.
+        move(position) is called before the points at position, None if nothing has to move, e.g. manual mode.
+        ordering overrides the ordering of the plan for this axis, e.g. "raster".
+        coordinate(position) is where the device goes for position, e.g. the absolute stage position in mm of a
+        delay in ps, the position itself if None. speed and acceleration, in units of coordinate per s and s^2, give
+        the time of moves, None if unknown, which counts as 0 s.
+        """
+        if ordering is not None and ordering not in ORDERINGS:
+            raise ValueError("Unknown ordering {}, expected one of {}".format(ordering, ORDERINGS))
+        self.name = name
+        self.positions = list(positions)
+        self.move = move
+        self.value_key = value_key
+        self.index_key = index_key
+        self.ordering = ordering
+        self.coordinate = (lambda position: position) if coordinate is None else coordinate
+        self.speed = speed
+        self.acceleration = acceleration
+
+    def travel_time(self, start, stop) -> float:
+        """Seconds to move from position start to stop, accelerating and decelerating at acceleration to at most
+        speed."""
+        if self.move is None or self.speed is None:
+            return 0.0
+        distance = abs(self.coordinate(stop) - self.coordinate(start))
+        if not self.acceleration:
+            return distance / self.speed
+        # distance to reach speed and stop again
+        ramps = self.speed ** 2 / self.acceleration
+        if distance < ramps:
+            return 2 * np.sqrt(distance / self.acceleration)
+        return distance / self.speed + self.speed / self.acceleration
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __repr__(self) -> str:
+        return "Axis({}, {} positions)".format(self.name, len(self.positions))
+
+
+class ScanPoint:
+    def __init__(self, number: int, indices: tuple, positions: tuple, steps: tuple, lasts: tuple) -> None:
+        """
+        A point of a compiled plan, with one entry per axis of the plan in every tuple.
+        indices: index of the position in Axis.positions, i.e. where the data of the point belongs
+        steps: how many positions the axis has visited before this one since the axes outside it stepped, equal to
+            indices for raster ordering
+        lasts: whether this is the last position the axis visits before the axes outside it step
+        """
+        self.number = number
+        self.indices = indices
+        self.positions = positions
+        self.steps = steps
+        self.lasts = lasts
+
+    def __repr__(self) -> str:
+        return "ScanPoint({}, indices={}, positions={})".format(self.number, self.indices, self.positions)
+
+
+class ScanPlan:
+    def __init__(self, axes: list[Axis], ordering: str = "raster", seed: int | None = None) -> None:
+        """axes of the scan, outermost first. seed makes random ordering reproducible."""
+        if ordering not in ORDERINGS:
+            raise ValueError("Unknown ordering {}, expected one of {}".format(ordering, ORDERINGS))
+        self.axes = axes
+        self.ordering = ordering
+        self.seed = seed
+
+    def __len__(self) -> int:
+        return int(np.prod([len(axis) for axis in self.axes]))
+
+    def order(self, axis: Axis, run: int, rng: np.random.Generator, current=None) -> list[int]:
+        """Returns the indices of the positions of axis in the order they are visited, the run-th time the axis is
+        scanned, counting from 0, current is the position the axis is at, None if unknown."""
+        ordering = self.ordering if axis.ordering is None else axis.ordering
+        indices = list(range(len(axis)))
+        if ordering == "snake" and run % 2:
+            indices.reverse()
+        elif ordering == "min_travel" and len(indices) > 1:
+            # stable, equal coordinates keep their order
+            indices.sort(key=lambda i: axis.coordinate(axis.positions[i]))
+            if current is not None:
+                here = axis.coordinate(current)
+                first = axis.coordinate(axis.positions[indices[0]])
+                last = axis.coordinate(axis.positions[indices[-1]])
+                if abs(last - here) < abs(first - here):
+                    indices.reverse()
+        elif ordering == "random":
+            rng.shuffle(indices)
+        return indices
+
+    def compile(self) -> list[ScanPoint]:
+        rng = np.random.default_rng(self.seed)
+        points = list()
+        runs = [0] * len(self.axes)
+        # position every axis was left at
+        current = [None] * len(self.axes)
+
+        def walk(k: int, indices: tuple, steps: tuple, lasts: tuple):
+            if k == len(self.axes):
+                positions = tuple(axis.positions[i] for axis, i in zip(self.axes, indices))
+                points.append(ScanPoint(len(points), indices, positions, steps, lasts))
+                return
+            order = self.order(self.axes[k], runs[k], rng, current[k])
+            runs[k] += 1
+            for step, i in enumerate(order):
+                current[k] = self.axes[k].positions[i]
+                walk(k + 1, indices + (i,), steps + (step,), lasts + (step + 1 == len(order),))
+
+        walk(0, (), (), ())
+        return points
+
+    def estimate(self, points: list[ScanPoint] | None = None, dwell: float = 0.0) -> float:
+        """
+        Returns the seconds to run points, all points of the plan if None: the travel time of the axes, which move
+        one after another, from the first point on, plus dwell seconds at every point, e.g. for acquisition.
+        """
+        points = self.compile() if points is None else points
+        seconds = dwell * len(points)
+        for previous, point in zip(points, points[1:]):
+            for k, axis in enumerate(self.axes):
+                if previous.indices[k] != point.indices[k]:
+                    seconds += axis.travel_time(previous.positions[k], point.positions[k])
+        return seconds
+
+
+class ScanPipeline:
+    def __init__(self, depth: int) -> None:
+        """
+        Calls submitted functions on a worker thread, one at a time in the order submitted. At most depth functions
+        are pending, submit blocks until there is room.
+        """
+        self.queue: Queue = Queue(maxsize=depth)
+        # first error raised by a function, the functions after it are skipped
+        self.error: Exception | None = None
+        self.thread = Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    def work(self):
+        while True:
+            func = self.queue.get()
+            if func is None:
+                return
+            if self.error is None:
+                try:
+                    func()
+                except Exception as e:
+                    self.error = e
+
+    def submit(self, func: Callable[[], Any]):
+        """Raises the error of a function submitted before, if any, instead of submitting func."""
+        if self.error is not None:
+            raise self.error
+        self.queue.put(func)
+
+    def close(self):
+        """Waits until every function submitted is done and stops the worker, raises the error of any of them."""
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+class ScanExecutor:
+    def __init__(self, lstat) -> None:
+        """Drives the devices through compiled plans, lstat is the LabStat to keep the scan state in."""
+        self.lstat = lstat
+        self.plan: ScanPlan | None = None
+        self.points: list[ScanPoint] = list()
+        # number of the point to resume from, i.e. the first point not done
+        self.next = 0
+
+    def run(self, plan: ScanPlan, operation: Callable, meta: dict | None = None, start: int = 0,
+            pipeline: int = 0) -> int:
+        """
+        Calls operation(meta=meta) at every point of plan from point number start on, after moving the axes whose
+        position changed and updating lstat.stat. Stops when meta["TERMINATE"] is set, before the next point.
+        If operation returns a function, it is called after operation, on a ScanPipeline of depth pipeline if > 0,
+        while the scan goes on, right away otherwise.
+        Returns the number of the first point not done, to resume from, when every function returned is done.
+        """
+        meta = dict(TERMINATE=False) if meta is None else meta
+        self.plan = plan
+        self.points = plan.compile()
+        self.next = start
+        previous = None
+        workers = ScanPipeline(pipeline) if pipeline > 0 else None
+        try:
+            for point in self.points[start:]:
+                if meta.get("TERMINATE"):
+                    self.lstat.expmsg("[scan] Received signal TERMINATE at point {} of {}, trying graceful Thread exit"
+                                      .format(point.number, len(self.points)))
+                    break
+                self.go(point, previous)
+                process = operation(meta=meta)
+                if callable(process):
+                    if workers is None:
+                        process()
+                    else:
+                        workers.submit(process)
+                previous = point
+                self.next = point.number + 1
+        finally:
+            if workers is not None:
+                workers.close()
+        return self.next
+
+    def go(self, point: ScanPoint, previous: ScanPoint | None = None):
+        """Moves the axes, outermost first, whose position differs from previous, None moves all."""
+        for k, axis in enumerate(self.plan.axes):
+            if axis.move is not None and (previous is None or previous.indices[k] != point.indices[k]):
+                axis.move(point.positions[k])
+            if axis.name not in self.lstat.stat:
+                self.lstat.stat[axis.name] = dict()
+            self.lstat.stat[axis.name][axis.value_key] = point.positions[k]
+            if axis.index_key is not None:
+                self.lstat.stat[axis.name][axis.index_key] = point.indices[k]
+                self.lstat.stat[axis.name]["iStep"] = point.steps[k]
+                self.lstat.stat[axis.name]["LastStep"] = point.lasts[k]
+
+
+def nest(axis: Callable[[], Axis], func: Callable, lstat) -> Callable:
+    """
+    Adapter for scan decorators: returns the function to run func over axis and over every axis func already
+    scans, if it is returned by nest itself. axis() builds the Axis from the current configs when the scan starts.
+    The returned function is called as iterate(meta=dict(), start=0), and has the attributes:
+        scan_axes: the axis builders, outermost first
+        scan_operation: the innermost function, i.e. the unit operation
+        ordering: ordering of the plan, "raster" by default
+        pipeline: depth of the processing pipeline, 0 by default, i.e. processing returned by func is not overlapped
+        plan(): returns the ScanPlan a call would run
+        executor: the ScanExecutor, executor.next is the point to resume from
+    """
+    scan_axes = [axis] + getattr(func, "scan_axes", [])
+    operation = getattr(func, "scan_operation", func)
+
+    def plan() -> ScanPlan:
+        return ScanPlan([make() for make in scan_axes], ordering=iterate.ordering)
+
+    def iterate(meta=dict(), start: int = 0):
+        return iterate.executor.run(plan(), operation, meta=meta, start=start, pipeline=iterate.pipeline)
+
+    iterate.scan_axes = scan_axes
+    iterate.scan_operation = operation
+    iterate.ordering = getattr(func, "ordering", "raster")
+    iterate.pipeline = getattr(func, "pipeline", 0)
+    iterate.plan = plan
+    iterate.executor = ScanExecutor(lstat)
+    return iterate
@@ -0,0 +1,503 @@
+# -*- coding: utf-8 -*-
+
+"""remote_client.py:
+This module provides the singleton class RemoteClient, the HTTP client layer shared by all Remote* component clients
+in labctrl.components.
+
+Calling requests.get directly opens a new TCP connection for every API call, so a scan with tens of thousands of moves
+and samples pays a TCP handshake (and on Windows, often a slow name resolution of localhost) for every one of them.
+RemoteClient keeps one requests.Session for the whole program instead: connections are pooled per host and kept alive
+between calls, so the next call to the same server reuses an open connection.
+Note that keep-alive only takes effect if the server keeps the connection open. The flask development server always
+closes the connection after every response, then the pool just opens a new one.
+
+RemoteClient also implements the retry loop that used to be copied into every remote.py: connection errors, including
+connect timeouts, are retried max_retry times with exponential backoff, and requests.exceptions.ConnectionError is
+raised when all retries fail, so ignore_connection_error and similar handlers keep working.
+Read timeouts are not retried, because the server has received the command and may be executing it, e.g. a relative
+move, so requests.exceptions.ReadTimeout is raised to the caller instead.
+
+Instrument data such as images and boxcar traces are transferred as raw bytes when the server supports it:
+get_arrays sends "Accept: application/octet-stream", and a server that understands it replies with the bytes of the
+arrays one after another as the body, and the rest of the result as JSON in the X-Result header, with key, dtype and
+shape of every array in its "arrays" field. The arrays are decoded with np.frombuffer directly from the body, without
+the base64 and JSON parsing of multi-MB strings. Servers that do not support it reply JSON with the arrays base64
+encoded, as before, and get_arrays decodes them with the dtype given by the caller.
+
+Several calls to the same server can be sent in one round-trip with a batch, see Batch:
+
+    with remote_client.batch(remote.api_url):
+        remote.set_delay_integrate(400)
+        remote.set_delay_hold(500)
+
+Long commands, e.g. moves, can be started as jobs on servers that support them (see asgi_device.py of the servers):
+submit returns a RemoteJob at once, which is waited for, polled or cancelled later.
+
+Large payloads, e.g. waveforms, go in request bodies instead of the URL path: post_json sends JSON, and upload sends
+bytes in chunks, resumes interrupted uploads and skips the upload if the device already holds the same payload.
+
+Replies of queries that are polled from many places, e.g. online or sensor data, can be cached for a while, so that
+slow servers such as GPIB bridges are not asked the same again and again, see set_cache_ttl:
+
+    remote_client.set_cache_ttl('getSensorData', 0.5)
+
+Settings can be changed at any time with configure, e.g. in the main script before any component is created:
+
+    from labctrl.remote_client import remote_client
+    remote_client.configure(timeout=5.0, max_retry=5)
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import base64
+import hashlib
+import copy
+import json
+import time
+from concurrent.futures import Future
+from threading import Lock, local
+from urllib.parse import urlsplit
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from .singleton import Singleton
+
+ARRAY_MIMETYPE = "application/octet-stream"
+# binary arrays are preferred, old servers reply JSON
+ARRAY_ACCEPT = ARRAY_MIMETYPE + ", application/json;q=0.9"
+
+
+def arrays_nbytes(specs: list[dict]) -> int:
+    """Total size of the arrays described by specs, the "arrays" field of binary replies."""
+    return sum(int(np.prod(spec["shape"])) * np.dtype(spec["dtype"]).itemsize for spec in specs)
+
+
+def decode_arrays(specs: list[dict], body: bytes) -> dict[str, np.ndarray]:
+    """Decodes the arrays described by specs from body without copying, the arrays are read-only views of body."""
+    arrays = dict()
+    offset = 0
+    for spec in specs:
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        count = int(np.prod(shape))
+        arrays[spec["key"]] = np.frombuffer(body, dtype=dtype, count=count, offset=offset).reshape(shape)
+        offset += count * dtype.itemsize
+    return arrays
+
+
+class RemoteClient(metaclass=Singleton):
+    """Singleton class holding the shared HTTP session of all remote components.
+    """
+
+    def __init__(self) -> None:
+        # (connect timeout, read timeout) in s. Moves of slow stages are replied when done and may take minutes, so
+        # there is no read timeout by default.
+        self.timeout = (3.05, None)
+        self.max_retry = 3
+        # seconds to wait before the first retry, doubled for every next retry.
+        self.backoff = 0.1
+        # number of hosts to keep pools for, and connections to keep per host.
+        self.pool_connections = 32
+        self.pool_maxsize = 8
+        self.lock = Lock()
+        # batches entered by each thread, innermost last
+        self.local = local()
+        # endpoint, or server url + endpoint -> seconds its replies are reused, see set_cache_ttl
+        self.cache_ttls: dict[str, float] = dict()
+        # url -> (time of reply, reply)
+        self.cache: dict[str, tuple[float, dict]] = dict()
+        # url -> Future of the reply of the request in flight, shared by identical concurrent requests
+        self.in_flight: dict[str, Future] = dict()
+        # server url -> number of invalidations, replies requested before an invalidation are not cached
+        self.cache_generation: dict[str, int] = dict()
+        self.cache_lock = Lock()
+        self.session = None
+        self.__new_session()
+
+    def __new_session(self):
+        session = requests.Session()
+        # retries are done by get with backoff, not by urllib3.
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        old_session, self.session = self.session, session
+        if old_session is not None:
+            old_session.close()
+
+    def configure(self, timeout: float | tuple[float, float | None] | None = None, max_retry: int | None = None,
+                  backoff: float | None = None, pool_connections: int | None = None,
+                  pool_maxsize: int | None = None) -> None:
+        """Changes settings of the client, parameters left None are not changed.
+        Changing pool sizes replaces the session, open connections are closed."""
+        with self.lock:
+            if timeout is not None:
+                self.timeout = timeout
+            if max_retry is not None:
+                self.max_retry = max_retry
+            if backoff is not None:
+                self.backoff = backoff
+            if pool_connections is not None or pool_maxsize is not None:
+                if pool_connections is not None:
+                    self.pool_connections = pool_connections
+                if pool_maxsize is not None:
+                    self.pool_maxsize = pool_maxsize
+                self.__new_session()
+
+    def set_cache_ttl(self, endpoint: str, ttl: float | None, api_url: str | None = None) -> None:
+        """
+        Caches the replies of get_json to endpoint, the first segment of the API path, e.g. 'getSensorData', or ''
+        for online, for ttl seconds. If api_url is given, only for that server. ttl None or 0 stops caching.
+        Replies are cached per url, i.e. per endpoint and arguments, and identical requests in flight at the same
+        time are sent once. Any request to a server that is not cached, e.g. a command, may change the state of the
+        device and clears the cache of that server.
+        """
+        key = endpoint if api_url is None else self.__server(api_url) + endpoint
+        with self.cache_lock:
+            if ttl:
+                self.cache_ttls[key] = ttl
+            else:
+                self.cache_ttls.pop(key, None)
+
+    def invalidate(self, api_url: str | None = None) -> None:
+        """Clears the cached replies of the server of api_url, or of all servers."""
+        with self.cache_lock:
+            if api_url is None:
+                servers = set(self.cache_generation) | {self.__server(url) for url in self.cache}
+            else:
+                servers = {self.__server(api_url)}
+            for server in servers:
+                self.cache_generation[server] = self.cache_generation.get(server, 0) + 1
+            self.cache = {url: entry for url, entry in self.cache.items() if self.__server(url) not in servers}
+
+    @staticmethod
+    def __server(url: str) -> str:
+        parts = urlsplit(url)
+        return "{}://{}/".format(parts.scheme, parts.netloc)
+
+    def __cache_ttl(self, url: str) -> float | None:
+        if not self.cache_ttls:
+            return None
+        server = self.__server(url)
+        endpoint = urlsplit(url).path.lstrip('/').split('/')[0]
+        ttl = self.cache_ttls.get(server + endpoint)
+        return ttl if ttl is not None else self.cache_ttls.get(endpoint)
+
+    def request(self, method: str, url: str, max_retry: int | None = None, **kwargs) -> requests.Response:
+        """Requests url through the shared session, retrying on connection errors. kwargs are passed to
+        requests.Session.request. Raises requests.exceptions.ConnectionError if all retries fail."""
+        if self.cache_ttls and (method != "GET" or self.__cache_ttl(url) is None):
+            self.invalidate(url)
+        if max_retry is None:
+            max_retry = self.max_retry
+        delay = self.backoff
+        for i in range(max_retry):
+            try:
+                return self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except requests.exceptions.ConnectionError as err:
+                print(err)
+                if i < max_retry - 1:
+                    time.sleep(delay)
+                    delay *= 2
+        print("Error: Cannot connect to {url}, exceeded max retry {mr}".format(url=url, mr=max_retry))
+        raise requests.exceptions.ConnectionError
+
+    def get(self, url: str, max_retry: int | None = None, headers: dict | None = None) -> requests.Response:
+        """GETs url, see request."""
+        return self.request("GET", url, max_retry, headers=headers)
+
+    def get_json(self, url: str, max_retry: int | None = None):
+        """GETs url and decodes the JSON response, see get.
+        Inside a batch of the server of url, the call is queued instead, and a Future of the result is returned."""
+        batch = self.__active_batch(url)
+        if batch is not None:
+            return batch.add(url[len(batch.api_url):])
+        ttl = self.__cache_ttl(url)
+        if ttl is not None:
+            return self.__cached_get_json(url, ttl, max_retry)
+        response = self.get(url, max_retry)
+        return json.loads(response.content.decode())
+
+    def __cached_get_json(self, url: str, ttl: float, max_retry: int | None):
+        server = self.__server(url)
+        with self.cache_lock:
+            entry = self.cache.get(url)
+            if entry is not None and time.monotonic() - entry[0] < ttl:
+                # copies, callers may modify the reply
+                return copy.deepcopy(entry[1])
+            future = self.in_flight.get(url)
+            sending = future is None
+            if sending:
+                future = Future()
+                self.in_flight[url] = future
+                generation = self.cache_generation.get(server, 0)
+        if not sending:
+            return copy.deepcopy(future.result())
+        try:
+            res = json.loads(self.get(url, max_retry).content.decode())
+        except Exception as e:
+            with self.cache_lock:
+                del self.in_flight[url]
+            future.set_exception(e)
+            raise
+        with self.cache_lock:
+            del self.in_flight[url]
+            if self.cache_generation.get(server, 0) == generation:
+                self.cache[url] = (time.monotonic(), res)
+        future.set_result(res)
+        return copy.deepcopy(res)
+
+    def post_json(self, url: str, payload, max_retry: int | None = None):
+        """POSTs payload as the JSON body to url and decodes the JSON response, see request."""
+        response = self.request("POST", url, max_retry, json=payload)
+        return json.loads(response.content.decode())
+
+    def upload(self, url: str, payload: bytes, chunk_size: int = 1 << 16, max_retry: int | None = None) -> dict:
+        """
+        Uploads payload to a ChunkedUpload of a server at url, e.g. api_url + 'waveform', in chunks of chunk_size
+        bytes in PUT bodies. The payload is named by its SHA-256 hex digest: nothing is sent if the device already
+        holds it, and an upload interrupted before is resumed from the bytes the server has received.
+        Returns the reply to the last chunk, with 'hash' and the number of bytes 'sent'.
+        Raises requests.exceptions.HTTPError if the server does not support uploads to url.
+        """
+        if max_retry is None:
+            max_retry = self.max_retry
+        digest = hashlib.sha256(payload).hexdigest()
+        response = self.get(url + '/' + digest, max_retry)
+        response.raise_for_status()
+        status = json.loads(response.content.decode())
+        sent = 0
+        if status['current']:
+            res = {'success': True, 'message': "Payload already current", 'received': len(payload),
+                   'complete': True}
+        else:
+            offset = status['received']
+            refused = 0
+            while True:
+                chunk = payload[offset:offset + chunk_size]
+                response = self.request("PUT", url + '/' + digest, max_retry, data=chunk,
+                                        params={'offset': offset, 'length': len(payload)},
+                                        headers={'Content-Type': ARRAY_MIMETYPE})
+                res = json.loads(response.content.decode())
+                if response.status_code == 409 and refused < max_retry:
+                    # the server holds a different part, resume from there
+                    refused += 1
+                    offset = res['received']
+                    continue
+                if res['success']:
+                    sent += len(chunk)
+                if not res['success'] or res['complete']:
+                    break
+                offset = res['received']
+        res['hash'] = digest
+        res['sent'] = sent
+        return res
+
+    def submit(self, api_url: str, command: str, max_retry: int | None = None) -> "RemoteJob":
+        """Starts command on the server of api_url as a job and returns at once, see RemoteJob."""
+        separator = '&' if '?' in command else '?'
+        res = json.loads(self.get(api_url + command + separator + 'job=1', max_retry).content.decode())
+        return RemoteJob(self, api_url, res, max_retry)
+
+    def batch(self, api_url: str, max_retry: int | None = None) -> "Batch":
+        """Returns a context manager, within which get_json calls of the current thread to api_url are queued and
+        sent as one request on exit, see Batch."""
+        return Batch(self, api_url, max_retry)
+
+    def __active_batch(self, url: str) -> "Batch | None":
+        for batch in reversed(getattr(self.local, "batches", ())):
+            if url.startswith(batch.api_url):
+                return batch
+        return None
+
+    def get_arrays(self, url: str, arrays: dict[str, np.dtype | type | str],
+                   max_retry: int | None = None) -> dict:
+        """GETs url and returns the result with arrays decoded as np.ndarray.
+        arrays maps the keys of the arrays in the result to their dtype, which is only used if the server replies
+        base64 in JSON, binary replies carry their own dtype and shape.
+        The returned arrays share memory with the response body, so they are read-only."""
+        response = self.get(url, max_retry, headers={"Accept": ARRAY_ACCEPT})
+        if response.headers.get("Content-Type", "").startswith(ARRAY_MIMETYPE):
+            result = json.loads(response.headers["X-Result"])
+            result.update(decode_arrays(result.pop("arrays"), response.content))
+            return result
+        result = json.loads(response.content.decode())
+        for key, dtype in arrays.items():
+            if key in result:
+                result[key] = np.frombuffer(base64.b64decode(result[key]), dtype=dtype)
+        return result
+
+    def close(self):
+        self.session.close()
+
+
+class Batch():
+    """
+    Queues API calls to one server and sends them together as one POST to /batch, where the server executes them in
+    order. Within the with block, every get_json call of the same thread to the server returns a Future, which is
+    done with the result of that call when the block exits:
+
+        with remote.batch():
+            r1 = remote.set_delay_integrate(400)
+            r2 = remote.set_delay_hold(500)
+        print(r1.result(), r2.result())
+
+    Calls are executed in order, and a failed call does not stop the following ones. If the server does not support
+    /batch, the calls are sent one by one instead. If the block raises, nothing is sent and the Futures are cancelled.
+    """
+
+    def __init__(self, client: RemoteClient, api_url: str, max_retry: int | None = None) -> None:
+        self.client = client
+        self.api_url = api_url
+        self.max_retry = max_retry
+        # (command, Future)
+        self.queued: list[tuple[str, Future]] = list()
+
+    def add(self, command: str) -> Future:
+        future = Future()
+        self.queued.append((command, future))
+        return future
+
+    def __enter__(self) -> "Batch":
+        if not hasattr(self.client.local, "batches"):
+            self.client.local.batches = list()
+        self.client.local.batches.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.client.local.batches.remove(self)
+        if exc_type is not None:
+            for _, future in self.queued:
+                future.cancel()
+            self.queued.clear()
+            return
+        self.flush()
+
+    def flush(self) -> list[dict]:
+        """Sends all queued calls and returns their results in order."""
+        queued, self.queued = self.queued, list()
+        if not queued:
+            return []
+        commands = [command for command, _ in queued]
+        try:
+            response = self.client.request("POST", self.api_url + 'batch', self.max_retry,
+                                           json={"commands": commands})
+            if response.status_code in (404, 405, 501):
+                # server without batch support
+                results = [json.loads(self.client.get(self.api_url + command, self.max_retry).content.decode())
+                           for command in commands]
+            else:
+                results = json.loads(response.content.decode())["results"]
+        except Exception as e:
+            for _, future in queued:
+                future.set_exception(e)
+            raise
+        for (_, future), result in zip(queued, results):
+            future.set_result(result)
+        return results
+
+
+class RemoteJob():
+    """
+    A command running on a server as a job, e.g. a move, returned by RemoteClient.submit at once:
+
+        job = stage.move_async(10.0)
+        data = boxcar.get_new_data(1000)    # runs while the stage moves
+        job.wait()
+
+    Servers without jobs execute the command before replying, then the job is returned already done.
+    """
+    # seconds of one wait request, longer waits are split, so that a lost reply is noticed
+    WAIT_SLICE = 10.0
+    FINISHED = ("done", "failed", "cancelled")
+
+    def __init__(self, client: RemoteClient, api_url: str, reply: dict, max_retry: int | None = None) -> None:
+        self.client = client
+        self.api_url = api_url
+        self.max_retry = max_retry
+        if "job" in reply:
+            self.info = reply["job"]
+        else:
+            self.info = {"id": None, "state": "done" if reply.get("success", True) else "failed",
+                         "progress": 1.0, "result": reply}
+
+    @property
+    def id(self) -> int | None:
+        return self.info["id"]
+
+    @property
+    def state(self) -> str:
+        return self.info["state"]
+
+    @property
+    def progress(self) -> float | None:
+        return self.info["progress"]
+
+    def __update(self, command: str) -> dict:
+        url = self.api_url + 'jobs/{}'.format(self.id) + ('/' + command if command else '')
+        res = json.loads(self.client.get(url, self.max_retry).content.decode())
+        if "job" in res:
+            self.info = res["job"]
+        return self.info
+
+    def refresh(self) -> dict:
+        """Polls the state of the job."""
+        if self.id is None or self.state in self.FINISHED:
+            return self.info
+        return self.__update('')
+
+    def done(self) -> bool:
+        return self.refresh()["state"] in self.FINISHED
+
+    def wait(self, timeout: float | None = None) -> dict:
+        """Waits until the job finishes and returns its result, the reply of the command as if it was called directly.
+        Raises TimeoutError if it is not finished after timeout seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.state not in self.FINISHED:
+            wait = self.WAIT_SLICE
+            read_timeout = self.client.timeout[1] if isinstance(self.client.timeout, tuple) else self.client.timeout
+            if read_timeout is not None:
+                wait = min(wait, read_timeout / 2)
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    raise TimeoutError("Job {} of {} not finished".format(self.id, self.api_url))
+            self.__update('wait/{:.3f}'.format(wait))
+        return self.info["result"]
+
+    def cancel(self) -> dict:
+        """Cancels the job, a queued job is dropped and a running one is asked to stop."""
+        if self.id is None or self.state in self.FINISHED:
+            return self.info
+        return self.__update('cancel')
+
+
+class RemoteDevice():
+    """Base of the remotes of device servers in labctrl.components.
+    host, port and api_url are read from Host and Port of config whenever they are used, instead of being copied
+    when the remote is made, so a remote follows its server when DeviceRegistry.apply rewrites them in place, e.g.
+    after the server was found at another address, see discovery.py.
+    """
+
+    def __init__(self, config: dict, max_retry=3) -> None:
+        self.config = config
+        self.max_retry = max_retry
+
+    @property
+    def host(self) -> str:
+        return self.config["Host"]
+
+    @property
+    def port(self) -> int:
+        return self.config["Port"]
+
+    @property
+    def api_url(self) -> str:
+        return 'http://{host}:{port}/'.format(host=self.host, port=self.port)
+
+
+remote_client = RemoteClient()
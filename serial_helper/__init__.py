@@ -3,9 +3,15 @@
 """serial_helper:
 This module provides some useful tools for developing serial port protocols and APIs.
 
-SerialMocker is provided to mock a real serial device for testing.
+SerialMocker is provided to mock a real serial device for testing, VirtualClock makes its timings deterministic.
 SerialManager is provided to buffer serial IO in real-time and gracefully handle unexpected disconnection/reconnection.
 SerialProtocol is provided to parse stream-based serial IO into structured data, and serialize structured data to send.
+SerialHub is provided to service many ports and their framers from a single I/O thread.
+RecordFramer is provided to reassemble and decode fixed-size binary records, such as ADC buffers.
+RequestChannel is provided to match replies to requests and pipeline commands on top of a framer.
+BoundedQueue is provided to bound the memory of the queues above with a drop policy.
+MetricsRegistry is provided to collect throughput, queue depth and latency metrics of the above, and serve them over HTTP.
+AsyncSerialManager, AsyncCOBSFramer and AsyncPatternFramer provide the same functions in an asyncio event loop.
 """
 
 __author__ = "Zhi Zi"
@@ -14,10 +20,17 @@ __version__ = "20231009"
 
 import logging
 
-from .serial_mocker import SerialMocker
+from .serial_mocker import SerialMocker, VirtualClock
 from .serial_manager import SerialManager
 from .cobs_framer import COBSFramer
 from .pattern_framer import PatternFramer
+from .record_framer import RecordFramer
+from .request_channel import RequestChannel
+from .serial_metrics import MetricsRegistry, LatencyHistogram
+from .bounded_queue import BoundedQueue
+from .serial_hub import SerialHub, HubPort
+from .async_serial_manager import AsyncSerialManager
+from .async_framers import AsyncCOBSFramer, AsyncPatternFramer
 
 lg = logging.getLogger(__name__)
 lg.debug("Imported serial_helper")
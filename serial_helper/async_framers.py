@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""async_framers.py:
+This module provides AsyncCOBSFramer and AsyncPatternFramer, the asyncio counterparts of COBSFramer and PatternFramer,
+working on top of an AsyncSerialManager.
+
+The framing algorithms are exactly the same, so the synchronous framers are reused as stream parsers through their
+process_stream method, and their threads are never started.
+Async framers do not run a framer task either: the stream is parsed lazily when the consumer asks for the next frame,
+so a frame is only parsed by the coroutine that is going to use it.
+
+Frames can be received one by one with receive_frame, or by iterating the framer:
+
+    async for frame in framer:
+        ...
+
+The iteration ends when the AsyncSerialManager is stopped.
+
+The stream is parsed on the event loop, where a put to a full "block" queue would freeze the loop. So a bounded
+received queue needs one of the policies that never block, see bounded_queue.py.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+# std libs
+import asyncio
+import logging
+from queue import Empty
+# this package
+from .async_serial_manager import AsyncSerialManager
+from .cobs_framer import COBSFramer
+from .pattern_framer import PatternFramer
+
+# Configure logging
+lg = logging.getLogger(__name__)
+
+
+class AsyncFramer:
+    """
+    Common part of async framers. parser is a synchronous framer used only for its process_stream, encode_frame and
+    received_packets.
+    """
+
+    def __init__(self, ser_mgr: AsyncSerialManager, parser: COBSFramer | PatternFramer) -> None:
+        queue = parser.received_packets
+        if queue.maxsize > 0 and queue.policy == "block":
+            raise ValueError("queue_policy \"block\" would block the event loop when the queue of {} is full".format(
+                queue.maxsize))
+        self.ser_mgr = ser_mgr
+        self.parser = parser
+
+    @property
+    def counters(self) -> dict[str, int]:
+        return self.parser.counters
+
+    async def start(self):
+        lg.info("Starting {}".format(type(self).__name__))
+        await self.ser_mgr.start()
+
+    async def stop(self):
+        lg.info("Gracefully shutting down {}".format(type(self).__name__))
+        await self.ser_mgr.stop()
+
+    async def send_frame(self, msg: bytes) -> int:
+        await self.ser_mgr.send(self.parser.encode_frame(msg))
+        return len(msg)
+
+    async def receive_frame(self, timeout: float | None = None) -> bytes | None:
+        """
+        Returns the next frame, or None if timeout exceeds or the serial manager is stopped.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            try:
+                item = self.parser.received_packets.get_nowait()
+                self.parser.received_packets.task_done()
+                return item
+            except Empty:
+                pass
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return None
+            _, msg = await self.ser_mgr.receive(timeout=remaining)
+            if msg is None:
+                return None
+            self.parser.process_stream(msg)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        frame = await self.receive_frame()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+
+class AsyncCOBSFramer(AsyncFramer):
+    def __init__(self, ser_mgr: AsyncSerialManager, buffer_size: int = 4096,
+                 queue_size: int = 0, queue_policy: str = "block") -> None:
+        super().__init__(ser_mgr, COBSFramer(None, buffer_size=buffer_size,
+                                             queue_size=queue_size, queue_policy=queue_policy))
+
+
+class AsyncPatternFramer(AsyncFramer):
+    def __init__(self, ser_mgr: AsyncSerialManager, pattern: bytes, max_msg_len: int = 65535,
+                 buffer_size: int = 4096, queue_size: int = 0, queue_policy: str = "block") -> None:
+        super().__init__(ser_mgr, PatternFramer(None, pattern, max_msg_len=max_msg_len, buffer_size=buffer_size,
+                                                queue_size=queue_size, queue_policy=queue_policy))
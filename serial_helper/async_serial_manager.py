@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+"""async_serial_manager.py:
+This module provides the AsyncSerialManager class, the asyncio counterpart of SerialManager.
+
+SerialManager uses a read thread and a write thread for every port, and every framer adds another thread.
+When dozens of instruments are driven by the same program, these threads mostly sleep, but they still cost memory and
+context switches, and the latency depends on how the OS schedules them.
+AsyncSerialManager instead lets a single event loop drive all ports on one thread:
+
+1. On POSIX systems, the file descriptor of the port is registered with loop.add_reader, the port is switched to
+non-blocking mode (timeout=0), and bytes are read in the callback as soon as the fd becomes readable. Writes use
+os.write on the non-blocking fd and wait for writability with loop.add_writer if the driver buffer is full.
+
+2. If the port does not provide a file descriptor (Windows COM ports, SerialMocker without use_fileno), blocking reads
+and writes are run in the default executor of the loop, so the API is the same but threads are used under the hood.
+
+Just like SerialManager, received messages are (time_ns, bytes) tuples, see serial_manager.py for details about
+message boundaries.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+# std libs
+import asyncio
+import io
+import logging
+import os
+import time
+
+# third-party libs
+import serial
+
+# Configure logging
+lg = logging.getLogger(__name__)
+
+
+class AsyncSerialManager:
+    """
+    AsyncSerialManager binds to a given serial port and buffers all IO on the port in an asyncio event loop.
+    All methods must be called from the same event loop.
+    """
+
+    def __init__(self, com_port: str,
+                 baudrate: int = 115200, timeout: float = 1.0,
+                 ) -> None:
+        self.com_port = com_port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.ser = None
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.received_queue: asyncio.Queue[tuple[int | None, bytes | None]] = asyncio.Queue()
+        self.write_lock = asyncio.Lock()
+        self.is_manager_running = False
+        # file descriptors used by the event loop, None if executor is used instead.
+        self.read_fd = None
+        self.write_fd = None
+        self.original_ser_timeout = None
+        self.executor_read_task = None
+        lg.info("Created AsyncSerialManager, bound to port {}".format(self.com_port))
+
+    def get_serial(self):
+        """
+        connects to serial port according to current configuration.
+        returns the handler Serial object.
+        """
+        return serial.Serial(self.com_port, baudrate=self.baudrate, timeout=self.timeout)
+
+    def get_fileno(self) -> int | None:
+        """
+        Returns the file descriptor of the port if it can be used with the event loop, or None.
+        """
+        if os.name != 'posix':
+            return None
+        try:
+            return self.ser.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            return None
+
+    async def start(self):
+        if self.is_manager_running:
+            lg.warning(
+                "AsyncSerialManager already started! If restart is intended, try call .stop first.")
+            return
+        self.loop = asyncio.get_running_loop()
+        # make sure serial port is connected.
+        if self.ser:
+            if not self.ser.is_open:
+                self.ser.open()
+        else:
+            lg.warning("Serial port is not connected yet, reconnecting")
+            self.ser = self.get_serial()
+        n_items = self.received_queue.qsize()
+        if n_items != 0:
+            lg.warning("Receiving queue still has {} item(s) not consumed! \
+                       You may get old results from last connection when calling .receive. \
+                       If this is not intended, consider clear the queue \
+                       before calling start".format(n_items))
+        self.is_manager_running = True
+        self.read_fd = self.get_fileno()
+        if self.read_fd is not None:
+            lg.info("Registering port file descriptor {} with event loop.".format(self.read_fd))
+            # reads in the callback must never block the loop.
+            self.original_ser_timeout = self.ser.timeout
+            self.ser.timeout = 0
+            self.loop.add_reader(self.read_fd, self.on_readable)
+            if isinstance(self.ser, serial.Serial):
+                # pySerial opens POSIX ports with O_NONBLOCK, so the same fd can be written without blocking.
+                self.write_fd = self.read_fd
+        else:
+            lg.info("Port does not provide a file descriptor, reading in executor.")
+            self.executor_read_task = asyncio.create_task(self.executor_read_loop())
+
+    async def stop(self):
+        lg.info("Gracefully halting AsyncSerialManager, this may block a while.")
+        self.is_manager_running = False
+        if self.read_fd is not None:
+            self.loop.remove_reader(self.read_fd)
+            self.ser.timeout = self.original_ser_timeout
+            self.read_fd = None
+            self.write_fd = None
+        if self.executor_read_task is not None:
+            # the executor read returns after port timeout at most.
+            await self.executor_read_task
+            self.executor_read_task = None
+        # wait for the last write to finish
+        async with self.write_lock:
+            pass
+        # wake up receivers waiting forever, the same way SerialManager closes its send queue.
+        self.received_queue.put_nowait((None, None))
+        self.ser.close()
+
+    async def receive(self, timeout: float | None = None) -> tuple[int, bytes]:
+        """
+        Gets earlist message in the buffer queue.
+
+        Returns: (
+            time_ns : int, the time when message is received, unit in ns, since epoch.
+            message : bytes, the message
+            )
+            or (None, None) if timeout exceeds, or the manager is stopped.
+        """
+        try:
+            item = await asyncio.wait_for(self.received_queue.get(), timeout)
+            self.received_queue.task_done()
+            return item
+        except asyncio.TimeoutError:
+            return (None, None)
+
+    async def send(self, message: bytes) -> int:
+        """
+        Writes message to port. If message is empty, nothing happens.
+        Returns after the whole message is handed to the driver, so awaiting the call is the confirmation of sending.
+        Concurrent sends are written in the order they are called, and never interleave.
+        """
+        if not message:
+            return 0
+        async with self.write_lock:
+            if self.write_fd is not None:
+                await self.write_nonblocking(message)
+            else:
+                await self.loop.run_in_executor(None, self.ser.write, message)
+        return len(message)
+
+    async def write_nonblocking(self, message: bytes):
+        to_write = memoryview(message)
+        while to_write:
+            try:
+                n = os.write(self.write_fd, to_write)
+            except BlockingIOError:
+                n = 0
+            to_write = to_write[n:]
+            if to_write:
+                # driver buffer is full, wait until the fd is writable again.
+                writable = self.loop.create_future()
+                self.loop.add_writer(self.write_fd, writable.set_result, None)
+                try:
+                    await writable
+                finally:
+                    self.loop.remove_writer(self.write_fd)
+
+    def on_readable(self):
+        try:
+            # port timeout is 0 here, read returns whatever is available without blocking.
+            new_data = self.ser.read(max(1, self.ser.in_waiting))
+        except serial.SerialException as e:
+            lg.error("Error reading port {}, stop reading: {}".format(self.com_port, e))
+            self.loop.remove_reader(self.read_fd)
+            return
+        if new_data:
+            current_time_ns = time.time_ns()
+            self.received_queue.put_nowait((current_time_ns, new_data))
+
+    def blocking_read(self) -> bytes:
+        """
+        Blocks until at least 1 byte arrives or port timeout expires, then reads the rest of the burst, same as 
+        SerialManager in blocking read mode. Runs in executor.
+        """
+        new_data = self.ser.read(max(1, self.ser.in_waiting))
+        n_remaining = self.ser.in_waiting
+        if new_data and n_remaining:
+            new_data += self.ser.read(n_remaining)
+        return new_data
+
+    async def executor_read_loop(self):
+        while self.is_manager_running:
+            new_data = await self.loop.run_in_executor(None, self.blocking_read)
+            if new_data:
+                current_time_ns = time.time_ns()
+                self.received_queue.put_nowait((current_time_ns, new_data))
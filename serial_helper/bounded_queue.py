@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""bounded_queue.py:
+This module provides the BoundedQueue class, a queue.Queue with an explicit policy for what happens when it is full.
+
+The queues between serial threads and their consumers used to be unbounded. If a consumer stalls, for example a Bokeh
+callback blocked by a slow browser, the queue grows without limit, and a monitor running for weeks eventually runs out
+of memory. With a maxsize, one of the following policies decides what happens when a producer puts to a full queue:
+
+    "block"         put blocks until a consumer makes room, like queue.Queue. The producer is slowed down
+                    (backpressure), e.g. the serial read thread stops reading and the device is throttled by the
+                    driver flow control, or the driver buffer overflows.
+    "drop_oldest"   the oldest item is discarded to make room, so consumers always see the most recent maxsize items.
+    "drop_newest"   the new item is discarded, so consumers see the first maxsize items until they catch up.
+    "latest"        only the latest item is kept, i.e. "drop_oldest" with maxsize 1. This is the natural choice for
+                    sensor readings, where only the current value is of interest.
+
+Discarded items are counted in .dropped. maxsize 0 means unbounded, the policy has no effect then.
+Producer threads that must stop even if nobody consumes any more, e.g. the read thread of SerialManager and the
+threads of the framers, use put_while instead of put, so that a full "block" queue does not keep them waiting forever.
+The queue is a subclass of queue.Queue so get, task_done, join and qsize work as usual. Discarded items count as done.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+# std libs
+import logging
+from queue import Full, Queue
+from typing import Callable
+
+# Configure logging
+lg = logging.getLogger(__name__)
+
+QUEUE_POLICIES = ("block", "drop_oldest", "drop_newest", "latest")
+
+
+class BoundedQueue(Queue):
+    def __init__(self, maxsize: int = 0, policy: str = "block") -> None:
+        if policy not in QUEUE_POLICIES:
+            raise ValueError("Unknown queue policy: {}, must be one of {}".format(policy, QUEUE_POLICIES))
+        if policy == "latest":
+            maxsize = 1
+        super().__init__(maxsize)
+        self.policy = policy
+        self.dropped = 0
+
+    def put(self, item, block: bool = True, timeout: float | None = None):
+        """
+        Puts item into the queue according to the policy. With "block" policy, block and timeout work like
+        queue.Queue.put, with the other policies put never blocks.
+        """
+        if self.policy == "block" or self.maxsize <= 0:
+            super().put(item, block, timeout)
+            return
+        with self.not_full:
+            if self._qsize() >= self.maxsize:
+                self.dropped += 1
+                if self.policy == "drop_newest":
+                    return
+                self._get()
+                self.__task_discarded()
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def put_while(self, item, running: Callable[[], bool], step: float = 0.1) -> bool:
+        """
+        Puts item like put, but with "block" policy waits for room only while running() is True, checking it every
+        step seconds. Returns False if running() turned False first, the item is then discarded and counted in
+        .dropped.
+        """
+        while True:
+            try:
+                self.put(item, timeout=step)
+                return True
+            except Full:
+                if not running():
+                    with self.mutex:
+                        self.dropped += 1
+                    return False
+
+    def put_nowait(self, item):
+        return self.put(item, block=False)
+
+    def force_put(self, item):
+        """
+        Puts item regardless of maxsize and policy, for sentinels like None that must never be dropped or block.
+        """
+        with self.mutex:
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def clear(self) -> int:
+        """
+        Discards all items at once and returns how many were discarded. Unlike getting items one by one, this always
+        finishes even if producers keep putting.
+        """
+        with self.mutex:
+            n = self._qsize()
+            self.queue.clear()
+            for _ in range(n):
+                self.__task_discarded()
+            self.not_full.notify_all()
+        return n
+
+    def __task_discarded(self):
+        # a discarded item will never be task_done by a consumer, so it is marked as done here for join to work.
+        # Called with mutex held.
+        self.unfinished_tasks -= 1
+        if self.unfinished_tasks == 0:
+            self.all_tasks_done.notify_all()
+
@@ -22,6 +22,11 @@ in the middle.
 
 This package provides the COBSFramer class to read from a SerialManager and frame the messages.
 The framed packets are stored temporarily in a queue to be consumed by protocol parsers.
+
+Incoming data is copied once into a preallocated stream buffer, and only the newly arrived bytes are scanned for the
+0x00 delimiter, so a large frame arriving in many small reads costs O(n) instead of O(n^2).
+Complete frames are decoded in place inside the stream buffer and copied out once, to a bytes object owned by the 
+consumer.
 """
 
 __author__ = "Zhi Zi"
@@ -37,18 +42,56 @@ from typing import Callable, Optional
 # third-party libs
 from cobs import cobs
 # this package
+from .bounded_queue import BoundedQueue
 from .serial_manager import SerialManager
+from .stream_buffer import StreamBuffer
 
 # Configure logging
 lg = logging.getLogger(__name__)
 
 
+def cobs_decode_in_place(buffer: memoryview) -> int:
+    """
+    Decodes a COBS encoded frame (without the 0x00 delimiter) in place.
+    The decoded frame is never longer than the encoded frame, so the decoded bytes are written to the start of buffer.
+
+    Returns: length of the decoded frame.
+
+    Raises cobs.DecodeError if the frame is malformed, same as cobs.decode.
+    Data is copied block by block, so the cost is one slice assignment per 0x00 in the original frame.
+    """
+    n = len(buffer)
+    r = 0  # read position
+    w = 0  # write position
+    while r < n:
+        code = buffer[r]
+        if code == 0:
+            raise cobs.DecodeError("zero byte found in input")
+        r += 1
+        block_end = r + code - 1
+        if block_end > n:
+            raise cobs.DecodeError("not enough input bytes for length code")
+        buffer[w:w + code - 1] = buffer[r:block_end]
+        w += code - 1
+        r = block_end
+        if code < 0xFF and r < n:
+            buffer[w] = 0
+            w += 1
+    return w
+
+
 class COBSFramer():
-    def __init__(self, ser_mgr: SerialManager) -> None:
+    def __init__(self, ser_mgr: SerialManager, buffer_size: int = 4096,
+                 queue_size: int = 0, queue_policy: str = "block") -> None:
         self.ser_mgr = ser_mgr
         self.frame_id = 1
-        self.stream_content = b''
-        self.received_packets: Queue[bytes] = Queue()
+        # unconsumed bytes in stream are the incomplete frame waiting for its delimiter.
+        self.stream = StreamBuffer(buffer_size)
+        # counters
+        self.frames_received = 0
+        self.decode_errors = 0
+        # see bounded_queue.py for queue_size and queue_policy, 0 means unbounded.
+        self.received_packets: BoundedQueue[bytes] = BoundedQueue(queue_size, queue_policy)
         self.framer_thread_running = False
         self.framer_thread = Thread(target=self.framer_task)
 
@@ -68,32 +111,69 @@ class COBSFramer():
         self.ser_mgr.stop()
         lg.info("COBSFramer shutdown.")
 
+    @property
+    def stream_content(self) -> bytes:
+        """
+        Copy of the incomplete frame currently held in stream buffer.
+        """
+        return self.stream.content()
+
+    @property
+    def counters(self) -> dict[str, int]:
+        return {
+            "frames_received": self.frames_received,
+            "decode_errors": self.decode_errors,
+            "queue_dropped": self.received_packets.dropped,
+        }
+
     def framer_task(self):
         while self.framer_thread_running:
             try:
                 _, msg = self.ser_mgr.receive(timeout=1.0)
                 if msg:
-                    self.stream_content += msg
-                    self.__handle_new_message()
+                    self.process_stream(msg)
             except Empty:
                 pass
 
-    def __handle_new_message(self):
-        # this will not be empty so accessing by index -1 is safe.
-        encoded_packets = self.stream_content.split(b'\x00')
-        for i in range(len(encoded_packets)-1):
-            if encoded_packets[i]:
+    def process_stream(self, msg: bytes):
+        """
+        Appends msg to stream buffer and frames all complete packets in it.
+        Only the new bytes are scanned for delimiter, bytes already scanned are never scanned again.
+        """
+        scan_start = self.stream.append(msg)
+        self.__handle_new_message(scan_start)
+
+    def __handle_new_message(self, scan_start: int):
+        stream = self.stream
+        frame_start = stream.start
+        while True:
+            frame_end = stream.buffer.find(0, scan_start, stream.end)
+            if frame_end < 0:
+                break
+            if frame_end > frame_start:
+                encoded_packet = stream.view[frame_start:frame_end]
                 try:
-                    decoded_packet = cobs.decode(encoded_packets[i])
-                    self.received_packets.put(decoded_packet)
+                    decoded_len = cobs_decode_in_place(encoded_packet)
+                    self.received_packets.put_while(bytes(encoded_packet[:decoded_len]),
+                                                    lambda: self.framer_thread_running)
+                    self.frames_received += 1
                 except cobs.DecodeError as e:
-                    lg.error("Malformed data encountered when decoding {} with COBS decoder, error: {}.".format(
-                        encoded_packets[i], e))
-        self.stream_content = encoded_packets[-1]
+                    self.decode_errors += 1
+                    # encoded_packet is partially overwritten by the in-place decoder, so only its length is reported.
+                    lg.error("Malformed data encountered when decoding a {} bytes frame with COBS decoder, error: {}.".format(
+                        len(encoded_packet), e))
+            frame_start = frame_end + 1
+            scan_start = frame_end + 1
+        stream.consume(frame_start)
+
+    def encode_frame(self, msg: bytes) -> bytes:
+        """
+        Returns the packet to write to the stream for msg, i.e. COBS encoded msg followed by the 0x00 delimiter.
+        """
+        return cobs.encode(msg) + b'\x00'
 
     def send_frame(self, msg: bytes, timeout: float | None = None):
-        encoded_packet = cobs.encode(msg)
-        packet = encoded_packet + b'\x00'
+        packet = self.encode_frame(msg)
         self.ser_mgr.send(packet, message_id=self.frame_id)
         # wait for sending confirmation
         t_send, msg_id = self.ser_mgr.sent_id_queue.get(timeout=timeout)
@@ -121,14 +201,9 @@ class COBSFramer():
         """
         Empties packets buffer and stream buffer.
         Useful if the user needs to get the latest message and does not care about messages in the middle.
-        This function may block forever and fail, because it empties the queue by removing items one by one, which is a thread-safe method but if the other ends are putting stuff in the queue faster than while True, the loop will never end. However, if while True fails to handle so many items, the program cannot work properly anyway so we don't need to concern about this.
+        If that is always the case, consider queue_policy="latest" instead.
         """
         lg.info("Cleaning up framer buffer.")
-        while True:
-            try:
-                _ = self.received_packets.get(block=False)
-                self.received_packets.task_done()
-            except Empty:
-                break
-        self.stream_content = b''
+        self.received_packets.clear()
+        self.stream.clear()
         lg.info("Framer buffer is cleaned.")
@@ -25,6 +25,18 @@ And the framer can wait for the next boundary indicator pattern to see if this m
 
 This package provides the PatternFramer class to read from a SerialManager and frame the messages.
 The framed packets are stored temporarily in a queue to be consumed by protocol parsers.
+
+Each frame on the stream looks like:
+
+    LENGTH      msg_len_size bytes  big-endian length of CONTENT
+    CONTENT     LENGTH bytes        the message
+    PATTERN     pattern_size bytes  frame boundary indicator
+
+The framer is a streaming state machine. When in sync, it reads the length first, then jumps straight to the expected 
+end of the frame and only checks that the pattern is there, so CONTENT is never searched and may contain the pattern.
+If the pattern is not found at the expected position, the frame is dropped and the framer resynchronises by searching 
+for the next pattern in the stream, which is the only case the stream content is searched.
+Every byte is visited a constant number of times, so framing is O(n).
 """
 
 __author__ = "Zhi Zi"
@@ -41,14 +53,17 @@ from typing import Callable, Optional
 # third-party libs
 
 # this package
+from .bounded_queue import BoundedQueue
 from .serial_manager import SerialManager
+from .stream_buffer import StreamBuffer
 
 # Configure logging
 lg = logging.getLogger(__name__)
 
 
 class PatternFramer():
-    def __init__(self, ser_mgr: SerialManager, pattern: bytes) -> None:
+    def __init__(self, ser_mgr: SerialManager, pattern: bytes, max_msg_len: int = 65535,
+                 buffer_size: int = 4096, queue_size: int = 0, queue_policy: str = "block") -> None:
         self.ser_mgr = ser_mgr
         self.pattern = pattern
         self.pattern_size = len(pattern)
@@ -56,8 +71,20 @@ class PatternFramer():
         # By default, 2 bytes are used, so the message length can range from 0 - 65535 bytes.
         self.msg_len_size = 2
         self.msg_len_fmt = '>1H'
-        self.stream_content = b''
-        self.received_packets: Queue[bytes] = Queue()
+        # lengths larger than max_msg_len are treated as corrupted immediately, instead of waiting for that many bytes.
+        self.max_msg_len = max_msg_len
+        # unconsumed bytes in stream are the incomplete frame, or bytes not searched yet when resynchronising.
+        self.stream = StreamBuffer(buffer_size)
+        # the stream is assumed to start at a frame boundary. If not, the first frame fails the pattern check and the 
+        # framer resynchronises.
+        self.is_synced = True
+        # counters
+        self.frames_accepted = 0
+        self.frames_dropped = 0
+        self.frames_resynced = 0
+        self.bytes_dropped = 0
+        # see bounded_queue.py for queue_size and queue_policy, 0 means unbounded.
+        self.received_packets: BoundedQueue[bytes] = BoundedQueue(queue_size, queue_policy)
         self.framer_thread_running = False
         self.framer_thread = Thread(target=self.framer_task)
 
@@ -75,41 +102,111 @@ class PatternFramer():
         self.ser_mgr.stop()
         lg.info("PatternFramer shutdown.")
 
+    @property
+    def stream_content(self) -> bytes:
+        """
+        Copy of the bytes currently held in stream buffer and not framed yet.
+        """
+        return self.stream.content()
+
+    @property
+    def counters(self) -> dict[str, int]:
+        return {
+            "frames_accepted": self.frames_accepted,
+            "frames_dropped": self.frames_dropped,
+            "frames_resynced": self.frames_resynced,
+            "bytes_dropped": self.bytes_dropped,
+            "queue_dropped": self.received_packets.dropped,
+        }
+
     def framer_task(self):
         while self.framer_thread_running:
             try:
                 _, msg = self.ser_mgr.receive(timeout=1.0)
                 if msg:
-                    self.stream_content += msg
-                    self.__handle_new_message()
+                    self.process_stream(msg)
             except Empty:
                 pass
 
-    def __handle_new_message(self):
-        # this will not be empty so accessing by index -1 is safe.
-        packets = self.stream_content.split(self.pattern)
-        for i in range(len(packets)-1):
-            if packets[i]: # ignore empty packets
-                packet = packets[i][self.msg_len_size:]
-                packet_len_bytes = packets[i][:self.msg_len_size]
-                packet_len = struct.unpack(self.msg_len_fmt, packet_len_bytes)
-                if packet_len == len(packet):
-                    # if the packet size matches the content of packet len bytes
-                    self.received_packets.put(packet)
-                else:
-                    lg.warning("Silently discarding a packet because of a length mismatch.")
-                    lg.warning("Discarded: {}".format(packet))
-                    # [TODO]: check if packet + self.pattern + packets[i+1] matches the length
-                    #  and if mismatch, check if packet + self.pattern + packets[i+1] 
-                    #   + self.pattern + packets[i+2] matches the length
-                    #  and if mismatch, check if ... matches the length, until the end of packets.
-        self.stream_content = packets[-1]
+    def process_stream(self, msg: bytes):
+        """
+        Appends msg to stream buffer and frames all complete packets in it.
+        """
+        self.stream.append(msg)
+        self.__handle_new_message()
 
-    def send_frame(self, msg: bytes):
+    def __handle_new_message(self):
+        stream = self.stream
+        while True:
+            if not self.is_synced:
+                if not self.__resync():
+                    break
+            frame_start = stream.start
+            n_pending = stream.end - frame_start
+            if n_pending < self.msg_len_size:
+                break
+            msg_len, = struct.unpack_from(self.msg_len_fmt, stream.buffer, frame_start)
+            if msg_len > self.max_msg_len:
+                lg.warning("Dropping a frame because of an invalid length: {}".format(msg_len))
+                self.__drop_frame()
+                continue
+            msg_start = frame_start + self.msg_len_size
+            msg_end = msg_start + msg_len
+            frame_end = msg_end + self.pattern_size
+            if stream.end < frame_end:
+                # wait for the rest of the frame
+                break
+            if stream.view[msg_end:frame_end] == self.pattern:
+                self.received_packets.put_while(bytes(stream.view[msg_start:msg_end]),
+                                                lambda: self.framer_thread_running)
+                self.frames_accepted += 1
+                stream.consume(frame_end)
+            else:
+                lg.warning("Dropping a frame because of a length mismatch, pattern not found at the end of frame.")
+                self.__drop_frame()
+
+    def __drop_frame(self):
+        """
+        Drops the frame at stream.start and enters resynchronising state.
+        """
+        self.frames_dropped += 1
+        self.is_synced = False
+        # skip the first byte of the frame, so the search will not find the same position again.
+        self.bytes_dropped += 1
+        self.stream.consume(self.stream.start + 1)
+
+    def __resync(self) -> bool:
+        """
+        Searches for the next pattern in the stream, and consumes everything up to the end of the pattern.
+        Returns True if synced again, False if more data is needed.
+        """
+        stream = self.stream
+        pattern_pos = stream.buffer.find(self.pattern, stream.start, stream.end)
+        if pattern_pos < 0:
+            # the last pattern_size - 1 bytes may be the beginning of a pattern, keep them for the next search.
+            keep_from = max(stream.start, stream.end - self.pattern_size + 1)
+            self.bytes_dropped += keep_from - stream.start
+            stream.consume(keep_from)
+            return False
+        frame_start = pattern_pos + self.pattern_size
+        self.bytes_dropped += frame_start - stream.start
+        stream.consume(frame_start)
+        self.is_synced = True
+        self.frames_resynced += 1
+        lg.info("PatternFramer resynchronised, {} bytes dropped in total.".format(self.bytes_dropped))
+        return True
+
+    def encode_frame(self, msg: bytes) -> bytes:
+        """
+        Returns the packet to write to the stream for msg, i.e. length + msg + pattern.
+        """
         msg_len = len(msg)
         msg_len_bytes = struct.pack(self.msg_len_fmt, msg_len)
         assert self.msg_len_size == len(msg_len_bytes)
-        packet = msg_len_bytes + msg + self.pattern
+        return msg_len_bytes + msg + self.pattern
+
+    def send_frame(self, msg: bytes):
+        packet = self.encode_frame(msg)
         self.ser_mgr.send(packet)
 
     def receive_frame(self, timeout: float | None = None):
@@ -119,3 +216,14 @@ class PatternFramer():
             return item
         except Empty:
             return None
+
+    def clean_up(self):
+        """
+        Empties packets buffer and stream buffer, same as COBSFramer.clean_up.
+        The framer is assumed to be synced after clean up.
+        """
+        lg.info("Cleaning up framer buffer.")
+        self.received_packets.clear()
+        self.stream.clear()
+        self.is_synced = True
+        lg.info("Framer buffer is cleaned.")
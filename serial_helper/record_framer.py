@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+"""record_framer.py:
+Many data acquisition devices, such as ADCs and boxcar integrators, stream fixed-size binary records without any
+frame boundary marker, e.g. 512 int32 samples per record.
+Treating every read from the port as one record does not work: depending on the OS and the driver, a read may return
+part of a record, or several records sticked together, and these data are lost if the read size does not match.
+
+This package provides the RecordFramer class to read from a SerialManager and reassemble exact record_size bytes
+records across reads. All complete records in the stream buffer are decoded as one batch with np.frombuffer into a
+preallocated array, and scaled in the same vectorised operation, so the cost per sample is a few ns even at 921600
+baud and above.
+
+Since the records carry no boundary information, the framer assumes the stream starts at a record boundary.
+Optionally, resync_gap can be set to the idle time after which the device is known to have finished a record, e.g.
+the device sends records in bursts. If a new message arrives more than resync_gap seconds after the previous one,
+incomplete bytes left from the previous burst are dropped and the framer restarts at the new message.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+# std libs
+import logging
+from queue import Empty
+from threading import Thread
+from typing import Callable
+# third-party libs
+import numpy as np
+# this package
+from .bounded_queue import BoundedQueue
+from .serial_manager import SerialManager
+from .stream_buffer import StreamBuffer
+
+# Configure logging
+lg = logging.getLogger(__name__)
+
+
+class RecordFramer():
+    """
+    Reassembles fixed-size records and decodes them as (n_records, items_per_record) arrays of
+    raw_value * scale + offset.
+
+    If callback is given, it is called from framer thread with every decoded batch. The batch is a view of a
+    preallocated array, which is overwritten by the next batch, so copy it if it is needed after the callback returns.
+    If callback is None, a copy of every batch is put in received_packets, to be consumed with receive_batch.
+    In both cases latest_record holds the last decoded record.
+    queue_size and queue_policy bound received_packets, see bounded_queue.py. 0 means unbounded.
+    """
+
+    def __init__(self, ser_mgr: SerialManager, record_size: int, dtype: str | np.dtype = '<u2',
+                 scale: float = 1.0, offset: float = 0.0, out_dtype: str | np.dtype = np.float64,
+                 resync_gap: float | None = None, batch_size: int = 16,
+                 callback: Callable[[np.ndarray], None] | None = None,
+                 queue_size: int = 0, queue_policy: str = "block") -> None:
+        self.ser_mgr = ser_mgr
+        self.record_size = record_size
+        self.record_dtype = np.dtype(dtype)
+        if record_size % self.record_dtype.itemsize:
+            raise ValueError("record_size {} is not a multiple of item size of {}".format(
+                record_size, self.record_dtype))
+        self.items_per_record = record_size // self.record_dtype.itemsize
+        self.scale = scale
+        self.offset = offset
+        self.resync_gap_ns = None if resync_gap is None else int(resync_gap * 1e9)
+        self.callback = callback
+        self.stream = StreamBuffer(record_size * batch_size)
+        # preallocated output, grows if more than batch_size records arrive at once.
+        self.decoded = np.zeros((batch_size, self.items_per_record), dtype=out_dtype)
+        self.latest_record = np.zeros(self.items_per_record, dtype=out_dtype)
+        self.last_message_time_ns = None
+        # counters
+        self.records_received = 0
+        self.bytes_dropped = 0
+        self.received_packets: BoundedQueue[np.ndarray] = BoundedQueue(queue_size, queue_policy)
+        self.framer_thread_running = False
+        self.framer_thread = Thread(target=self.framer_task)
+
+    def start(self):
+        lg.info("Starting RecordFramer")
+        self.ser_mgr.start()
+        self.framer_thread_running = True
+        self.framer_thread.start()
+        lg.info("RecordFramer started")
+
+    def stop(self):
+        lg.info("Gracefully shutting down RecordFramer")
+        self.framer_thread_running = False
+        self.framer_thread.join()
+        self.ser_mgr.stop()
+        lg.info("RecordFramer shutdown.")
+
+    @property
+    def counters(self) -> dict[str, int]:
+        return {
+            "records_received": self.records_received,
+            "bytes_dropped": self.bytes_dropped,
+            "queue_dropped": self.received_packets.dropped,
+        }
+
+    def framer_task(self):
+        while self.framer_thread_running:
+            try:
+                t, msg = self.ser_mgr.receive(timeout=1.0)
+                if msg:
+                    self.process_stream(msg, t)
+            except Empty:
+                pass
+
+    def process_stream(self, msg: bytes, time_ns: int | None = None):
+        """
+        Appends msg to stream buffer and decodes all complete records in it.
+        time_ns is the time msg is received, only used if resync_gap is set.
+        """
+        if self.resync_gap_ns is not None and time_ns is not None:
+            if self.last_message_time_ns is not None and len(self.stream) \
+                    and time_ns - self.last_message_time_ns > self.resync_gap_ns:
+                lg.warning("Dropping {} bytes of incomplete record after idle gap.".format(len(self.stream)))
+                self.bytes_dropped += len(self.stream)
+                self.stream.clear()
+            self.last_message_time_ns = time_ns
+        self.stream.append(msg)
+        self.__decode_records()
+
+    def __decode_records(self):
+        stream = self.stream
+        n_records = len(stream) // self.record_size
+        if n_records == 0:
+            return
+        if n_records > len(self.decoded):
+            new_size = len(self.decoded)
+            while new_size < n_records:
+                new_size *= 2
+            lg.debug("Growing RecordFramer output to {} records".format(new_size))
+            self.decoded = np.zeros((new_size, self.items_per_record), dtype=self.decoded.dtype)
+        raw = np.frombuffer(stream.buffer, dtype=self.record_dtype, count=n_records * self.items_per_record,
+                            offset=stream.start).reshape(n_records, self.items_per_record)
+        batch = self.decoded[:n_records]
+        np.multiply(raw, self.scale, out=batch, casting='unsafe')
+        if self.offset:
+            batch += self.offset
+        # drop the reference to stream buffer, the bytes are reused by later messages.
+        del raw
+        stream.consume(stream.start + n_records * self.record_size)
+        self.latest_record[:] = batch[-1]
+        self.records_received += n_records
+        if self.callback is not None:
+            self.callback(batch)
+        else:
+            self.received_packets.put_while(batch.copy(), lambda: self.framer_thread_running)
+
+    def receive_batch(self, timeout: float | None = None) -> np.ndarray | None:
+        """
+        Returns the next batch of decoded records as an (n_records, items_per_record) array, or None if timeout.
+        """
+        try:
+            item = self.received_packets.get(timeout=timeout)
+            self.received_packets.task_done()
+            return item
+        except Empty:
+            return None
+
+    def clean_up(self):
+        """
+        Empties batches buffer and stream buffer. The next byte received is treated as the start of a record.
+        """
+        lg.info("Cleaning up framer buffer.")
+        self.received_packets.clear()
+        self.stream.clear()
+        lg.info("Framer buffer is cleaned.")
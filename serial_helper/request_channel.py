@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+"""request_channel.py:
+This module provides the RequestChannel class to match reply frames to the requests that caused them.
+
+Framers only deliver a sequence of frames, so without extra information the host can not tell which command a reply
+belongs to. HALs then have to send one command at a time, wait for the reply and poll, which limits the command rate
+to one round-trip per command, no matter how fast the link is.
+
+RequestChannel adds a small header to every frame:
+
+    SEQ         2 bytes             big-endian sequence ID of the request
+    PAYLOAD     ? bytes             the command or the reply
+
+The device must copy SEQ of a request to the head of its reply. The host can then keep several requests outstanding
+(pipelining), and replies may even arrive out of order.
+request(payload) returns a concurrent.futures.Future immediately. The future resolves to the reply payload, or raises
+TimeoutError if no reply arrives in time. At most max_outstanding requests are in flight, request blocks when the
+window is full. A request whose future is cancelled still holds its place in the window until its reply arrives or
+it times out, the reply is then discarded.
+
+Frames with a SEQ that no request is waiting for (late replies, or data sent by the device on its own) are put into
+unsolicited_frames as (SEQ, PAYLOAD) tuples. If nobody consumes them, bound the queue with unsolicited_queue_size,
+the oldest frames are then dropped.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+# std libs
+import logging
+import struct
+import time
+from concurrent.futures import Future
+from threading import Thread, Lock, BoundedSemaphore
+# this package
+from .bounded_queue import BoundedQueue
+from .cobs_framer import COBSFramer
+from .pattern_framer import PatternFramer
+
+# Configure logging
+lg = logging.getLogger(__name__)
+
+
+class RequestChannel:
+    def __init__(self, framer: COBSFramer | PatternFramer,
+                 max_outstanding: int = 8, timeout: float = 1.0, unsolicited_queue_size: int = 0) -> None:
+        self.framer = framer
+        self.seq_fmt = '>1H'
+        self.seq_size = struct.calcsize(self.seq_fmt)
+        self.max_outstanding = max_outstanding
+        # default timeout of each request, unit in s.
+        self.timeout = timeout
+        self.next_seq = 0
+        # seq -> (future, deadline)
+        self.pending: dict[int, tuple[Future, float]] = dict()
+        self.pending_lock = Lock()
+        self.window = BoundedSemaphore(max_outstanding)
+        # never blocks, or the dispatcher would stop matching replies.
+        self.unsolicited_frames: BoundedQueue[tuple[int, bytes]] = BoundedQueue(unsolicited_queue_size, "drop_oldest")
+        # counters
+        self.requests_sent = 0
+        self.replies_matched = 0
+        self.requests_timed_out = 0
+        self.dispatcher_thread_running = False
+        self.dispatcher_thread = Thread(target=self.dispatcher_task)
+
+    def start(self):
+        lg.info("Starting RequestChannel")
+        self.framer.start()
+        self.dispatcher_thread_running = True
+        self.dispatcher_thread.start()
+        lg.info("RequestChannel started")
+
+    def stop(self):
+        lg.info("Gracefully shutting down RequestChannel")
+        self.dispatcher_thread_running = False
+        self.dispatcher_thread.join()
+        self.framer.stop()
+        # fail all requests left, so no one waits forever.
+        with self.pending_lock:
+            pending = list(self.pending.values())
+            self.pending.clear()
+        for future, _ in pending:
+            self.window.release()
+            if future.set_running_or_notify_cancel():
+                future.set_exception(ConnectionError("RequestChannel stopped"))
+        lg.info("RequestChannel shutdown.")
+
+    @property
+    def counters(self) -> dict[str, int]:
+        return {
+            "requests_sent": self.requests_sent,
+            "replies_matched": self.replies_matched,
+            "requests_timed_out": self.requests_timed_out,
+            "requests_outstanding": len(self.pending),
+            "unsolicited_dropped": self.unsolicited_frames.dropped,
+        }
+
+    def request(self, payload: bytes, timeout: float | None = None) -> Future:
+        """
+        Sends payload as a request and returns a future of the reply payload.
+        Blocks if max_outstanding requests are already in flight, until one of them is replied or timed out.
+        timeout is counted from the time the request is sent, default to self.timeout.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        self.window.acquire()
+        future = Future()
+        with self.pending_lock:
+            # skip seq still in use, there are at most max_outstanding of them so this ends quickly.
+            while self.next_seq in self.pending:
+                self.next_seq = (self.next_seq + 1) % 65536
+            seq = self.next_seq
+            self.next_seq = (self.next_seq + 1) % 65536
+            self.pending[seq] = (future, time.monotonic() + timeout)
+            # sending under the lock keeps frames on the wire in seq order.
+            packet = self.framer.encode_frame(struct.pack(self.seq_fmt, seq) + payload)
+            self.framer.ser_mgr.send(packet)
+            self.requests_sent += 1
+        return future
+
+    def dispatcher_task(self):
+        while self.dispatcher_thread_running:
+            # wake up regularly to expire requests even if nothing arrives.
+            frame = self.framer.receive_frame(timeout=self.__time_to_next_deadline())
+            if frame is not None:
+                self.__dispatch(frame)
+            self.__expire_requests()
+
+    def __time_to_next_deadline(self) -> float:
+        with self.pending_lock:
+            if not self.pending:
+                return 0.1
+            next_deadline = min(deadline for _, deadline in self.pending.values())
+        return min(0.1, max(0.0, next_deadline - time.monotonic()))
+
+    def __dispatch(self, frame: bytes):
+        if len(frame) < self.seq_size:
+            lg.warning("Discarding a frame too short to hold a sequence ID: {}".format(frame))
+            return
+        seq, = struct.unpack_from(self.seq_fmt, frame)
+        payload = frame[self.seq_size:]
+        with self.pending_lock:
+            item = self.pending.pop(seq, None)
+        if item is None:
+            self.unsolicited_frames.put((seq, payload))
+            return
+        future, _ = item
+        self.replies_matched += 1
+        self.window.release()
+        # the caller may have cancelled it, resolving it then would raise in the dispatcher
+        if future.set_running_or_notify_cancel():
+            future.set_result(payload)
+
+    def __expire_requests(self):
+        now = time.monotonic()
+        with self.pending_lock:
+            expired = [seq for seq, (_, deadline) in self.pending.items() if deadline <= now]
+            expired_items = [self.pending.pop(seq) for seq in expired]
+        for seq, (future, _) in zip(expired, expired_items):
+            lg.warning("Request {} timed out.".format(seq))
+            self.requests_timed_out += 1
+            self.window.release()
+            if future.set_running_or_notify_cancel():
+                future.set_exception(TimeoutError("No reply for request {}".format(seq)))
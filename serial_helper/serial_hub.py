@@ -0,0 +1,425 @@
+# -*- coding: utf-8 -*-
+
+"""serial_hub.py:
+This module provides the SerialHub class to service many serial ports from a single I/O thread.
+
+Every SerialManager runs a read thread and a write thread, and every framer adds another one. With dozens of devices in
+a setup, most of these threads just sleep, but every wake-up is a context switch, and the latency of a reply depends on
+how soon the OS schedules the right thread.
+SerialHub instead registers the file descriptors of all its ports with one selectors based I/O thread:
+
+1. Incoming bytes are read as soon as the port is readable, and handed to the parser of the port (a framer created
+with ser_mgr=None, like the async framers do) in the same thread, or put into received_queue of the port if there's no
+parser. So no framer threads are needed either.
+
+2. Writes are queued per port and drained by the I/O thread. For real serial ports, the non-blocking fd is written
+directly and the thread waits for writability if the driver buffer is full, so a slow port never holds up the others.
+
+Ports that do not provide a file descriptor (Windows COM ports, SerialMocker without use_fileno) cannot be selected.
+Each of them gets a reader thread blocking in ser.read, like SerialManager in "blocking" read_mode, and a writer thread
+for blocking writes, so they neither make the I/O thread spin on in_waiting nor hold up the other ports with a slow
+write. On Windows, where no port has a file descriptor, the hub thus runs two threads per port, like SerialManager,
+and only saves the framer threads.
+
+add_port returns a HubPort, which has the same receive/send/sent_id_queue interface as SerialManager, so it can be used
+wherever a SerialManager is expected:
+
+    hub = SerialHub()
+    framer = COBSFramer(None)
+    port = hub.add_port("/dev/ttyACM0", baudrate=115200, parser=framer)
+    hub.start()
+    framer.send_frame(b'hello')
+    reply = framer.receive_frame(timeout=1.0)
+
+Do not start the framer of a port, its thread would compete with the hub for the messages. Ports can be added and
+removed while the hub is running.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+# std libs
+import io
+import logging
+import os
+import selectors
+import socket
+import time
+from queue import Queue, Empty
+from threading import Thread, Lock, current_thread
+
+# third-party libs
+import serial
+# this package
+from .bounded_queue import BoundedQueue
+from .serial_metrics import LatencyHistogram
+
+# Configure logging
+lg = logging.getLogger(__name__)
+
+
+class HubPort:
+    """
+    A serial port serviced by a SerialHub. All methods except receive and send are called from the I/O thread, or
+    from the reader and writer threads of the port if it has no file descriptor.
+    """
+
+    def __init__(self, hub: "SerialHub", ser, parser=None,
+                 received_queue_size: int = 0, received_queue_policy: str = "block") -> None:
+        self.hub = hub
+        self.ser = ser
+        self.com_port = ser.port
+        # parser gets the incoming bytes through process_stream, and writes through this port.
+        self.parser = parser
+        if parser is not None and parser.ser_mgr is None:
+            parser.ser_mgr = self
+        self.received_queue: BoundedQueue[tuple[int | None, bytes | None]] = BoundedQueue(
+            received_queue_size, received_queue_policy)
+        # (message, message_id, time_ns when send is called)
+        self.to_send_queue: Queue[tuple[bytes, int, int] | None] = Queue()
+        self.sent_id_queue = Queue()
+        # fds registered with the selector, None if the port is polled.
+        self.read_fd = None
+        self.write_fd = None
+        self.original_ser_timeout = None
+        # the message being written and the bytes of it still to write, if the driver buffer was full.
+        self.writing = None
+        self.to_write = None
+        # counters
+        self.bytes_received = 0
+        self.messages_received = 0
+        self.bytes_sent = 0
+        self.messages_sent = 0
+        self.parser_errors = 0
+        self.write_latency = LatencyHistogram()
+        # reader and writer threads, only for ports without file descriptor
+        self.threads_running = False
+        self.read_thread: Thread | None = None
+        self.write_thread: Thread | None = None
+
+    def start(self):
+        # the port runs as long as the hub does, kept for compatibility with SerialManager.
+        pass
+
+    def stop(self):
+        pass
+
+    @property
+    def counters(self) -> dict[str, int]:
+        return {
+            "bytes_received": self.bytes_received,
+            "messages_received": self.messages_received,
+            "bytes_sent": self.bytes_sent,
+            "messages_sent": self.messages_sent,
+            "received_dropped": self.received_queue.dropped,
+            "parser_errors": self.parser_errors,
+        }
+
+    @property
+    def gauges(self) -> dict[str, int]:
+        return {
+            "received_queue_depth": self.received_queue.qsize(),
+            "to_send_queue_depth": self.to_send_queue.qsize(),
+        }
+
+    @property
+    def histograms(self) -> dict[str, LatencyHistogram]:
+        return {
+            "write_latency_seconds": self.write_latency,
+        }
+
+    def receive(self, timeout: float | None = None) -> tuple[int, bytes]:
+        """
+        Same as SerialManager.receive. Only used if the port has no parser.
+        """
+        try:
+            item = self.received_queue.get(timeout=timeout)
+            self.received_queue.task_done()
+            return item
+        except Empty:
+            return (None, None)
+
+    def send(self, message: bytes, message_id: int = 0) -> int:
+        """
+        Same as SerialManager.send, the message is written by the I/O thread of the hub.
+        """
+        if not message:
+            return 0
+        self.to_send_queue.put((message, message_id, time.time_ns()))
+        self.hub.request_write(self)
+        return len(message)
+
+    def is_serviced(self) -> bool:
+        """Whether the threads reading the port are running."""
+        return self.threads_running if self.read_thread is not None else self.hub.io_thread_running
+
+    def start_threads(self, read_timeout: float):
+        """Starts the reader and writer threads of a port without file descriptor."""
+        # reads block in the driver until a byte arrives or read_timeout expires, then the running flag is checked.
+        self.original_ser_timeout = self.ser.timeout
+        self.ser.timeout = read_timeout
+        self.threads_running = True
+        self.read_thread = Thread(target=self.read_task)
+        self.write_thread = Thread(target=self.write_task)
+        self.read_thread.start()
+        self.write_thread.start()
+
+    def stop_threads(self):
+        """Stops the reader and writer threads, this may block up to the read timeout."""
+        self.threads_running = False
+        # None closes the send queue, like in SerialManager.
+        self.to_send_queue.put(None)
+        for thread in (self.read_thread, self.write_thread):
+            if thread is not current_thread():
+                thread.join()
+        self.ser.timeout = self.original_ser_timeout
+
+    def read_task(self):
+        while self.threads_running:
+            if not self.handle_read():
+                self.hub.remove_port(self)
+                return
+
+    def write_task(self):
+        while True:
+            self.writing = self.to_send_queue.get()
+            if self.writing is None:
+                self.to_send_queue.task_done()
+                return
+            try:
+                self.ser.write(self.writing[0])
+            except (serial.SerialException, OSError) as e:
+                lg.error("Error writing port {}, removing it from hub: {}".format(self.com_port, e))
+                self.hub.remove_port(self)
+                return
+            self.__message_written()
+
+    def get_fileno(self) -> int | None:
+        try:
+            return self.ser.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            return None
+
+    def handle_read(self) -> bool:
+        """
+        Reads what's available and dispatches it, in the reader thread of a port without file descriptor it waits for
+        the first byte up to the read timeout. Returns False if the port failed and must be removed.
+        """
+        try:
+            new_data = self.ser.read(max(1, self.ser.in_waiting))
+        except serial.SerialException as e:
+            lg.error("Error reading port {}, removing it from hub: {}".format(self.com_port, e))
+            return False
+        if not new_data:
+            return True
+        current_time_ns = time.time_ns()
+        self.bytes_received += len(new_data)
+        self.messages_received += 1
+        if self.parser is None:
+            # a full "block" queue holds up only this port, and only while it is serviced.
+            self.received_queue.put_while((current_time_ns, new_data), self.is_serviced)
+            return True
+        try:
+            self.parser.process_stream(new_data)
+        except Exception as e:
+            # a broken parser must not stop the other ports.
+            self.parser_errors += 1
+            lg.exception("Parser of port {} failed: {}".format(self.com_port, e))
+        return True
+
+    def handle_write(self) -> bool:
+        """
+        Writes queued messages until the queue is empty or the driver buffer is full.
+        Returns True if there are bytes left to write, then the hub waits for the port to be writable.
+        """
+        while True:
+            if self.to_write is None:
+                try:
+                    self.writing = self.to_send_queue.get_nowait()
+                except Empty:
+                    return False
+                self.to_write = memoryview(self.writing[0])
+            if self.write_fd is not None:
+                try:
+                    n = os.write(self.write_fd, self.to_write)
+                except BlockingIOError:
+                    n = 0
+                self.to_write = self.to_write[n:]
+                if self.to_write:
+                    return True
+            else:
+                self.ser.write(self.writing[0])
+            self.__message_written()
+
+    def __message_written(self):
+        message, message_id, queued_time_ns = self.writing
+        current_time_ns = time.time_ns()
+        self.bytes_sent += len(message)
+        self.messages_sent += 1
+        self.write_latency.observe((current_time_ns - queued_time_ns) / 1e9)
+        if message_id:
+            self.sent_id_queue.put((current_time_ns, message_id))
+        self.to_send_queue.task_done()
+        self.writing = None
+        self.to_write = None
+
+
+class SerialHub:
+    def __init__(self, read_timeout: float = 0.1) -> None:
+        # read timeout of ports without file descriptor, i.e. how soon their reader threads stop
+        self.read_timeout = read_timeout
+        self.selector = selectors.DefaultSelector()
+        # a socket pair wakes the I/O thread from select, it works with selectors on every platform.
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.wake_r.setblocking(False)
+        self.wake_w.setblocking(False)
+        self.selector.register(self.wake_r, selectors.EVENT_READ, None)
+        self.ports: list[HubPort] = []
+        # changes requested by other threads, applied by the I/O thread.
+        self.lock = Lock()
+        self.ports_to_add: list[HubPort] = []
+        self.ports_to_remove: list[HubPort] = []
+        self.ports_to_write: set[HubPort] = set()
+        # ports waiting for EVENT_WRITE
+        self.ports_blocked: set[HubPort] = set()
+        self.io_thread_running = False
+        self.io_thread = Thread(target=self.io_task)
+
+    def add_port(self, com_port: str | None = None, baudrate: int = 115200, ser=None, parser=None,
+                 received_queue_size: int = 0, received_queue_policy: str = "block") -> HubPort:
+        """
+        Opens com_port, or uses the given ser object (e.g. a SerialMocker), and services it in the I/O thread.
+        parser is a framer created with ser_mgr=None, see module doc.
+        """
+        if ser is None:
+            ser = serial.Serial(com_port, baudrate=baudrate, timeout=0)
+        elif not ser.is_open:
+            ser.open()
+        port = HubPort(self, ser, parser, received_queue_size, received_queue_policy)
+        with self.lock:
+            self.ports_to_add.append(port)
+        self.wake()
+        lg.info("Added port {} to SerialHub".format(port.com_port))
+        return port
+
+    def remove_port(self, port: HubPort):
+        """
+        Stops servicing port and closes it. Messages not written yet are discarded.
+        """
+        with self.lock:
+            self.ports_to_remove.append(port)
+        self.wake()
+
+    def start(self):
+        lg.info("Starting SerialHub")
+        self.io_thread_running = True
+        self.io_thread.start()
+
+    def stop(self):
+        lg.info("Gracefully shutting down SerialHub")
+        self.io_thread_running = False
+        self.wake()
+        self.io_thread.join()
+        with self.lock:
+            self.ports_to_remove.extend(self.ports)
+        self.__apply_changes()
+        self.selector.close()
+        self.wake_r.close()
+        self.wake_w.close()
+        lg.info("SerialHub shutdown.")
+
+    def wake(self):
+        try:
+            self.wake_w.send(b'\x00')
+        except BlockingIOError:
+            # already woken up
+            pass
+
+    def request_write(self, port: HubPort):
+        with self.lock:
+            self.ports_to_write.add(port)
+        self.wake()
+
+    def io_task(self):
+        while self.io_thread_running:
+            # changes and writes requested before the last wake-up, ports are registered before their writes.
+            self.__apply_changes()
+            with self.lock:
+                ports_to_write = self.ports_to_write
+                self.ports_to_write = set()
+            for port in ports_to_write:
+                # ports without file descriptor are written by their own writer threads
+                if port in self.ports and port.read_fd is not None and port not in self.ports_blocked:
+                    self.__write(port)
+            for key, mask in self.selector.select():
+                port = key.data
+                if port is None:
+                    self.__drain_wake()
+                    continue
+                if mask & selectors.EVENT_READ:
+                    if not port.handle_read():
+                        self.remove_port(port)
+                if mask & selectors.EVENT_WRITE:
+                    self.__write(port)
+
+    def __drain_wake(self):
+        try:
+            while self.wake_r.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def __write(self, port: HubPort):
+        try:
+            blocked = port.handle_write()
+        except (serial.SerialException, OSError) as e:
+            lg.error("Error writing port {}, removing it from hub: {}".format(port.com_port, e))
+            self.remove_port(port)
+            return
+        if blocked and port not in self.ports_blocked:
+            self.ports_blocked.add(port)
+            self.selector.modify(port.read_fd, selectors.EVENT_READ | selectors.EVENT_WRITE, port)
+        elif not blocked and port in self.ports_blocked:
+            self.ports_blocked.discard(port)
+            self.selector.modify(port.read_fd, selectors.EVENT_READ, port)
+
+    def __apply_changes(self):
+        with self.lock:
+            ports_to_add, self.ports_to_add = self.ports_to_add, []
+            ports_to_remove, self.ports_to_remove = self.ports_to_remove, []
+        for port in ports_to_add:
+            fd = port.get_fileno() if os.name == 'posix' else None
+            if fd is not None:
+                # reads in the I/O thread must never block.
+                port.original_ser_timeout = port.ser.timeout
+                port.ser.timeout = 0
+                port.read_fd = fd
+                self.selector.register(fd, selectors.EVENT_READ, port)
+                if isinstance(port.ser, serial.Serial):
+                    # pySerial opens POSIX ports with O_NONBLOCK, so the same fd can be written without blocking.
+                    port.write_fd = fd
+            else:
+                lg.info("Port {} does not provide a file descriptor, reading it in its own thread.".format(
+                    port.com_port))
+                port.start_threads(self.read_timeout)
+            self.ports.append(port)
+            # messages sent before the port is registered
+            with self.lock:
+                self.ports_to_write.add(port)
+        for port in ports_to_remove:
+            if port not in self.ports:
+                continue
+            self.ports.remove(port)
+            if port.read_fd is not None:
+                self.selector.unregister(port.read_fd)
+                port.ser.timeout = port.original_ser_timeout
+                port.read_fd = None
+                port.write_fd = None
+            else:
+                port.stop_threads()
+            self.ports_blocked.discard(port)
+            port.ser.close()
+            # wake up receivers waiting forever, the same way AsyncSerialManager does.
+            port.received_queue.force_put((None, None))
+            lg.info("Removed port {} from SerialHub".format(port.com_port))
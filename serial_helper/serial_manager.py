@@ -16,6 +16,8 @@ buffer in time to avoid data loss and corruption.
 The driver input buffer also does not include a timestamp to indicate the time when a message is received, which is 
 quite inconvenient for real-time controlling and other time-critical applications. 
 So I also added a timestamp to each message received/sent, so the user can track the timeline of every message.
+SerialManager also counts bytes and messages in both directions, and the latency from .send to the message handed to
+the driver. See serial_metrics.py for collecting them.
 
 Note, despite that in most of the cases data sent togather are read togather and put togather in the same 'message', 
 serial port is inherently packet-less, meaning that we don't have real 'message's like websocket/HTTP. 
@@ -45,6 +47,9 @@ from typing import Callable, Optional
 
 # third-party libs
 import serial
+# this package
+from .bounded_queue import BoundedQueue
+from .serial_metrics import LatencyHistogram
 
 # Configure logging
 lg = logging.getLogger(__name__)
@@ -59,15 +64,50 @@ class SerialManager:
 
     def __init__(self, com_port: str,
                  baudrate: int = 115200, timeout: float = 1.0,
+                 read_mode: str = "blocking", poll_interval: float = 0.001,
+                 clock=time,
+                 received_queue_size: int = 0, received_queue_policy: str = "block",
+                 send_queue_size: int = 0, send_queue_policy: str = "block",
                  ) -> None:
+        """
+        read_mode selects how serial_read_task waits for new bytes:
+            "blocking": blocks inside ser.read until at least 1 byte arrives or the port timeout expires, so the read
+                thread sleeps in the driver instead of spinning on in_waiting. This is the default. Note that .stop 
+                may take up to `timeout` seconds to return because the read thread only checks the running flag
+                between reads.
+            "polling": checks ser.in_waiting and calls read_all, sleeping poll_interval seconds whenever nothing is
+                waiting. Useful for drivers that do not implement read timeouts properly.
+        clock provides time_ns() for the timestamps of messages, default to the time module. Pass the VirtualClock of a
+        SerialMocker to get deterministic timestamps in tests, together with the "blocking" read_mode.
+        received_queue_size and send_queue_size bound the number of messages buffered in each direction, 0 means
+        unbounded. What happens when a queue is full is decided by its policy, see bounded_queue.py. For example,
+        received_queue_policy="drop_oldest" keeps memory bounded if the consumer stalls, at the cost of losing data.
+        With "block" policy, the read thread waits for the consumer only while the manager is running, so .stop
+        returns even if nobody drains the received queue any more, the message being read is then dropped.
+        """
+        if read_mode not in ("blocking", "polling"):
+            raise ValueError("Unknown read_mode: {}".format(read_mode))
         self.com_port = com_port
         self.baudrate = baudrate
         self.timeout = timeout
+        self.read_mode = read_mode
+        self.poll_interval = poll_interval
+        self.clock = clock
         self.ser = None
         # multithread channels and flags
-        self.received_queue: Queue[tuple[int | None, bytes | None]] = Queue()
-        self.to_send_queue: Queue[tuple[bytes, int] | None] = Queue()
+        self.received_queue: BoundedQueue[tuple[int | None, bytes | None]] = BoundedQueue(
+            received_queue_size, received_queue_policy)
+        # (message, message_id, time_ns when send is called)
+        self.to_send_queue: BoundedQueue[tuple[bytes, int, int] | None] = BoundedQueue(
+            send_queue_size, send_queue_policy)
         self.sent_id_queue = Queue()
+        # counters
+        self.bytes_received = 0
+        self.messages_received = 0
+        self.bytes_sent = 0
+        self.messages_sent = 0
+        # time from .send to the message handed to the driver, which is when its message_id is confirmed.
+        self.write_latency = LatencyHistogram()
         self.is_manager_running = False
         self.serial_read_thread = Thread(target=self.serial_read_task)
         self.serial_write_thread = Thread(target=self.serial_write_task)
@@ -105,6 +145,9 @@ class SerialManager:
                        These items will be wrote to port immediately after start.\
                        If this is not intended, consider clear the queue\
                        before calling start".format(n_items))
+        if self.read_mode == "blocking" and self.ser.timeout is None:
+            lg.warning("Serial port has no read timeout, blocking read thread can only stop after next byte arrives. \
+                       Consider setting a timeout for the port.")
         # start the threads
         lg.info("Starting SerialManager R/W threads.")
         self.is_manager_running = True
@@ -116,13 +159,37 @@ class SerialManager:
         self.is_manager_running = False
         # put None in the queue to indicate closing of the send queue because python queue doesn't have a explicit way
         # to express releasing of a channel.
-        self.to_send_queue.put(None)
+        self.to_send_queue.force_put(None)
         # wait for threads to finish last jobs
         self.serial_read_thread.join()
         self.serial_write_thread.join()
         # close serial port
         self.ser.close()
 
+    @property
+    def counters(self) -> dict[str, int]:
+        return {
+            "bytes_received": self.bytes_received,
+            "messages_received": self.messages_received,
+            "bytes_sent": self.bytes_sent,
+            "messages_sent": self.messages_sent,
+            "received_dropped": self.received_queue.dropped,
+            "send_dropped": self.to_send_queue.dropped,
+        }
+
+    @property
+    def gauges(self) -> dict[str, int]:
+        return {
+            "received_queue_depth": self.received_queue.qsize(),
+            "to_send_queue_depth": self.to_send_queue.qsize(),
+        }
+
+    @property
+    def histograms(self) -> dict[str, LatencyHistogram]:
+        return {
+            "write_latency_seconds": self.write_latency,
+        }
+
     def receive(self, timeout: float | None = None) -> tuple[int, bytes]:
         """
         Gets earlist message in the buffer queue.
@@ -146,33 +213,68 @@ class SerialManager:
     def send(self, message: bytes, message_id: int = 0) -> int:
         """
         Adds a message to the send queue. If message is empty, nothing happens.
-        This method will not block. If you need to wait for confirmation, use message_id.
+        This method will not block, unless the send queue is bounded with "block" policy and full. If you need to wait
+        for confirmation, use message_id.
+        If the send queue is full and the message is dropped by its policy, the message_id is never confirmed.
 
         Optional: a message_id number can be passed in. If the message_id is non-zero, after the message is sent, the message_id
             and a timestamp is put into a message_id_queue. The user can monitor the message_id_queue to check if a specific 
             message has been written to serial port and when is the writing done.
         """
         if message:
-            self.to_send_queue.put((message, message_id))
+            self.to_send_queue.put((message, message_id, self.clock.time_ns()))
             return len(message)
         else:
             return 0
 
+    def __is_running(self) -> bool:
+        return self.is_manager_running
+
     def serial_read_task(self):
+        if self.read_mode == "blocking":
+            self.blocking_read_loop()
+        else:
+            self.polling_read_loop()
+
+    def blocking_read_loop(self):
+        while self.is_manager_running:
+            # read blocks until at least 1 byte arrives or the port timeout expires, the thread consumes no CPU while
+            # waiting. Everything that is already in the driver buffer is read in the same call.
+            new_data = self.ser.read(max(1, self.ser.in_waiting))
+            if not new_data:
+                # timeout, nothing received. Go back to check if the manager is still running.
+                continue
+            current_time_ns = self.clock.time_ns()
+            # bytes that arrived while the first read was returning belong to the same burst.
+            n_remaining = self.ser.in_waiting
+            if n_remaining:
+                new_data += self.ser.read(n_remaining)
+            self.bytes_received += len(new_data)
+            self.messages_received += 1
+            self.received_queue.put_while((current_time_ns, new_data), self.__is_running)
+
+    def polling_read_loop(self):
         while self.is_manager_running:
             if self.ser.in_waiting:
                 new_data = self.ser.read_all()
-                current_time_ns = time.time_ns()
-                self.received_queue.put((current_time_ns, new_data))
+                current_time_ns = self.clock.time_ns()
+                self.bytes_received += len(new_data)
+                self.messages_received += 1
+                self.received_queue.put_while((current_time_ns, new_data), self.__is_running)
+            else:
+                time.sleep(self.poll_interval)
 
     def serial_write_task(self):
         while self.is_manager_running:
             send_task = self.to_send_queue.get()
             if send_task:
-                to_write, message_id = send_task[0], send_task[1]
+                to_write, message_id, queued_time_ns = send_task
                 self.ser.write(to_write)
+                current_time_ns = self.clock.time_ns()
+                self.bytes_sent += len(to_write)
+                self.messages_sent += 1
+                self.write_latency.observe((current_time_ns - queued_time_ns) / 1e9)
                 if message_id:
-                    current_time_ns = time.time_ns()
                     self.sent_id_queue.put((current_time_ns, message_id))
                 self.to_send_queue.task_done()
             else:
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+"""serial_metrics.py:
+This module provides tools to aggregate the counters kept by SerialManager and framers, so the user can tell whether a
+slow experiment is limited by the device, the serial link or the Python threads.
+
+Every component keeps plain integer counters that are incremented in its own thread, which costs almost nothing.
+Components expose them through the following optional properties:
+
+    counters    dict[str, int], monotonically increasing totals, e.g. bytes_received, frames_accepted
+    gauges      dict[str, int | float], current values, e.g. received_queue_depth
+    histograms  dict[str, LatencyHistogram], distributions, e.g. write_latency_seconds
+
+SerialManager, COBSFramer, PatternFramer, RecordFramer and RequestChannel all provide counters.
+
+MetricsRegistry collects them from named sources. registry.snapshot() returns a dict of all values together with the
+rate of every counter per second since the previous snapshot, and registry.prometheus_text() renders them in the
+Prometheus text exposition format. Optionally, registry.start_server(port) serves the text at
+http://127.0.0.1:port/metrics in a background thread, so the numbers can be watched with curl or scraped by Prometheus
+while the experiment runs.
+
+    registry = MetricsRegistry()
+    registry.register("adc", ser_mgr)
+    registry.register("adc_framer", framer)
+    print(registry.snapshot()["adc"]["rates"]["bytes_received"])
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+# std libs
+import logging
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread, Lock
+
+# Configure logging
+lg = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """
+    Histogram with fixed bucket upper bounds in seconds, observe costs one bisect and two additions.
+    Observations larger than the last bound are counted in the +Inf bucket.
+    """
+
+    default_bounds = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                      0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, bounds: tuple[float, ...] = default_bounds) -> None:
+        self.bounds = tuple(bounds)
+        # counts per bucket, not cumulative. The last one is the +Inf bucket.
+        self.bucket_counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        """
+        Returns cumulative bucket counts like Prometheus: buckets[i] is the number of observations <= bounds[i], the
+        last bucket is the +Inf bucket and equals count.
+        """
+        cumulative = []
+        n = 0
+        for c in self.bucket_counts:
+            n += c
+            cumulative.append(n)
+        return {
+            "bounds": self.bounds + (float("inf"),),
+            "buckets": cumulative,
+            "count": self.count,
+            "sum": self.sum,
+        }
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = "serial") -> None:
+        # prefix of metric names in prometheus_text
+        self.prefix = prefix
+        # name -> source
+        self.sources: dict[str, object] = dict()
+        # name -> (time, counters) of the previous snapshot, to compute rates.
+        self.last_counters: dict[str, tuple[float, dict[str, int]]] = dict()
+        self.lock = Lock()
+        self.http_server = None
+        self.http_thread = None
+
+    def register(self, name: str, source: object):
+        with self.lock:
+            self.sources[name] = source
+            self.last_counters[name] = (time.monotonic(), dict(getattr(source, "counters", {})))
+
+    def unregister(self, name: str):
+        with self.lock:
+            self.sources.pop(name, None)
+            self.last_counters.pop(name, None)
+
+    def snapshot(self) -> dict[str, dict]:
+        """
+        Returns {name: {"counters": ..., "rates": ..., "gauges": ..., "histograms": ...}} for every source.
+        rates are counter increments per second since the previous snapshot, or since the source is registered.
+        """
+        result = dict()
+        with self.lock:
+            for name, source in self.sources.items():
+                now = time.monotonic()
+                counters = dict(getattr(source, "counters", {}))
+                t_prev, counters_prev = self.last_counters[name]
+                dt = now - t_prev
+                rates = {k: (v - counters_prev.get(k, 0)) / dt if dt > 0 else 0.0 for k, v in counters.items()}
+                self.last_counters[name] = (now, counters)
+                result[name] = {
+                    "counters": counters,
+                    "rates": rates,
+                    "gauges": dict(getattr(source, "gauges", {})),
+                    "histograms": {k: h.snapshot() for k, h in getattr(source, "histograms", {}).items()},
+                }
+        return result
+
+    def prometheus_text(self) -> str:
+        """
+        Renders all sources in Prometheus text format, the source name is given as label "source".
+        Rates are left to Prometheus, so calling this does not affect the rates of snapshot.
+        """
+        # metric name -> (type, lines), so each metric family is written once with all its sources.
+        families: dict[str, tuple[str, list[str]]] = dict()
+
+        def add(metric: str, metric_type: str, line: str):
+            families.setdefault(metric, (metric_type, []))[1].append(line)
+
+        with self.lock:
+            sources = list(self.sources.items())
+        for name, source in sources:
+            label = 'source="{}"'.format(name.replace('\\', '\\\\').replace('"', '\\"'))
+            for k, v in getattr(source, "counters", {}).items():
+                metric = "{}_{}_total".format(self.prefix, k)
+                add(metric, "counter", "{}{{{}}} {}".format(metric, label, v))
+            for k, v in getattr(source, "gauges", {}).items():
+                metric = "{}_{}".format(self.prefix, k)
+                add(metric, "gauge", "{}{{{}}} {}".format(metric, label, v))
+            for k, h in getattr(source, "histograms", {}).items():
+                metric = "{}_{}".format(self.prefix, k)
+                snapshot = h.snapshot()
+                for bound, n in zip(snapshot["bounds"], snapshot["buckets"]):
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    add(metric, "histogram", '{}_bucket{{{},le="{}"}} {}'.format(metric, label, le, n))
+                add(metric, "histogram", "{}_sum{{{}}} {}".format(metric, label, snapshot["sum"]))
+                add(metric, "histogram", "{}_count{{{}}} {}".format(metric, label, snapshot["count"]))
+        lines = []
+        for metric, (metric_type, metric_lines) in families.items():
+            lines.append("# TYPE {} {}".format(metric, metric_type))
+            lines.extend(metric_lines)
+        return "\n".join(lines) + "\n"
+
+    def start_server(self, port: int = 9108, host: str = "127.0.0.1"):
+        """
+        Serves prometheus_text at http://host:port/metrics in a daemon thread.
+        Only binds to localhost by default, pass host="0.0.0.0" to expose the metrics to other machines.
+        """
+        if self.http_server is not None:
+            lg.warning("Metrics server already started.")
+            return
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                lg.debug("Metrics request: " + format % args)
+
+        self.http_server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.http_thread = Thread(target=self.http_server.serve_forever, daemon=True)
+        self.http_thread.start()
+        lg.info("Serving metrics at http://{}:{}/metrics".format(host, self.http_server.server_port))
+
+    def stop_server(self):
+        if self.http_server is None:
+            return
+        self.http_server.shutdown()
+        self.http_thread.join()
+        self.http_server.server_close()
+        self.http_server = None
+        self.http_thread = None
+        lg.info("Metrics server stopped.")
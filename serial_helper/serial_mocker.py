@@ -31,17 +31,39 @@ To start the streaming, set mock_stream_bps to a positive value which is the ave
 To stop the streaming, set mock_stream_bps to 0.
 
 Note that SerialMocker does not raise the same exceptions as Serial, because it is not a real serial io.
+
+For testing event loop based readers such as AsyncSerialManager, pass use_fileno=True to make SerialMocker 
+async-compatible. In this mode .fileno() returns the read end of a pipe that is readable whenever bytes are waiting to 
+be read, just like the file descriptor of a real serial port, so it can be registered with selectors or 
+loop.add_reader. This mode is only available on POSIX systems.
+
+By default, every byte to be read is put into a Queue[int] one by one, which caps the mocked throughput to a few
+hundred kB/s. For high-rate streams, pass bulk=True: pending bytes are then kept in a bytearray and read/read_all are
+served in slices, so MB/s streams can be mocked.
+
+Both modes run on the wall clock, so stream timings depend on thread scheduling and tests on them may be flaky.
+Pass a VirtualClock as clock to make timings deterministic (this implies bulk=True). The mocker then runs no threads
+at all: the stream, burst messages and write delays are all computed from the virtual time, and a read that has to
+wait advances the virtual clock to the exact time the requested bytes arrive, or to the read timeout. So seconds of
+traffic are simulated instantly, and two runs produce exactly the same bytes at exactly the same virtual times.
+Responses to writes are generated in the write call after the simulated transmission time.
+Give the same clock to SerialManager to timestamp messages with the virtual time.
+
+The stream is delivered in packets of mock_stream_packet_size bytes, e.g. 64 to mock the USB packets of a USB-CDC
+device, so a read does not return the stream byte by byte at high rates.
 """
 
 __author__ = "Zhi Zi"
 __email__ = "x@zzi.io"
 __version__ = "20231009"
 
+import io
 import logging
+import os
 import time
 import struct
 from queue import Queue, Empty
-from threading import Thread
+from threading import Thread, Lock, Condition
 from typing import Callable
 # Configure logging
 lg = logging.getLogger(__name__)
@@ -51,6 +73,43 @@ class SerialMockerError(Exception):
     pass
 
 
+class VirtualClock:
+    """
+    A clock that only moves when it is told to, for deterministic timing in tests.
+    Provides time, time_ns, monotonic and sleep like the time module, so it can be used wherever the time module is
+    injected as a clock. sleep advances the clock immediately instead of blocking.
+    Time is kept as integer nanoseconds so there is no rounding drift.
+    """
+
+    def __init__(self, start_ns: int = 0) -> None:
+        self.now_ns = start_ns
+        self.lock = Lock()
+
+    def time_ns(self) -> int:
+        return self.now_ns
+
+    def time(self) -> float:
+        return self.now_ns / 1e9
+
+    def monotonic(self) -> float:
+        return self.now_ns / 1e9
+
+    def sleep(self, seconds: float):
+        self.advance(seconds)
+
+    def advance(self, seconds: float):
+        with self.lock:
+            self.now_ns += max(0, round(seconds * 1e9))
+
+    def advance_to_ns(self, t_ns: int):
+        """
+        Moves the clock to t_ns, the clock never goes backwards.
+        """
+        with self.lock:
+            if t_ns > self.now_ns:
+                self.now_ns = t_ns
+
+
 class SerialMocker:
     """
     Mocks the behaviour of a pySerial object for testing.
@@ -62,7 +121,9 @@ class SerialMocker:
                  response_generator: Callable[[bytes], bytes] = lambda x: b'',
                  burst_message_generator: Callable[[], bytes] = lambda: b'foo',
                  burst_message_interval: float = 1.0,
-                 open_by_default: bool = True) -> None:
+                 open_by_default: bool = True, use_fileno: bool = False,
+                 bulk: bool = False, clock: VirtualClock | None = None,
+                 mock_stream_packet_size: int = 1) -> None:
         # ==== Basic serial port params, just like the real serial port. ====
         self.port = port
         self.timeout = timeout
@@ -83,19 +144,37 @@ class SerialMocker:
         self.mock_stream_content = mock_stream_content
         self.mock_stream_content_len = len(self.mock_stream_content)
         self.mock_stream_bps = mock_stream_bps
+        self.mock_stream_packet_size = mock_stream_packet_size
         self.mock_stream = False
         # mocks data bursts sent from device, like sensor data packets.
         # burst_message_generator is called to get the message to send.
         self.burst_message_generator = burst_message_generator
         self.burst_message_interval = burst_message_interval
         self.mock_burst_message = False
+        # with a virtual clock, the time of the next burst. Bursts are generated when the clock passes it.
+        self.next_burst_ns = None
+        # provides a readable file descriptor for event loops, see module doc.
+        self.use_fileno = use_fileno
+        self.notify_fd_r = None
+        self.notify_fd_w = None
+        # timing source, see module doc.
+        self.virtual_clock = clock
+        self.clock = time if clock is None else clock
+        self.bulk = bulk or clock is not None
         # ==== Internal states ====
         self.bytes_written = 0
         self.bytes_read = 0
-        # Bytes waiting in the buffer to be read
-        self.in_waiting = 0
         self.is_open = False
+        # bytes to read, one int per byte in to_read_queue, or in to_read_buffer if bulk.
         self.to_read_queue: Queue[int] = Queue()
+        self.to_read_buffer = bytearray()
+        # guards to_read_buffer and the stream state, notified when bytes are added.
+        self.to_read_cond = Condition()
+        # stream state: bytes sent since stream_t0_ns at rate stream_bps.
+        self.stream_index = 0
+        self.stream_t0_ns = 0
+        self.stream_bytes_sent = 0
+        self.stream_bps = 0
         self.wrote_queue: Queue[bytes] = Queue()
         # handles what data to return when read() called.
         self.mock_response_thread = None
@@ -109,11 +188,19 @@ class SerialMocker:
     def open(self):
         lg.info("Opening mocked serial connection")
         self.is_open = True
-        self.mock_response_thread = Thread(target=self.mock_response_task)
+        if self.use_fileno:
+            self.notify_fd_r, self.notify_fd_w = os.pipe()
+            os.set_blocking(self.notify_fd_r, False)
+            os.set_blocking(self.notify_fd_w, False)
+        self.stream_bps = 0
         self.mock_response = True
+        self.mock_stream = True
+        if self.virtual_clock is not None:
+            # everything is computed from the virtual time, no threads needed.
+            return
+        self.mock_response_thread = Thread(target=self.mock_response_task)
         self.mock_response_thread.start()
         self.mock_stream_thread = Thread(target=self.mock_stream_task)
-        self.mock_stream = True
         self.mock_stream_thread.start()
 
     def close(self):
@@ -121,9 +208,60 @@ class SerialMocker:
         self.is_open = False
         self.mock_response = False
         self.mock_stream = False
-        self.wrote_queue.put(None)
-        self.mock_response_thread.join()
-        self.mock_stream_thread.join()
+        if self.virtual_clock is None:
+            self.wrote_queue.put(None)
+            self.mock_response_thread.join()
+            self.mock_stream_thread.join()
+        if self.use_fileno:
+            os.close(self.notify_fd_r)
+            os.close(self.notify_fd_w)
+            self.notify_fd_r, self.notify_fd_w = None, None
+
+    def fileno(self) -> int:
+        """
+        Returns a file descriptor that is readable when there're bytes to read, only if use_fileno is set.
+        """
+        if self.notify_fd_r is None:
+            raise io.UnsupportedOperation("SerialMocker has no file descriptor, set use_fileno=True and open it.")
+        return self.notify_fd_r
+
+    @property
+    def in_waiting(self) -> int:
+        """
+        Bytes waiting in the buffer to be read.
+        """
+        if not self.bulk:
+            return self.to_read_queue.qsize()
+        with self.to_read_cond:
+            if self.virtual_clock is not None:
+                self.generate_until(self.clock.time_ns())
+            return len(self.to_read_buffer)
+
+    def feed(self, data: bytes):
+        """
+        Adds data to the bytes to read, as if the device sent them.
+        """
+        if not data:
+            return
+        if self.bulk:
+            with self.to_read_cond:
+                self.to_read_buffer += data
+                self.to_read_cond.notify_all()
+        else:
+            for c in data:
+                self.to_read_queue.put(c)
+        self.notify_readable()
+
+    def notify_readable(self):
+        """
+        Marks the file descriptor as readable, called after bytes are put to to_read_queue.
+        """
+        if self.notify_fd_w is not None:
+            try:
+                os.write(self.notify_fd_w, b'\x00')
+            except BlockingIOError:
+                # pipe is full, it is readable anyway.
+                pass
 
     def write(self, to_write: bytes) -> int:
         """
@@ -138,7 +276,10 @@ class SerialMocker:
             bytes_to_write))
         if self.is_open:
             time_to_wait = bytes_to_write / self.baudrate * 8
-            if time_to_wait > 0.02:
+            if self.virtual_clock is not None:
+                # exact, and takes no real time.
+                self.clock.sleep(time_to_wait)
+            elif time_to_wait > 0.02:
                 # Only simulates blocking time that is longer than 20 ms, because for very short to_writes, time.sleep
                 # cannot generate accurate delays due to OS implementations of sleep and thread scheduling.
                 time.sleep(time_to_wait)
@@ -147,7 +288,10 @@ class SerialMocker:
                 "Mocked WRITE called but mocked serial connection is closed!")
             if self.will_throw:
                 raise SerialMockerError
-        self.wrote_queue.put(to_write)
+        if self.virtual_clock is not None:
+            self.respond(to_write)
+        else:
+            self.wrote_queue.put(to_write)
         self.bytes_written += bytes_to_write
         return bytes_to_write
 
@@ -159,22 +303,35 @@ class SerialMocker:
         Bytes are added to the to_read_queue by mock_response_task and mock_stream_task.
         If not will_throw, the read will succeed even if the port is closed. Error will be logged but program will not 
         be interrupted. 
-        However, if timeout is specified, SerialMockError will be raised if timeout happens, even if will_throw is 
-        False, because in this case there's no way the function can return the required number of bytes and the error 
-        cannot be ignored.
+        If timeout happens before bytes_to_read bytes are available, the bytes read so far are returned, just like a
+        real Serial object. So read(1) can be used to block until the next byte arrives.
         """
         lg.debug("Mocked read called, requested bytes to read: {}".format(
             bytes_to_read))
-        try:
+        if self.notify_fd_r is not None:
+            # drain notifications before reading, so bytes arriving during the read notify again.
+            try:
+                os.read(self.notify_fd_r, 65536)
+            except BlockingIOError:
+                pass
+        if self.bulk:
+            mocked_response = self.bulk_read(bytes_to_read)
+        else:
             mocked_response = list()
-            for _ in range(bytes_to_read):
-                c = self.to_read_queue.get(
-                    block=True, timeout=self.timeout).to_bytes()
-                mocked_response.append(c)
-                self.in_waiting -= 1
+            try:
+                for _ in range(bytes_to_read):
+                    c = self.to_read_queue.get(
+                        block=True, timeout=self.timeout).to_bytes()
+                    mocked_response.append(c)
+            except Empty:
+                pass
             mocked_response = b''.join(mocked_response)
-        except Empty:
-            raise SerialMockerError
+        if len(mocked_response) < bytes_to_read:
+            lg.debug("Mocked read timeout, {} of {} bytes read".format(
+                len(mocked_response), bytes_to_read))
+        if self.to_read_queue.qsize() or self.to_read_buffer:
+            # still readable
+            self.notify_readable()
         if self.is_open:
             pass
         else:
@@ -182,73 +339,137 @@ class SerialMocker:
                 "Mocked READ called but mocked serial connection is closed!")
             if self.will_throw:
                 raise SerialMockerError
-        self.bytes_read += bytes_to_read
+        self.bytes_read += len(mocked_response)
         return mocked_response
 
     def read_all(self):
         return self.read(self.in_waiting)
 
+    def bulk_read(self, bytes_to_read: int) -> bytes:
+        with self.to_read_cond:
+            if self.virtual_clock is not None:
+                self.wait_virtual(bytes_to_read)
+            else:
+                self.to_read_cond.wait_for(lambda: len(self.to_read_buffer) >= bytes_to_read, timeout=self.timeout)
+            mocked_response = bytes(self.to_read_buffer[:bytes_to_read])
+            # deleting from the head of a bytearray does not move the rest of it.
+            del self.to_read_buffer[:bytes_to_read]
+        return mocked_response
+
+    def wait_virtual(self, bytes_to_read: int):
+        """
+        Advances the virtual clock until bytes_to_read bytes are in to_read_buffer, or until timeout.
+        Called with to_read_cond held.
+        """
+        deadline_ns = None if self.timeout is None else self.clock.time_ns() + round(self.timeout * 1e9)
+        while True:
+            self.generate_until(self.clock.time_ns())
+            if len(self.to_read_buffer) >= bytes_to_read:
+                return
+            t_next_ns = self.next_event_ns(bytes_to_read - len(self.to_read_buffer))
+            if deadline_ns is not None and (t_next_ns is None or t_next_ns > deadline_ns):
+                self.clock.advance_to_ns(deadline_ns)
+                self.generate_until(self.clock.time_ns())
+                return
+            if t_next_ns is None:
+                # nothing scheduled, only a write from another thread can add bytes.
+                self.to_read_cond.wait(0.1)
+            else:
+                self.clock.advance_to_ns(t_next_ns)
+
+    def generate_until(self, t_ns: int):
+        """
+        Adds all stream packets and burst messages due before t_ns. Called with to_read_cond held.
+        """
+        bps = int(self.mock_stream_bps) if self.mock_stream else 0
+        if bps != self.stream_bps:
+            # rate changed, the new rate counts from now on.
+            self.stream_bps = bps
+            self.stream_t0_ns = t_ns
+            self.stream_bytes_sent = 0
+        if bps:
+            n_due = (t_ns - self.stream_t0_ns) * bps // 8_000_000_000
+            n_bytes = n_due - n_due % self.mock_stream_packet_size - self.stream_bytes_sent
+            if n_bytes > 0:
+                self.feed(self.stream_content(n_bytes))
+                self.stream_bytes_sent += n_bytes
+        while self.mock_burst_message and self.next_burst_ns is not None and self.next_burst_ns <= t_ns:
+            self.feed(self.burst_message_generator())
+            self.next_burst_ns += round(self.burst_message_interval * 1e9)
+
+    def next_event_ns(self, bytes_needed: int = 1) -> int | None:
+        """
+        Returns the virtual time when the stream has sent bytes_needed more bytes, or when the next burst message is due,
+        whichever comes first. Returns None if nothing is scheduled.
+        """
+        events = []
+        if self.stream_bps:
+            packet_size = self.mock_stream_packet_size
+            n_bytes = self.stream_bytes_sent + -(-bytes_needed // packet_size) * packet_size
+            # ceil, so that the packet is complete at the returned time.
+            events.append(self.stream_t0_ns - (-n_bytes * 8_000_000_000 // self.stream_bps))
+        if self.mock_burst_message and self.next_burst_ns is not None:
+            events.append(self.next_burst_ns)
+        return min(events) if events else None
+
+    def stream_content(self, n_bytes: int) -> bytes:
+        """
+        Returns the next n_bytes of mock_stream_content, which is used cyclically.
+        """
+        # check if mock_stream_content is empty
+        if self.mock_stream_content_len == 0:
+            raise SerialMockerError
+        chunks = []
+        while n_bytes:
+            i = self.stream_index
+            n = min(n_bytes, self.mock_stream_content_len - i)
+            chunks.append(self.mock_stream_content[i:i+n])
+            self.stream_index = (i + n) % self.mock_stream_content_len
+            n_bytes -= n
+        return b''.join(chunks)
+
+    def respond(self, wrote: bytes):
+        if wrote in self.response_map:
+            # Match response_map first
+            to_read = self.response_map[wrote]
+        else:
+            to_read = self.response_generator(wrote)
+        self.feed(to_read)
+
     def mock_response_task(self):
         while self.mock_response:
             wrote = self.wrote_queue.get()
             if wrote is None:
                 break
-            if wrote in self.response_map:
-                # Match response_map first
-                to_read = self.response_map[wrote]
-            else:
-                to_read = self.response_generator(wrote)
-            if to_read:
-                for c in to_read:
-                    self.to_read_queue.put(c)
-                    self.in_waiting += 1
+            self.respond(wrote)
 
     def mock_stream_task(self):
-        i = 0
-        t_prev = time.time()
         while self.mock_stream:
             if self.mock_stream_bps == 0:
                 # if bps is set to 0, no need to calculate anything.
-                # However, we will update t_prev to current time because if it is not updated, then the next time user
-                # changes bps to a non-zero value, t_delta will be huge because it counted all time since last byte sent
-                t_prev = time.time()
+                # The stream restarts counting time when bps is set to a non-zero value again.
+                with self.to_read_cond:
+                    self.generate_until(time.time_ns())
                 time.sleep(0.05)
                 continue
-            # calculate how many bytes from stream to send to to_read_queue
-            t_now = time.time()
-            t_delta = t_now - t_prev
-            n_bytes = int(self.mock_stream_bps * t_delta / 8)
-            if n_bytes:
-                # check if mock_stream_content is empty
-                if self.mock_stream_content_len == 0:
-                    raise SerialMockerError
-                for _ in range(n_bytes):
-                    # Fun fact:
-                    #  In [0]: b'\x01\x02\x03\x04'[1]
-                    #  Out[0]: 2
-                    #  In [1]: b'\x01\x02\x03\x04'[1:2]
-                    #  Out[1]: b'\x02'
-                    self.to_read_queue.put(self.mock_stream_content[i])
-                    i = (i + 1) % self.mock_stream_content_len
-                    self.in_waiting += 1
-                t_prev = t_now
-            else:
-                # if no bytes to send, t_prev does not need to be updated
-                pass
+            # send bytes from stream that are due by now
+            with self.to_read_cond:
+                self.generate_until(time.time_ns())
+            time.sleep(0.001)
 
     def mock_burst_message_task(self):
         while self.mock_burst_message:
             time.sleep(self.burst_message_interval)
-            to_burst = self.burst_message_generator()
-            for c in to_burst:
-                self.to_read_queue.put(c)
-                self.in_waiting += 1
+            self.feed(self.burst_message_generator())
 
     def start_burst_message(self):
         lg.info("Starting burst mode.")
+        self.mock_burst_message = True
+        if self.virtual_clock is not None:
+            self.next_burst_ns = self.clock.time_ns() + round(self.burst_message_interval * 1e9)
+            return
         self.mock_burst_message_thread = Thread(
             target=self.mock_burst_message_task)
-        self.mock_burst_message = True
         self.mock_burst_message_thread.start()
 
     def stop_burst_message(self):
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""stream_buffer.py:
+This module provides the StreamBuffer class used by framers to assemble frames from a packet-less stream.
+
+The naive approach of assembling a stream, i.e. `stream_content += msg` followed by a search over the whole
+stream_content for every new message, is quadratic when a large frame arrives in many small reads.
+StreamBuffer instead copies every new message once into a preallocated bytearray, and tracks the unconsumed region
+with two positions, so framers only need to look at the newly arrived bytes.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+# std libs
+import logging
+
+# Configure logging
+lg = logging.getLogger(__name__)
+
+
+class StreamBuffer:
+    """
+    A reusable byte buffer holding the unconsumed part of a stream.
+
+    Bytes in [start, end) of .buffer are not consumed yet. Framers read them directly from .buffer or .view, and
+    advance .start when a frame is consumed.
+    The buffer is compacted or grown only when new data does not fit at the end, and it is doubled until at least half
+    of it is free after compaction, so the cost of compaction is amortized to O(1) per byte.
+    """
+
+    def __init__(self, size: int = 4096) -> None:
+        self.buffer = bytearray(max(1, size))
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def content(self) -> bytes:
+        """
+        Returns a copy of the unconsumed bytes.
+        """
+        return bytes(self.view[self.start:self.end])
+
+    def append(self, data: bytes) -> int:
+        """
+        Copies data to the end of buffer.
+        Returns the position where data starts in buffer. Positions before it are not changed by the call except
+        being shifted as a whole by compaction, so the return value should be used instead of the old .end.
+        """
+        n = len(data)
+        if self.end + n > len(self.buffer):
+            self.__compact(n)
+        position = self.end
+        self.view[position:position + n] = data
+        self.end += n
+        return position
+
+    def consume(self, position: int):
+        """
+        Marks all bytes before position as consumed.
+        """
+        self.start = position
+        if self.start >= self.end:
+            # nothing pending, rewind to start of buffer for free.
+            self.start = 0
+            self.end = 0
+
+    def clear(self):
+        self.start = 0
+        self.end = 0
+
+    def __compact(self, n_incoming: int):
+        n_pending = self.end - self.start
+        capacity = len(self.buffer)
+        while (n_pending + n_incoming) * 2 > capacity:
+            capacity *= 2
+        if capacity != len(self.buffer):
+            lg.debug("Growing stream buffer to {} bytes".format(capacity))
+            new_buffer = bytearray(capacity)
+            new_buffer[:n_pending] = self.view[self.start:self.end]
+            self.view.release()
+            self.buffer = new_buffer
+            self.view = memoryview(new_buffer)
+        else:
+            # memoryview slice assignment handles overlapping regions.
+            self.view[:n_pending] = self.view[self.start:self.end]
+        self.start = 0
+        self.end = n_pending
@@ -15,17 +15,18 @@ __email__ = "x@zzi.io"
 __version__ = "20211130"
 
 
-import base64
 import numpy as np
 import sif_reader
 import random
 
 import json
 from flask import Flask, Response
+from array_response import array_response
 
 
 app = Flask(__name__)
 
+
 @app.route("/")
 def online():
     res = dict()
@@ -55,7 +56,4 @@ def takesignal():
     res = dict()
     res['success'] = True
     res['message'] = "Signal taken"
-    res['wavelength'] = base64.b64encode(wl)
-    res['data'] = base64.b64encode(data)
-    res = json.dumps(res)
-    return Response(res, status=200, mimetype='application/json')
\ No newline at end of file
+    return array_response(res, wavelength=wl, data=data)
\ No newline at end of file
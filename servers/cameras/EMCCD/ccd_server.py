@@ -18,15 +18,15 @@ __email__ = "x@zzi.io"
 __version__ = "20211130"
 
 
-import base64
-
 import json
 from flask import Flask, Response
+from array_response import array_response
 
 from andor_solis import camera
 
 app = Flask(__name__)
 
+
 @app.route("/")
 def online():
     res = dict()
@@ -44,7 +44,4 @@ def takesignal():
     res = dict()
     res['success'] = True
     res['message'] = "Signal taken"
-    res['wavelength'] = base64.b64encode(wl)
-    res['data'] = base64.b64encode(data)
-    res = json.dumps(res)
-    return Response(res, status=200, mimetype='application/json')
\ No newline at end of file
+    return array_response(res, wavelength=wl, data=data)
\ No newline at end of file
@@ -16,11 +16,11 @@ from flask import Flask
 
 from PIL import Image
 import numpy as np
-import base64
 import time
 import json
 import random
 from flask import Flask, Response
+from array_response import array_response
 
 # from camera import camera
 
@@ -86,9 +86,7 @@ def get_image():
     res = dict()
     res['success'] = True
     res['message'] = "buffer:b64"
-    res['buffer'] = base64.b64encode(get_fake_image_buffer()).decode()
-    res = json.dumps(res)
-    return Response(res, status=200, mimetype='application/json')
+    return array_response(res, buffer=np.frombuffer(get_fake_image_buffer(), dtype=np.uint8))
 
 
 @app.route('/trigAndGetBuffer')
@@ -98,9 +96,7 @@ def trig_and_get_buffer():
     res['message'] = "buffer:b64"
     res['width'] = 3584
     res['height'] = 2748
-    res['buffer'] = base64.b64encode(get_fake_image_buffer()).decode()
-    res = json.dumps(res)
-    return Response(res, status=200, mimetype='application/json')
+    return array_response(res, buffer=np.frombuffer(get_fake_image_buffer(), dtype=np.uint8))
 
 
 @app.route('/setTriggerMode')
@@ -16,10 +16,10 @@ from flask import Flask
 
 from PIL import Image
 import numpy as np
-import base64
 import time
 import json
 from flask import Flask, Response
+from array_response import array_response
 
 from camera import camera
 
@@ -74,9 +74,7 @@ def get_image():
     res['success'] = True
     res['message'] = "buffer:b64"
     buf = camera.getBuffer()
-    res['buffer'] = base64.b64encode(buf).decode()
-    res = json.dumps(res)
-    return Response(res, status=200, mimetype='application/json')
+    return array_response(res, buffer=np.frombuffer(buf, dtype=np.uint8))
 
 
 @app.route('/trigAndGetBuffer')
@@ -93,16 +91,12 @@ def trig_and_get_buffer():
             buf = camera.getBuffer()
             res['success'] = True
             res['message'] = "buffer:b64"
-            res['buffer'] = base64.b64encode(buf).decode()
-            res = json.dumps(res)
-            return Response(res, status=200, mimetype='application/json')
+            return array_response(res, buffer=np.frombuffer(buf, dtype=np.uint8))
     buf = camera.getBuffer()
     res = dict()
     res['success'] = False
     res['message'] = "Timeout while waiting for new image, is the camera opened? Returning old buffer:b64 instead."
-    res['buffer'] = base64.b64encode(buf).decode()
-    res = json.dumps(res)
-    return Response(res, status=200, mimetype='application/json')
+    return array_response(res, buffer=np.frombuffer(buf, dtype=np.uint8))
 
 
 @app.route('/setTriggerMode')
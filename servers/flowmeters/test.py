@@ -13,7 +13,6 @@ import time
 from collections import deque
 from threading import Thread
 from functools import partial
-import struct
 import numpy as np
 from bokeh.plotting import curdoc
 from bokeh.layouts import column, row
@@ -58,7 +57,7 @@ s = serial.Serial('COM12', baudrate=114500, timeout=1)
 
 
 def parse_data(buf):
-    return np.asarray(struct.unpack('<{}H'.format(data_len), buf))
+    return np.frombuffer(buf, dtype='<u2', count=data_len).astype(np.int64)
 
 
 def signal_processing(x):
@@ -306,6 +306,8 @@ class ModelockWatchdog:
         self.message_handler_thread.start()
         self.status = {}
         self.new_data_available = False
+        # called from the message handler thread as on_status(status) after every report is parsed.
+        self.on_status = None
 
     def shutdown(self):
         self.serial_manager_thread_running = False
@@ -341,6 +343,8 @@ class ModelockWatchdog:
                     earliest_message = self.messages_from_device_buffer.pop(0)
                     parse_message(earliest_message, status=self.status)
                     self.new_data_available = True
+                    if self.on_status is not None:
+                        self.on_status(self.status)
                 except ValueError as e:
                     print("Error parsing message.", e)
 
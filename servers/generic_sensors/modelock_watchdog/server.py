@@ -12,14 +12,17 @@ __version__ = "20221227"
 import json
 import base64
 import numpy as np
-from flask import Flask, Response
+from flask import Flask, Response, request
 
 from modelock_watchdog_HAL import ModelockWatchdog
 from unit_conversions import rh_to_ah
+from socket_channel import SocketChannel
 watchdog = ModelockWatchdog(com="COM3")
 watchdog.start_continuous_read()
 
 app = Flask(__name__)
+# push every new reading to socket subscribers instead of having them poll getSensorData
+channel = SocketChannel(app, topics=["sensor_data"])
 
 @app.route("/")
 def online():
@@ -32,12 +35,8 @@ def online():
     return Response(res, status=200, mimetype='application/json')
 
 
-@app.route("/getSensorData")
-def get_sensor_data():
-    res = dict()
-    res['success'] = True
-    res['message'] = "data:dict"
-    data = watchdog.status.copy()
+def sensor_data(status: dict) -> dict:
+    data = status.copy()
     # ============ BEGIN TEMPORARY ============
     # This part should be put into HAL
     # Intensity = 0 for now because adc is not enabled in
@@ -52,18 +51,46 @@ def get_sensor_data():
         data["Humidity2"],
         )
     # ============ END TEMPORARY ============
-    res['data'] = data
+    return data
+
+
+@app.route("/getSensorData")
+def get_sensor_data():
+    res = dict()
+    res['success'] = True
+    res['message'] = "data:dict"
+    res['data'] = sensor_data(watchdog.status)
     res = json.dumps(res)
     return Response(res, status=200, mimetype='application/json')
 
 
+@app.route("/setSensorConfig", methods=['POST'])
 @app.route("/setSensorConfig/<config>")
-def set_sensor_config(config):
-    config = base64.urlsafe_b64decode(config).decode()
-    config = json.loads(config)
+def set_sensor_config(config=None):
+    """The config is the JSON body of a POST, or base64 JSON in the path for older clients."""
+    if config is None:
+        config = request.get_json(force=True)
+    else:
+        config = json.loads(base64.urlsafe_b64decode(config).decode())
     res = dict()
     res['success'] = True
     res['message'] = "Sensor config updated"
     # [TODO]: Implementation
     res = json.dumps(res)
     return Response(res, status=200, mimetype='application/json')
+
+
+def publish_status(status):
+    res = dict()
+    res['success'] = True
+    res['message'] = "data:dict"
+    try:
+        res['data'] = sensor_data(status)
+    except KeyError:
+        # not all reports received yet
+        return
+    channel.publish("sensor_data", res)
+
+
+watchdog.on_status = publish_status
+channel.start()
@@ -20,6 +20,7 @@ __version__ = "20220105"
 
 import time
 import pymodbus
+from asgi_device import JobCancelled
 from pymodbus.pdu import ModbusRequest
 from pymodbus.client.sync import ModbusSerialClient as ModbusClient
 from pymodbus.transaction import ModbusRtuFramer
@@ -30,6 +31,10 @@ class CRD507ConnectionFail(Exception):
     pass
 
 
+class CRD507PositionUnknown(Exception):
+    pass
+
+
 class CRD507:
     def __init__(self) -> None:
         self.address = 0x2
@@ -177,18 +182,37 @@ class CRD507:
         command = 0b0010000000000001
         result = self.client.write_register(0x001E, command, unit=self.address)
 
-    def __log_position(self, pos: int):
-        """log current position so that the open loop system can roughly know the current pos"""
+    @retry_for_modbus_io_exception
+    def __stop(self):
+        # set C-ON=1, STOP=1, M0=1, the motor decelerates to a stop and the remaining steps are dropped
+        command = 0b0011000000000001
+        return self.client.write_register(0x001E, command, unit=self.address)
+
+    def __log_position(self, pos: int | None):
+        """log current position so that the open loop system can roughly know the current pos, None if it is lost"""
         self.curr_pos = pos
         with open('curr_pos.txt', 'w') as f:
-            f.write(str(self.curr_pos))
+            # not an int, so the next start autohomes as for a corrupted record
+            f.write("unknown" if self.curr_pos is None else str(self.curr_pos))
+
+    def __check_position(self):
+        if self.curr_pos is None:
+            raise CRD507PositionUnknown("Position lost by a stopped move, autohome is required")
 
-    def __wait_for_moving(self):
-        """read register until MOVE is reset"""
+    def __wait_for_moving(self, job=None):
+        """read register until MOVE is reset, stop the motor if job is cancelled meanwhile"""
         while True:
             status = self.parse_status(self.get_status())
             if not status["MOVE"]:
                 break
+            if job is not None and job.cancelled:
+                self.__stop()
+                self.__wait_for_moving()
+                self.__reset_start()
+                # the open loop driver cannot tell where it stopped, moves are refused until autohome
+                self.__log_position(None)
+                print("CRD507: move stopped on cancel, position is lost until the stage is homed")
+                raise JobCancelled
             time.sleep(0.1)
 
     @retry_for_modbus_io_exception
@@ -201,19 +225,20 @@ class CRD507:
         status["MOVE"] = status_result.registers[1] & 0b0000000000000001
         return status
 
-    def setpos(self, pos: int):
+    def setpos(self, pos: int, job=None):
+        self.__check_position()
         inc = int(pos - self.curr_pos)
         dir = 1 if inc >= 0 else -1
         # the driver supports only 2^23 steps for a single start
         self.__set_position(8388607 * dir)
         while abs(inc) > 8388607:
             self.__start()
-            self.__wait_for_moving()
+            self.__wait_for_moving(job)
             self.__log_position(pos)
             inc -= 8388607 * dir
         self.__set_position(inc)
         self.__start()
-        self.__wait_for_moving()
+        self.__wait_for_moving(job)
         self.__log_position(pos)
 
     def clear_fault(self):
@@ -224,25 +249,26 @@ class CRD507:
 
     def autohome(self):
         """[TODO]"""
-        self.curr_pos = 0
+        self.__log_position(0)
 
-    def moveabs(self, pos_mm):
+    def moveabs(self, pos_mm, job=None):
         target = int(pos_mm * self.steps_per_mm)
-        self.setpos(target)
+        self.setpos(target, job)
 
-    def rotateabs(self, pos_deg, backlash_compensation=0.2):
+    def rotateabs(self, pos_deg, backlash_compensation=0.2, job=None):
+        self.__check_position()
         target = int(pos_deg * self.steps_per_degree)
         if backlash_compensation:
             if target >= self.curr_pos: # rotating forward, no need to compensate
-                self.setpos(target)
+                self.setpos(target, job)
             else:
                 # Rotators, especially worm drive type rotators, suffer from backlash when rotate backwards.
                 # A simple way to compesate is when rotating backwords, rotate a bit more, then rotate back 
                 target = int((pos_deg-backlash_compensation) * self.steps_per_degree)
-                self.setpos(target)
+                self.setpos(target, job)
                 target = int(pos_deg * self.steps_per_degree)
-                self.setpos(target)
+                self.setpos(target, job)
         else:
-            self.setpos(target)
+            self.setpos(target, job)
 
 stage = CRD507()
\ No newline at end of file
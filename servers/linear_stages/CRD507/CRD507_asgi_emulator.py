@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""CRD507_asgi_emulator.py:
+This module provides web API for
+development emulation of CRD507_asgi_server.py
+
+The behaviour of these APIs should be identical
+to the corresponding server app, except that they don't do
+anything in real enviroment, and that they return fabricated
+data. Moves take time as on the real stage.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import time
+
+from asgi_device import DeviceApp, JobCancelled
+from discovery import Announcer
+
+# EMULATOR: speed of emulated moves, mm or degree per second
+EMULATED_SPEED = 10.0
+# EMULATOR: interval of position updates during a move
+EMULATED_POLL_INTERVAL = 0.02
+STEPS_PER_MM = 1000
+STEPS_PER_DEGREE = 1000
+
+
+class EmulatedCRD507:
+    def __init__(self) -> None:
+        self.curr_pos = 0
+
+    def setpos(self, pos: int, steps_per_unit: int, job=None):
+        start = self.curr_pos
+        duration = abs(pos - start) / steps_per_unit / EMULATED_SPEED
+        t0 = time.monotonic()
+        while (elapsed := time.monotonic() - t0) < duration:
+            if job is not None:
+                if job.cancelled:
+                    # stops where it is, as the driver does on STOP
+                    raise JobCancelled
+                job.report(elapsed / duration)
+            self.curr_pos = start + int((pos - start) * elapsed / duration)
+            time.sleep(EMULATED_POLL_INTERVAL)
+        self.curr_pos = pos
+
+    def autohome(self):
+        self.curr_pos = 0
+
+    def moveabs(self, pos_mm, job=None):
+        self.setpos(int(pos_mm * STEPS_PER_MM), STEPS_PER_MM, job)
+
+    def rotateabs(self, pos_deg, backlash_compensation=0.2, job=None):
+        self.setpos(int(pos_deg * STEPS_PER_DEGREE), STEPS_PER_DEGREE, job)
+
+
+stage = EmulatedCRD507()
+app = DeviceApp("CRD507")
+
+app.expose("/moveabs/<pos_mm>", "Moved to target position", target="pos_mm")(stage.moveabs)
+app.expose("/rotateabs/<pos_deg>", "Rotated to target position", target="pos_deg")(stage.rotateabs)
+app.expose("/autohome", "Moved to Home and reset Home position via limit switch")(stage.autohome)
+
+
+@app.route("/position", exclusive=False)
+def position():
+    res = dict()
+    res['success'] = True
+    res['message'] = "Position in steps"
+    res['position'] = stage.curr_pos
+    return res
+
+
+Announcer("CRD507", kind="linear_stages").start()
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+"""CRD507_asgi_server.py:
+This module provides web RESTful API for
+a remote linear stage or rotator, served over ASGI,
+see asgi_device.py. The API is the same as CRD507_server.py,
+and /position and /status can be polled while a move runs.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+from asgi_device import DeviceApp
+from discovery import Announcer
+from CRD507 import stage
+
+app = DeviceApp("CRD507")
+
+app.expose("/moveabs/<pos_mm>", "Moved to target position", target="pos_mm")(stage.moveabs)
+app.expose("/rotateabs/<pos_deg>", "Rotated to target position", target="pos_deg")(stage.rotateabs)
+app.expose("/autohome", "Moved to Home and reset Home position via limit switch")(stage.autohome)
+
+
+@app.route("/position", exclusive=False)
+def position():
+    # the position logged by the last finished move, the driver is busy with the move itself
+    res = dict()
+    if stage.curr_pos is None:
+        res['success'] = False
+        res['message'] = "Position lost by a stopped move, autohome is required"
+        res['position'] = None
+        return res, 409
+    res['success'] = True
+    res['message'] = "Position in steps"
+    res['position'] = stage.curr_pos
+    return res
+
+
+Announcer("CRD507", kind="linear_stages").start()
@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+
+"""asgi_device.py:
+This module provides DeviceApp, the base of device servers served over ASGI instead of the flask development server,
+the first step of the migration planned in servers/Proposal.md.
+
+The flask development server ties up a worker for every blocking handler, e.g. waiting for a stage to finish moving,
+and nothing keeps two requests from driving the same device at once. DeviceApp is an ASGI application running on an
+event loop: handlers may be coroutines, and blocking driver calls run in threads, so the loop stays free to answer
+status polls while a long move runs, and calls to the device itself are queued in order.
+
+    device = DeviceApp("CRD507")
+    device.expose("/moveabs/<pos_mm>", "Moved to target position", target="pos_mm")(stage.moveabs)
+
+    @device.route("/position", exclusive=False)
+    def position():
+        return {"position": stage.curr_pos}
+
+Blocking handlers are exclusive by default: they run one at a time, in the order received, as jobs of the single
+worker thread of the device, since the device can only do one thing at a time. Handlers that only read cached state
+are declared exclusive=False and run in a shared pool, next to a running exclusive call. Coroutine handlers run on the
+event loop and must not block.
+Every handler returns a dict, which is replied in the standard envelope {"success": ..., "message": ..., ...}, or a
+(dict, status) tuple. Exceptions are replied as {"success": false, "message": "<type>: <message>"}, with status 400
+for path parameters that cannot be converted and 500 otherwise.
+
+Exclusive calls, e.g. moves, can also return at once instead of when they finish: with the query ?job=1 the reply is
+status 202 and {"job": {"id": ..., "state": "queued", ...}}. The job is then followed with
+    GET /jobs/<id>                  state (queued, running, done, failed or cancelled), progress and, when finished,
+                                    the result the call would have replied
+    GET /jobs/<id>/wait/<timeout>   the same, replied as soon as the job finishes or after timeout seconds
+    GET /jobs/<id>/cancel           a queued job is dropped, a running one is asked to stop
+    GET /jobs/cancel                cancels all jobs, e.g. when a scan is terminated
+A handler, or HAL method, with an argument named job gets its Job, to report progress with job.report(0.5) and to
+stop early when job.cancelled, by raising JobCancelled.
+GET /status is always available and reports the running job and how many are waiting.
+
+Run it with any ASGI server, e.g. uvicorn, which needs to be installed:
+
+    python -m uvicorn CRD507_asgi_server:app --host 0.0.0.0 --port 5005
+
+This file is shared by several servers, copy it next to the server that uses it.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import asyncio
+import inspect
+import json
+import re
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from threading import Thread, Condition, Event
+from typing import Callable
+from urllib.parse import parse_qs
+
+# seconds a client may wait for a job in one request
+MAX_WAIT = 30.0
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_id: int, command: str, call: Callable) -> None:
+        self.id = job_id
+        self.command = command
+        self.call = call
+        self.state = "queued"
+        self.progress = None
+        self.result = None
+        self.created = time.time()
+        self.finished = None
+        self.cancel_requested = Event()
+        # done with (status, reply) when the job finishes
+        self.future = Future()
+
+    @property
+    def cancelled(self) -> bool:
+        """True once the job is asked to stop, a long call checks it and raises JobCancelled."""
+        return self.cancel_requested.is_set()
+
+    def report(self, progress: float):
+        """Reports progress from 0 to 1."""
+        self.progress = progress
+
+    def finish(self, state: str, status: int, result: dict):
+        self.state = state
+        self.result = result
+        self.finished = time.time()
+        if state == "done":
+            self.progress = 1.0
+        self.future.set_result((status, result))
+
+    def info(self) -> dict:
+        info = dict()
+        info['id'] = self.id
+        info['command'] = self.command
+        info['state'] = self.state
+        info['progress'] = self.progress
+        info['cancel_requested'] = self.cancelled
+        info['created'] = self.created
+        info['finished'] = self.finished
+        info['result'] = self.result
+        return info
+
+
+class JobQueue:
+    def __init__(self, name: str, history: int = 100) -> None:
+        """Runs jobs one at a time in order in a worker thread. history is how many finished jobs are kept."""
+        self.history = history
+        self.queue: deque[Job] = deque()
+        self.jobs: dict[int, Job] = dict()
+        self.cond = Condition()
+        self.next_id = 0
+        self.running: Job | None = None
+        self.stopped = False
+        self.worker_thread = Thread(target=self.worker_task, name=name, daemon=True)
+        self.worker_thread.start()
+
+    def submit(self, command: str, call: Callable[[Job], tuple[int, dict]]) -> Job:
+        """Queues call, which gets the Job and returns (status, reply)."""
+        with self.cond:
+            self.next_id += 1
+            job = Job(self.next_id, command, call)
+            self.jobs[job.id] = job
+            self.queue.append(job)
+            self.prune()
+            self.cond.notify()
+        return job
+
+    def get(self, job_id: int) -> Job | None:
+        with self.cond:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job: Job):
+        with self.cond:
+            job.cancel_requested.set()
+            if job.state != "queued":
+                return
+            self.queue.remove(job)
+        job.finish("cancelled", 409, {'success': False, 'message': "Job cancelled"})
+
+    def cancel_all(self) -> list[Job]:
+        with self.cond:
+            jobs = list(self.queue)
+            if self.running is not None:
+                jobs.append(self.running)
+        for job in jobs:
+            self.cancel(job)
+        return jobs
+
+    def prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished is not None]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self.jobs[job_id]
+
+    def shutdown(self):
+        self.cancel_all()
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+
+    def worker_task(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.queue or self.stopped)
+                if self.stopped:
+                    return
+                job = self.queue.popleft()
+                job.state = "running"
+                self.running = job
+            try:
+                status, res = job.call(job)
+                state = "done"
+            except JobCancelled:
+                status, res = 409, {'success': False, 'message': "Job cancelled"}
+                state = "cancelled"
+            except Exception as e:
+                status, res = 500, error_reply(e)
+                state = "failed"
+            with self.cond:
+                self.running = None
+            job.finish(state, status, res)
+
+
+def error_reply(e: Exception) -> dict:
+    res = dict()
+    res['success'] = False
+    res['message'] = "{}: {}".format(type(e).__name__, e)
+    return res
+
+
+class Route:
+    def __init__(self, path: str, handler: Callable, methods: list[str], exclusive: bool) -> None:
+        self.path = path
+        self.handler = handler
+        self.methods = methods
+        self.exclusive = exclusive
+        self.is_coroutine = inspect.iscoroutinefunction(handler)
+        # path parameters <name> match one path segment
+        self.pattern = re.compile("^" + re.sub(r"<(\w+)>", r"(?P<\1>[^/]+)", path) + "$")
+        # path parameters are converted to the annotated type of the handler argument, str if not annotated
+        self.converters = dict()
+        parameters = inspect.signature(handler).parameters
+        for name in self.pattern.groupindex:
+            annotation = parameters[name].annotation if name in parameters else inspect.Parameter.empty
+            self.converters[name] = str if annotation is inspect.Parameter.empty else annotation
+        self.takes_job = 'job' in parameters
+
+    def match(self, path: str) -> dict | None:
+        m = self.pattern.match(path)
+        if m is None:
+            return None
+        return {name: self.converters[name](value) for name, value in m.groupdict().items()}
+
+
+class DeviceApp:
+    def __init__(self, name: str, max_workers: int = 4) -> None:
+        """
+        name is replied by GET /. max_workers is the size of the shared pool of non-exclusive blocking handlers.
+        """
+        self.name = name
+        self.routes: list[Route] = list()
+        # exclusive calls to the device run one at a time in order
+        self.jobs = JobQueue(name)
+        self.shared_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name + "_shared")
+        self.route("/", exclusive=False)(self.online)
+        self.route("/status", exclusive=False)(self.status)
+        self.route("/jobs", exclusive=False)(self.list_jobs)
+        self.route("/jobs/cancel", exclusive=False)(self.cancel_all_jobs)
+        self.route("/jobs/<job_id>", exclusive=False)(self.job_info)
+        self.route("/jobs/<job_id>/cancel", exclusive=False)(self.cancel_job)
+        self.route("/jobs/<job_id>/wait/<timeout>")(self.wait_job)
+
+    def route(self, path: str, methods: list[str] | None = None, exclusive: bool = True):
+        """Decorator adding handler as the endpoint of path, see the module docstring."""
+        def decorator(handler: Callable) -> Callable:
+            self.routes.append(Route(path, handler, methods or ['GET'], exclusive))
+            return handler
+        return decorator
+
+    def expose(self, path: str, message: str, methods: list[str] | None = None, exclusive: bool = True,
+               **reply_args: str):
+        """
+        Decorator turning a HAL method into the endpoint of path, path parameters are passed as the arguments of the
+        same names, converted to their annotated types, or float for unannotated numbers. The return value of the
+        method, if not None, is replied as "result". reply_args map fields of the reply to argument names, e.g.
+        target="pos_mm" replies the converted argument pos_mm as "target".
+        """
+        def decorator(method: Callable) -> Callable:
+            parameters = inspect.signature(method).parameters
+
+            def handler(**kwargs):
+                result = method(**kwargs)
+                res = dict()
+                res['success'] = True
+                res['message'] = message
+                for field, argument in reply_args.items():
+                    res[field] = kwargs[argument]
+                if result is not None:
+                    res['result'] = result
+                return res
+
+            # unannotated HAL arguments are positions, delays etc., numbers
+            handler.__signature__ = inspect.Signature([
+                p.replace(annotation=float if p.annotation is inspect.Parameter.empty and p.name != 'job'
+                          else p.annotation)
+                for p in parameters.values()])
+            self.route(path, methods, exclusive)(handler)
+            return method
+        return decorator
+
+    def online(self):
+        res = dict()
+        res['success'] = True
+        res['message'] = "The server is ONLINE"
+        res['name'] = self.name
+        res['methods'] = [route.path for route in self.routes]
+        return res
+
+    def status(self):
+        running = self.jobs.running
+        res = dict()
+        res['success'] = True
+        res['message'] = "Device busy" if running is not None else "Device idle"
+        res['busy'] = running is not None
+        res['running'] = running.command if running is not None else None
+        res['job'] = running.info() if running is not None else None
+        res['waiting'] = len(self.jobs.queue)
+        return res
+
+    def list_jobs(self):
+        with self.jobs.cond:
+            jobs = list(self.jobs.jobs.values())
+        res = dict()
+        res['success'] = True
+        res['message'] = "Recent jobs"
+        res['jobs'] = [job.info() for job in jobs]
+        return res
+
+    def job_info(self, job_id: int):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return {'success': False, 'message': "No job {}".format(job_id)}, 404
+        res = dict()
+        res['success'] = True
+        res['message'] = "Job {}".format(job.state)
+        res['job'] = job.info()
+        return res
+
+    async def wait_job(self, job_id: int, timeout: float):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job.future)), min(timeout, MAX_WAIT))
+            except asyncio.TimeoutError:
+                pass
+        return self.job_info(job_id)
+
+    def cancel_job(self, job_id: int):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return {'success': False, 'message': "No job {}".format(job_id)}, 404
+        self.jobs.cancel(job)
+        res = dict()
+        res['success'] = True
+        res['message'] = "Job {}".format(job.state) if job.state == "cancelled" else "Job asked to stop"
+        res['job'] = job.info()
+        return res
+
+    def cancel_all_jobs(self):
+        jobs = self.jobs.cancel_all()
+        res = dict()
+        res['success'] = True
+        res['message'] = "{} jobs cancelled".format(len(jobs))
+        res['jobs'] = [job.info() for job in jobs]
+        return res
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        query = parse_qs(scope.get('query_string', b'').decode())
+        status, res = await self.dispatch(scope['method'], scope['path'], query)
+        body = json.dumps(res).encode()
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json'),
+                                (b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def shutdown(self):
+        self.jobs.shutdown()
+        self.shared_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def dispatch(self, method: str, path: str, query: dict | None = None) -> tuple[int, dict]:
+        """Finds the route of path and calls its handler, returns status and reply."""
+        route, kwargs = None, None
+        allowed = False
+        conversion_error = None
+        for r in self.routes:
+            try:
+                kwargs = r.match(path)
+            except ValueError as e:
+                conversion_error = e
+                continue
+            if kwargs is not None:
+                allowed = True
+                if method in r.methods:
+                    route = r
+                    break
+        if route is None:
+            if allowed:
+                return 405, {'success': False, 'message': "Method {} not allowed".format(method)}
+            if conversion_error is not None:
+                return 400, error_reply(conversion_error)
+            return 404, {'success': False, 'message': "No such API: {}".format(path)}
+        as_job = (query or dict()).get('job', ['0'])[-1] not in ('0', 'false', '')
+        try:
+            if route.is_coroutine:
+                return self.reply(await route.handler(**kwargs))
+            elif route.exclusive:
+                job = self.jobs.submit(path, partial(self.run_job, route, kwargs))
+                if as_job:
+                    res = dict()
+                    res['success'] = True
+                    res['message'] = "Job queued"
+                    res['job'] = job.info()
+                    return 202, res
+                return await asyncio.wrap_future(job.future)
+            else:
+                loop = asyncio.get_running_loop()
+                return self.reply(await loop.run_in_executor(self.shared_executor, partial(route.handler, **kwargs)))
+        except Exception as e:
+            return 500, error_reply(e)
+
+    def run_job(self, route: Route, kwargs: dict, job: Job) -> tuple[int, dict]:
+        if route.takes_job:
+            kwargs = dict(kwargs, job=job)
+        return self.reply(route.handler(**kwargs))
+
+    def reply(self, res) -> tuple[int, dict]:
+        if isinstance(res, tuple):
+            res, status = res
+            return status, res
+        return 200, res
+
+    def run(self, host: str = "0.0.0.0", port: int = 5000):
+        """Serves the app with uvicorn."""
+        import uvicorn
+        uvicorn.run(self, host=host, port=port)
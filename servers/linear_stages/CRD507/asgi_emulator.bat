@@ -0,0 +1,4 @@
+CALL C:\ProgramData\Anaconda3\condabin\conda.bat activate base
+
+set UVICORN_PORT=5005
+python -m uvicorn CRD507_asgi_emulator:app
\ No newline at end of file
@@ -1,6 +1,5 @@
 import serial
 import time
-import struct
 import numpy as np
 from threading import Thread
 
@@ -17,7 +16,7 @@ class SerialADC:
         self.th.start()
 
     def parse_data(self, buffer):
-        return np.asarray(struct.unpack('<{}H'.format(self.data_len), buffer))
+        return np.frombuffer(buffer, dtype='<u2', count=self.data_len).astype(np.int64)
 
     def flush_data(self):
         self.data_flushed_flag = True # when active, the user knows that this data has not been updated yet, and need to wait for the flag deactived to get updated data
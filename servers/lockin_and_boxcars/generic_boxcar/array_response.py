@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+"""array_response.py:
+This module provides array_response, to reply numpy arrays from a Flask server either as raw bytes or, for older
+clients, base64 encoded in JSON, see RemoteClient.get_arrays of labctrl.
+
+Copy this file next to the server that uses it.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import base64
+import json
+
+import numpy as np
+from flask import Response, request
+
+
+def array_response(res: dict, **arrays) -> Response:
+    """
+    Replies res together with numpy arrays given as keyword arguments.
+    If the client accepts application/octet-stream, the body is the raw bytes of the arrays one after another, and
+    res is sent as JSON in the X-Result header, with key, dtype and shape of every array listed in res['arrays'].
+    Otherwise the arrays are base64 encoded into res, for older clients.
+    """
+    arrays = {k: np.ascontiguousarray(v) for k, v in arrays.items()}
+    if request.accept_mimetypes.best_match(['application/json', 'application/octet-stream']) \
+            == 'application/octet-stream':
+        res['arrays'] = [{'key': k, 'dtype': v.dtype.str, 'shape': v.shape} for k, v in arrays.items()]
+        body = b''.join(v.data for v in arrays.values())
+        return Response(body, status=200, mimetype='application/octet-stream',
+                        headers={'X-Result': json.dumps(res)})
+    for k, v in arrays.items():
+        res[k] = base64.b64encode(v).decode()
+    res = json.dumps(res)
+    return Response(res, status=200, mimetype='application/json')
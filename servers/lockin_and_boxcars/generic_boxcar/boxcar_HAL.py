@@ -2,9 +2,10 @@
 import serial
 import struct
 import time
-from threading import Thread
+from threading import Thread, Condition
 
 import numpy as np
+from ring_buffer import RingBuffer
 np.set_printoptions(precision=5, suppress=True)
 
 """ 
@@ -80,6 +81,7 @@ BOXCAR_DATA_BYTES_LENGTH = 4  # 32 bit to store 24 bit data
 BOXCAR_DATA_BUFFER_SIZE_HALF = BOXCAR_DATA_BUFFER_SIZE // 2
 PWA_DATA_BUFFER_SIZE = 1024
 PWA_DATA_BYTES_LENGTH = 2  # 16 bit to store 12 bit data
+BOXCAR_RECORDS_BUFFERED = 64
 
 
 class BoxcarController:
@@ -98,10 +100,17 @@ class BoxcarController:
         self.halt_flag = False
         self.boxcar_data = np.zeros(BOXCAR_DATA_BUFFER_SIZE, dtype=np.float64)
         self.PWA_data = np.zeros(PWA_DATA_BUFFER_SIZE, dtype=np.float64)
+        # every boxcar record in order, records start at multiples of BOXCAR_DATA_BUFFER_SIZE
+        self.boxcar_samples = RingBuffer(length=BOXCAR_DATA_BUFFER_SIZE * BOXCAR_RECORDS_BUFFERED)
         self.working_mode = DEFAULT_WORKING_MODE
+        self.fpscounter = 0
+        # notified after every new record, so consumers can wait for new data without polling.
+        self.new_data = Condition()
+        # called from the reading thread as on_new_data(kind, data) with kind "boxcar_data" or "PWA_data".
+        # data is overwritten by the next record, copy it if needed later.
+        self.on_new_data = None
         self.t = Thread(target=self.data_reading_task)
         self.t.start()
-        self.fpscounter = 0
 
     def set_delay_background_sampling(self, delay):
         # 16-bit value
@@ -176,20 +185,32 @@ class BoxcarController:
         # data = struct.unpack('<{n}i'.format(n=USB_DATA_BUFFER_SIZE), buffer)
         # data = np.array(data)
         data = np.frombuffer(buffer, dtype=np.int32)
-        for i in range(np.size(data)):
-            self.boxcar_data[i] = data[i]/8388607*5
-        self.fpscounter += 1
+        # scale the whole record in place, the output array is reused by every record.
+        out = self.boxcar_data[:np.size(data)]
+        np.divide(data, 8388607, out=out)
+        out *= 5
+        self.boxcar_samples.append_bulk(self.boxcar_data)
+        self.record_done("boxcar_data", self.boxcar_data)
         # print(self.boxcar_data)
         return data
 
     def PWA_buffer_handler(self, buffer):
         data = np.frombuffer(buffer, dtype=np.uint16)
-        for i in range(np.size(data)):
-            self.PWA_data[i] = data[i]/4096*3.3
-        self.fpscounter += 1
+        # scale the whole record in place, the output array is reused by every record.
+        out = self.PWA_data[:np.size(data)]
+        np.divide(data, 4096, out=out)
+        out *= 3.3
+        self.record_done("PWA_data", self.PWA_data)
         # print(self.PWA_data)
         return data
 
+    def record_done(self, kind, data):
+        with self.new_data:
+            self.fpscounter += 1
+            self.new_data.notify_all()
+        if self.on_new_data is not None:
+            self.on_new_data(kind, data)
+
     def data_reading_task(self):
         while not self.halt_flag:
             if self.ser.in_waiting:
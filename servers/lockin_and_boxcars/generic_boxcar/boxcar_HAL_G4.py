@@ -181,16 +181,20 @@ class BoxcarController:
         # data = struct.unpack('<{n}i'.format(n=USB_DATA_BUFFER_SIZE), buffer)
         # data = np.array(data)
         data = np.frombuffer(buffer, dtype=np.int32)
-        for i in range(np.size(data)):
-            self.boxcar_data[i] = data[i]/65536*2.048
+        # scale the whole record in place, the output array is reused by every record.
+        out = self.boxcar_data[:np.size(data)]
+        np.divide(data, 65536, out=out)
+        out *= 2.048
         self.fpscounter += 1
         # print(self.boxcar_data)
         return data
 
     def PWA_buffer_handler(self, buffer):
         data = np.frombuffer(buffer, dtype=np.uint16)
-        for i in range(np.size(data)):
-            self.PWA_data[i] = data[i]/4096*2.048
+        # scale the whole record in place, the output array is reused by every record.
+        out = self.PWA_data[:np.size(data)]
+        np.divide(data, 4096, out=out)
+        out *= 2.048
         self.fpscounter += 1
         # print(self.PWA_data)
         return data
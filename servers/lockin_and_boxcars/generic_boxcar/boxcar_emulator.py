@@ -12,12 +12,20 @@ __version__ = "20220624"
 
 import json
 import time
-import base64
 import numpy as np
+from threading import Thread
 from flask import Flask, Response
+from array_response import array_response
+from socket_channel import SocketChannel
+from discovery import Announcer
+from batch import add_batch_route
 MCU_BASE_FREQUENCY = 84000000
+# EMULATOR: records per second pushed to socket subscribers
+EMULATED_RECORD_RATE = 20
 
 app = Flask(__name__)
+channel = SocketChannel(app, topics=["boxcar_data", "PWA_data"])
+
 
 @app.route("/")
 def online():
@@ -42,9 +50,7 @@ def get_boxcar_data():
     res = dict()
     res['success'] = True
     res['message'] = "Boxcar data retrived"
-    res['result'] = base64.b64encode(r).decode()
-    res = json.dumps(res)
-    return Response(res, status=200, mimetype='application/json')
+    return array_response(res, result=r)
 
 
 @app.route("/getPWAData")
@@ -54,14 +60,13 @@ def get_PWA_data():
     res = dict()
     res['success'] = True
     res['message'] = "PWA data retrived"
-    res['result'] = base64.b64encode(r).decode()
-    res = json.dumps(res)
-    return Response(res, status=200, mimetype='application/json')
+    return array_response(res, result=r)
 
 @app.route("/setDelayBackgroundSampling/<delay>")
 def set_delay_background_sampling(delay):
     delay = float(delay)
     # actual_delay = boxcar.set_delay_background_sampling(delay)
+    actual_delay = int(delay * MCU_BASE_FREQUENCY)  # EMULATOR: quantized as by the MCU
     actual_delay = actual_delay / MCU_BASE_FREQUENCY
     res = dict()
     res['success'] = True
@@ -74,6 +79,7 @@ def set_delay_background_sampling(delay):
 def set_delay_integrate(delay):
     delay = float(delay)
     # actual_delay = boxcar.set_delay_integrate(delay)
+    actual_delay = int(delay * MCU_BASE_FREQUENCY)  # EMULATOR: quantized as by the MCU
     actual_delay = actual_delay / MCU_BASE_FREQUENCY
     res = dict()
     res['success'] = True
@@ -86,6 +92,7 @@ def set_delay_integrate(delay):
 def set_delay_hold(delay):
     delay = float(delay)
     # actual_delay = boxcar.set_delay_hold(delay)
+    actual_delay = int(delay * MCU_BASE_FREQUENCY)  # EMULATOR: quantized as by the MCU
     actual_delay = actual_delay / MCU_BASE_FREQUENCY
     res = dict()
     res['success'] = True
@@ -98,6 +105,7 @@ def set_delay_hold(delay):
 def set_delay_signal_sampling(delay):
     delay = float(delay)
     # actual_delay = boxcar.set_delay_signal_sampling(delay)
+    actual_delay = int(delay * MCU_BASE_FREQUENCY)  # EMULATOR: quantized as by the MCU
     actual_delay = actual_delay / MCU_BASE_FREQUENCY
     res = dict()
     res['success'] = True
@@ -110,6 +118,7 @@ def set_delay_signal_sampling(delay):
 def set_delay_reset(delay):
     delay = float(delay)
     # actual_delay = boxcar.set_delay_reset(delay)
+    actual_delay = int(delay * MCU_BASE_FREQUENCY)  # EMULATOR: quantized as by the MCU
     actual_delay = actual_delay / MCU_BASE_FREQUENCY
     res = dict()
     res['success'] = True
@@ -123,6 +132,7 @@ def set_delay_reset(delay):
 def set_adc_sampling_interval(delay):
     delay = float(delay)
     # actual_delay = boxcar.set_adc_sampling_interval(delay)
+    actual_delay = int(delay * MCU_BASE_FREQUENCY)  # EMULATOR: quantized as by the MCU
     actual_delay = actual_delay / MCU_BASE_FREQUENCY
     res = dict()
     res['success'] = True
@@ -163,3 +173,20 @@ def set_working_mode(mode):
     res = json.dumps(res)
     return Response(res, status=200, mimetype='application/json')
 
+
+add_batch_route(app)
+
+
+def emulate_new_data():
+    # EMULATOR: the real server publishes from the HAL reading thread
+    while True:
+        time.sleep(1 / EMULATED_RECORD_RATE)
+        res = dict()
+        res['success'] = True
+        res['message'] = "New boxcar_data pushed"
+        channel.publish("boxcar_data", res, result=np.sin(np.linspace(0, 3.5*np.pi, 1000)) + np.random.rand(1000))
+
+
+Thread(target=emulate_new_data, daemon=True).start()
+channel.start()
+Announcer("Generic Boxcar Controller", kind="lockin_and_boxcars").start()
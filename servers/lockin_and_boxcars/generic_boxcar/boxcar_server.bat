@@ -1,6 +1,7 @@
 CALL C:\ProgramData\Anaconda3\condabin\conda.bat activate base
 
 set FLASK_APP=boxcar_server
-python -m flask run --host=0.0.0.0 --port=5055
+set FLASK_RUN_PORT=5055
+python -m flask run --host=0.0.0.0
 
 pause
\ No newline at end of file
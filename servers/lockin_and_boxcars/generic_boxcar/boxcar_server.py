@@ -11,13 +11,21 @@ __version__ = "20220624"
 
 
 import json
-import time
-import base64
 import numpy as np
 from flask import Flask, Response
-from boxcar_HAL import boxcar, MCU_BASE_FREQUENCY, MODE_PWA, MODE_BOXCAR
+from array_response import array_response
+from batch import add_batch_route
+from boxcar_HAL import boxcar, MCU_BASE_FREQUENCY, MODE_PWA, MODE_BOXCAR, BOXCAR_DATA_BUFFER_SIZE
+from socket_channel import SocketChannel
+from discovery import Announcer
+
+# seconds to wait for a boxcar record
+BOXCAR_DATA_TIMEOUT = 30.0
 
 app = Flask(__name__)
+# push every new record to socket subscribers instead of having them poll getBoxcarData
+channel = SocketChannel(app, topics=["boxcar_data", "PWA_data"])
+
 
 @app.route("/")
 def online():
@@ -29,22 +37,29 @@ def online():
     return Response(res, status=200, mimetype='application/json')
 
 
-last_fps_counter = 0
+# count of the samples after the last record returned
+last_record_stop = 0
 
 @app.route("/getBoxcarData")
 def get_boxcar_data():
     # makes sure you can get new results every query
-    global last_fps_counter
-    while boxcar.fpscounter == last_fps_counter:
-        time.sleep(0.01)
-    r = boxcar.boxcar_data
-    last_fps_counter = boxcar.fpscounter
+    global last_record_stop
+    # the latest record if not returned yet, otherwise the next one, returned as soon as it is complete
+    since = max(last_record_stop, boxcar.boxcar_samples.count - BOXCAR_DATA_BUFFER_SIZE)
+    try:
+        r = boxcar.boxcar_samples.wait_for(BOXCAR_DATA_BUFFER_SIZE, since=since, timeout=BOXCAR_DATA_TIMEOUT,
+                                           period=BOXCAR_DATA_BUFFER_SIZE)
+    except TimeoutError:
+        r = np.array([])
+        res = dict()
+        res['success'] = False
+        res['message'] = "Timeout waiting for boxcar data! Check trigger or working mode."
+        return array_response(res, result=r)
+    last_record_stop = since + BOXCAR_DATA_BUFFER_SIZE
     res = dict()
     res['success'] = True
     res['message'] = "Boxcar data retrived"
-    res['result'] = base64.b64encode(r).decode()
-    res = json.dumps(res)
-    return Response(res, status=200, mimetype='application/json')
+    return array_response(res, result=r)
 
 
 @app.route("/getPWAData")
@@ -54,9 +69,7 @@ def get_PWA_data():
     res = dict()
     res['success'] = True
     res['message'] = "PWA data retrived"
-    res['result'] = base64.b64encode(r).decode()
-    res = json.dumps(res)
-    return Response(res, status=200, mimetype='application/json')
+    return array_response(res, result=r)
 
 @app.route("/setDelayBackgroundSampling/<delay>")
 def set_delay_background_sampling(delay):
@@ -161,3 +174,17 @@ def set_working_mode(mode):
     res = json.dumps(res)
     return Response(res, status=200, mimetype='application/json')
 
+
+add_batch_route(app)
+
+
+def publish_new_data(kind, data):
+    res = dict()
+    res['success'] = True
+    res['message'] = "New {} pushed".format(kind)
+    channel.publish(kind, res, result=data)
+
+
+boxcar.on_new_data = publish_new_data
+channel.start()
+Announcer("Generic Boxcar Controller", kind="lockin_and_boxcars").start()
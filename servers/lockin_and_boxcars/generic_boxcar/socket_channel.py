@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+
+"""socket_channel.py:
+This module provides the socket API of a device server, next to its flask REST API, as planned in servers/Proposal.md.
+Polling the REST API adds the latency of a request to every new sample and every finished command, a socket
+connection is kept open instead and the server pushes data as soon as it is available.
+
+The TCP port is found by requesting /socket from the REST API, which replies {"port": ..., "topics": [...]}.
+Every message in both directions is one line of JSON. If the JSON has an "arrays" field, the line is followed by the
+raw bytes of the arrays one after another, with key, dtype and shape of every array listed in "arrays", the same as
+binary replies of the REST API.
+
+Client to server:
+    {"op": "subscribe", "topic": "boxcar_data"}
+    {"op": "unsubscribe", "topic": "boxcar_data"}
+    {"op": "command", "id": 1, "command": "setWorkingMode/Boxcar"}
+Server to client:
+    {"event": "subscribed", "topic": "boxcar_data"}
+    {"event": "unsubscribed", "topic": "boxcar_data"}
+    {"event": "data", "topic": "boxcar_data", "seq": 42, "result": {...}, "arrays": [...]}
+    {"event": "done", "id": 1, "result": {...}, "arrays": [...]}
+    {"event": "error", "message": "..."}
+
+A command is any path of the REST API, and is executed by the same flask view in-process, so everything that can be
+done with the REST API can be done with low latency through the socket. The "done" event is sent when the view
+returns. Commands of one connection are executed in the order they are sent.
+
+Data messages are dropped for a client that reads too slowly, oldest first, so a stalled client never blocks the
+device. Replies to commands and subscriptions are never dropped.
+
+This file is shared by several servers, copy it next to the server that uses it.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import json
+import socket
+import socketserver
+from collections import deque
+from threading import Thread, Lock, Condition
+
+import numpy as np
+from flask import Flask, Response
+
+
+def encode_message(header: dict, arrays: dict | None = None) -> bytes:
+    """Encodes header and numpy arrays as one message."""
+    if not arrays:
+        return json.dumps(header).encode() + b'\n'
+    arrays = {k: np.ascontiguousarray(v) for k, v in arrays.items()}
+    header['arrays'] = [{'key': k, 'dtype': v.dtype.str, 'shape': v.shape} for k, v in arrays.items()]
+    return b''.join([json.dumps(header).encode(), b'\n'] + [v.data for v in arrays.values()])
+
+
+class Connection:
+    def __init__(self, sock: socket.socket, queue_size: int) -> None:
+        self.sock = sock
+        self.queue_size = queue_size
+        self.subscriptions = set()
+        # (message, droppable)
+        self.to_send = deque()
+        self.to_send_cond = Condition()
+        # number of droppable messages in to_send
+        self.n_droppable = 0
+        self.running = True
+        self.dropped = 0
+        self.writer_thread = Thread(target=self.writer_task, daemon=True)
+        self.writer_thread.start()
+
+    def send(self, message: bytes, droppable: bool = False):
+        with self.to_send_cond:
+            if droppable:
+                if self.n_droppable >= self.queue_size:
+                    # drop the oldest data message
+                    for i, (_, d) in enumerate(self.to_send):
+                        if d:
+                            del self.to_send[i]
+                            break
+                    self.dropped += 1
+                else:
+                    self.n_droppable += 1
+            self.to_send.append((message, droppable))
+            self.to_send_cond.notify()
+
+    def writer_task(self):
+        while True:
+            with self.to_send_cond:
+                self.to_send_cond.wait_for(lambda: self.to_send or not self.running)
+                if not self.running:
+                    return
+                message, droppable = self.to_send.popleft()
+                if droppable:
+                    self.n_droppable -= 1
+            try:
+                self.sock.sendall(message)
+            except OSError:
+                self.close()
+                return
+
+    def close(self):
+        with self.to_send_cond:
+            self.running = False
+            self.to_send_cond.notify()
+
+
+class SocketChannel:
+    def __init__(self, app: Flask, topics: list[str], host: str = "0.0.0.0", port: int = 0,
+                 queue_size: int = 16) -> None:
+        """
+        Serves the socket API of app on host:port, port 0 picks a free port. The REST route /socket is added to app.
+        topics are the names of the data streams the server publishes.
+        queue_size is how many data messages are buffered per client before the oldest is dropped.
+        """
+        self.app = app
+        self.topics = list(topics)
+        self.queue_size = queue_size
+        self.connections: set[Connection] = set()
+        self.lock = Lock()
+        self.seq = {topic: 0 for topic in self.topics}
+        channel = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            disable_nagle_algorithm = True
+
+            def handle(self):
+                channel.serve_connection(self.connection, self.rfile)
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self.server = Server((host, port), Handler)
+        self.server_thread = None
+        app.add_url_rule("/socket", "socket", self.socket_info)
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def socket_info(self):
+        res = dict()
+        res['success'] = True
+        res['message'] = "Socket API port"
+        res['port'] = self.port
+        res['topics'] = self.topics
+        res = json.dumps(res)
+        return Response(res, status=200, mimetype='application/json')
+
+    def start(self):
+        self.server_thread = Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        print("Socket API serving at port {}".format(self.port))
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        with self.lock:
+            connections = list(self.connections)
+        for conn in connections:
+            conn.close()
+            conn.sock.close()
+
+    def publish(self, topic: str, res: dict, **arrays):
+        """Pushes res and numpy arrays to every client subscribed to topic. Costs nothing without subscribers."""
+        with self.lock:
+            subscribers = [conn for conn in self.connections if topic in conn.subscriptions]
+            self.seq[topic] = self.seq.get(topic, 0) + 1
+            seq = self.seq[topic]
+        if not subscribers:
+            return
+        message = encode_message({'event': 'data', 'topic': topic, 'seq': seq, 'result': res}, arrays)
+        for conn in subscribers:
+            conn.send(message, droppable=True)
+
+    def serve_connection(self, sock: socket.socket, rfile):
+        conn = Connection(sock, self.queue_size)
+        with self.lock:
+            self.connections.add(conn)
+        client = self.app.test_client()
+        try:
+            for line in rfile:
+                try:
+                    request = json.loads(line)
+                    op = request['op']
+                except (ValueError, KeyError):
+                    conn.send(encode_message({'event': 'error', 'message': "Malformed request"}))
+                    continue
+                if op == 'subscribe' or op == 'unsubscribe':
+                    topic = request.get('topic')
+                    if topic not in self.topics:
+                        conn.send(encode_message({'event': 'error', 'message': "Unknown topic {}".format(topic)}))
+                        continue
+                    with self.lock:
+                        if op == 'subscribe':
+                            conn.subscriptions.add(topic)
+                        else:
+                            conn.subscriptions.discard(topic)
+                    conn.send(encode_message({'event': op + 'd', 'topic': topic}))
+                elif op == 'command':
+                    conn.send(self.execute(client, request))
+                else:
+                    conn.send(encode_message({'event': 'error', 'message': "Unknown op {}".format(op)}))
+        except OSError:
+            pass
+        finally:
+            with self.lock:
+                self.connections.discard(conn)
+            conn.close()
+
+    def execute(self, client, request: dict) -> bytes:
+        """Runs a command with the REST view of the same path, and encodes the reply as a done event."""
+        header = {'event': 'done', 'id': request.get('id')}
+        response = client.get('/' + str(request.get('command', '')).lstrip('/'),
+                              headers={'Accept': 'application/octet-stream'})
+        header['status'] = response.status_code
+        if response.mimetype == 'application/octet-stream':
+            header['result'] = json.loads(response.headers['X-Result'])
+            header['arrays'] = header['result'].pop('arrays')
+            return json.dumps(header).encode() + b'\n' + response.get_data()
+        try:
+            header['result'] = json.loads(response.get_data())
+        except ValueError:
+            header['result'] = {'success': False, 'message': response.get_data(as_text=True)}
+        return encode_message(header)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""ring_buffer.py:
+This module provides RingBuffer, a circular buffer for streaming instrument data, written by one thread, e.g. the
+thread polling the instrument, and read by any number of others, e.g. the threads serving the web API.
+
+Samples are counted by RingBuffer.count, the total number of samples ever appended, which only increases, so a
+reader can tell which samples are new and whether they have been overwritten, without locks, like a seqlock:
+    - the writer copies samples into the buffer first and increases count after, so every sample below count
+      is complete when a reader sees count
+    - before it copies, the writer raises RingBuffer.writing to what count will be after the append, so sample i
+      may be overwritten as soon as i < writing - length. A reader copies first and checks writing after: if the
+      samples copied are still above it, no write touched them meanwhile
+
+Readers that need samples not appended yet block in wait_for until the writer notifies them, no polling.
+
+Like CircularBuffer before, the buffer is twice the length: the samples just behind the write position are kept
+again in the second half, so that the latest n samples are always one contiguous block that can be read without a
+copy. A bulk append is done with two slice assignments, however long it is.
+
+This file is shared by several servers, copy it next to the server that uses it.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+from threading import Condition
+
+import numpy as np
+
+
+class RingBuffer:
+    def __init__(self, length: int = 65536, dtype=np.float64) -> None:
+        self.length: int = length  # default 64 kSamples = 512 kB
+        # second half repeats data[0:count % length] so that a block ending there can be read as data[...:+length]
+        self.data = np.zeros(2 * self.length, dtype=dtype)
+        # total number of samples appended, a Python int never wraps
+        self.count: int = 0
+        # count once the append in progress is done, raised before the samples are copied, count when none is
+        self.writing: int = 0
+        # notified after every append, for readers in wait_for
+        self.appended = Condition()
+
+    def append(self, value):
+        self.writing = self.count + 1
+        i = self.count % self.length
+        self.data[i] = value
+        self.data[i + self.length] = value
+        self.count += 1
+        self.notify()
+
+    def append_bulk(self, values):
+        values = np.asarray(values, dtype=self.data.dtype).ravel()
+        n = np.size(values)
+        total = self.count + n
+        self.writing = total
+        if n > self.length:
+            # only the last length samples fit, the others would be overwritten right away
+            values = values[-self.length:]
+            n = self.length
+        i = (total - n) % self.length
+        if i + n <= self.length:
+            self.data[i:i + n] = values
+            self.data[i + self.length:i + self.length + n] = values
+        else:
+            # the end spills into the second half, which is where it is repeated anyway, copy it to the head
+            self.data[i:i + n] = values
+            self.data[0:i + n - self.length] = values[self.length - i:]
+        self.count = total
+        self.notify()
+
+    def notify(self):
+        with self.appended:
+            self.appended.notify_all()
+
+    def get_current(self):
+        """Returns the latest sample."""
+        return self.data[(self.count - 1) % self.length]
+
+    def latest(self, n: int) -> np.ndarray:
+        """
+        Returns the latest n samples, or all if fewer were appended, oldest first.
+        The array is a read-only view into the buffer, not a copy: it is only valid until the writer has appended
+        another length - n samples, copy it if it is kept longer.
+        """
+        count = self.count
+        n = min(n, count, self.length)
+        end = count % self.length
+        if end < n:
+            end += self.length
+        view = self.data[end - n:end]
+        view.flags.writeable = False
+        return view
+
+    def get_slice(self, istart: int, istop: int) -> np.ndarray:
+        """
+        Returns a copy of samples istart to istop, counted like count.
+        Raises IndexError if some of them are not appended yet, or already overwritten.
+        """
+        assert 0 <= istop - istart <= self.length, "Index out of bound!"
+        count = self.count
+        if istop > count:
+            raise IndexError("samples {} to {} not appended yet, count is {}".format(istart, istop, count))
+        # samples that wrap around end at most at the write position, so the second half holds them
+        start = istart % self.length
+        res = self.data[start:start + istop - istart].copy()
+        # the writer may have started overwriting the samples while they were copied
+        writing = self.writing
+        if istart < writing - self.length:
+            raise IndexError("samples from {} overwritten, count is {}".format(istart, writing))
+        return res
+
+    def wait_for(self, count: int, since: int | None = None, timeout: float | None = None,
+                 period: int = 1) -> np.ndarray:
+        """
+        Waits until count samples from since on are appended and returns a copy of them, as soon as the last one is.
+        since is counted like count, by default the samples appended after the call, i.e. only new ones.
+        The window starts at the first sample from since on whose count is a multiple of period, so that the phase of
+        periodic data is kept, e.g. period=2 for 'S B S B ...' of a chopped signal always starts with S.
+        Raises TimeoutError if the samples are not appended within timeout seconds, None waits forever.
+        """
+        if count > self.length:
+            raise ValueError("cannot wait for {} samples, longer than the buffer of {}".format(count, self.length))
+        istart = self.count if since is None else since
+        istart += -istart % period
+        istop = istart + count
+        with self.appended:
+            if not self.appended.wait_for(lambda: self.count >= istop, timeout):
+                raise TimeoutError("{} samples from {} not appended within {} s, count is {}".format(
+                    count, istart, timeout, self.count))
+        return self.get_slice(istart, istop)
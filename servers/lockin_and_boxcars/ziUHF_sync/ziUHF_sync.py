@@ -9,14 +9,13 @@ __author__ = "Zhi Zi"
 __email__ = "x@zzi.io"
 __version__ = "20211130"
 
-import time
 import numpy as np
 from threading import Thread
 
 # import zhinst.utils
 import zhinst.core
 
-from circular_buffer import CircularBuffer
+from ring_buffer import RingBuffer
 
 cfg = {
     "DeviceID": "dev2461",
@@ -43,7 +42,7 @@ class ziUHF:
         self.poll_timeout = 500  # [ms]
         self.poll_flags = 0
         self.poll_return_flat_dict = True
-        self.buffer = CircularBuffer(length=4096)
+        self.buffer = RingBuffer(length=4096)
         self.init_session()
         self.sync_thread_running = True
         self.sync_thread = Thread(target=self.sync_task)
@@ -68,7 +67,7 @@ class ziUHF:
         while self.sync_thread_running:
             data = self.daq.poll(self.poll_length, self.poll_timeout,
                                  self.poll_flags, self.poll_return_flat_dict)
-            # print(data, self.buffer.current_data_index)
+            # print(data, self.buffer.count)
             try:
                 sample = data[cfg["SamplePath"]]
                 value = sample["value"]
@@ -88,31 +87,12 @@ probably misconfigured SamplePath or node not subscribed".format(e, e.args))
         if get_new_data timing is randomized, then we will get random phase slices like 
         'S B S B S B' and 'B S B S B S', and we will lose track of which one is signal and
         which one is background.
-        If a keep_phase_period param is set, then the istart will always be snapped to a
-        latest grid point of grid size keep_phase_period, for example if keep_phase_period=8,
+        If a keep_phase_period param is set, then the istart will always be snapped to the
+        next grid point of grid size keep_phase_period, for example if keep_phase_period=8,
         then istart will always be one of 8, 16, 24, 32...
+        Returns as soon as the last sample arrives.
         """
-        istart = self.buffer.current_data_index
-        icurrent = istart
-        iintegrate = istart
-        istart = istart % keep_phase_period + istart
-        istop = istart + sample_count
-        tstart = time.time()
-        # print(self.buffer.current_data_index, istart, istop, self.buffer.length)
-        while True:
-            iprevious = icurrent
-            icurrent = self.buffer.current_data_index
-            idelta = (icurrent - iprevious) % self.buffer.length
-            iintegrate = iintegrate + idelta
-            if iintegrate > istop:
-                break
-            # print(self.buffer.current_data_index, istart, istop, self.buffer.length)
-            time.sleep(0.01)
-            tnow = time.time()
-            if (tnow - tstart) > timeout:
-                raise TimeoutError
-    
-        return self.buffer.get_slice(istart, istop)
+        return self.buffer.wait_for(sample_count, timeout=timeout, period=keep_phase_period)
     
     def get_value(self, sample_count: int = 1000, timeout: float = 30.0):
         """
@@ -10,9 +10,10 @@ __email__ = "x@zzi.io"
 __version__ = "20221122"
 
 import json
-import base64
 import numpy as np
 from flask import Flask, Response
+from array_response import array_response
+from batch import add_batch_route
 # from ziUHF_sync import uhf
 
 
@@ -68,9 +69,7 @@ def get_new_data(sample_count):
     res = dict()
     res['success'] = True
     res['message'] = "Boxcar data retrived"
-    res['result'] = base64.b64encode(r).decode()
-    res = json.dumps(res)
-    return Response(res, status=200, mimetype='application/json')
+    return array_response(res, result=r)
 
 
 @app.route("/setDelayBackgroundSampling/<delay>")
@@ -131,3 +130,6 @@ def set_working_mode(mode: str):
     res['param_bounce_back'] = mode
     res = json.dumps(res)
     return Response(res, status=200, mimetype='application/json')
+
+
+add_batch_route(app)
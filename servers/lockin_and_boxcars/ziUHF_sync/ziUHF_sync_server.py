@@ -10,9 +10,10 @@ __email__ = "x@zzi.io"
 __version__ = "20221122"
 
 import json
-import base64
 import numpy as np
 from flask import Flask, Response
+from array_response import array_response
+from batch import add_batch_route
 from ziUHF_sync import uhf
 
 app = Flask(__name__)
@@ -50,17 +51,14 @@ def get_new_data(sample_count):
         res = dict()
         res['success'] = True
         res['message'] = "Boxcar data retrived"
-        res['result'] = base64.b64encode(r).decode()
-        res = json.dumps(res)
-        return Response(res, status=200, mimetype='application/json')
+        return array_response(res, result=r)
     except TimeoutError:
         r = np.array([])
         res = dict()
         res['success'] = False
         res['message'] = "Timeout waiting for {} samples! Check trigger or other connection issues.".format(
             sample_count)
-        res['result'] = base64.b64encode(r).decode()
-        return Response(res, status=200, mimetype='application/json')
+        return array_response(res, result=r)
 
 
 @app.route("/setDelayBackgroundSampling/<delay>")
@@ -121,3 +119,6 @@ def set_working_mode(mode: str):
     res['param_bounce_back'] = mode
     res = json.dumps(res)
     return Response(res, status=200, mimetype='application/json')
+
+
+add_batch_route(app)
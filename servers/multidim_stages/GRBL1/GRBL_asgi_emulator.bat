@@ -0,0 +1,6 @@
+CALL C:\ProgramData\Anaconda3\condabin\conda.bat activate base
+
+set UVICORN_PORT=5049
+python -m uvicorn GRBL_asgi_emulator:app --host 0.0.0.0
+
+pause
\ No newline at end of file
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+"""GRBL_asgi_emulator.py:
+This module provides web API emulator for
+a remote GRBL compatible G-Code controller, served over ASGI,
+see GRBL_asgi_server.py. Moves take time as on the real machine.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+
+import time
+
+from asgi_device import DeviceApp, JobCancelled
+from discovery import Announcer
+
+# EMULATOR: feed rate of emulated moves, mm per second
+EMULATED_FEED_RATE = 10.0
+# EMULATOR: interval of position updates during a move
+EMULATED_POLL_INTERVAL = 0.02
+
+app = DeviceApp("GRBL1")
+machine_position = [0.0, 0.0, 0.0]
+
+
+@app.route("/moveabs/<xyz>")
+def moveabs(xyz: str, job):
+    x, y, z = list(map(float, xyz.split(',')))
+    start = list(machine_position)
+    distance = sum((a - b) ** 2 for a, b in zip((x, y, z), start)) ** 0.5
+    duration = distance / EMULATED_FEED_RATE
+    t0 = time.monotonic()
+    while (elapsed := time.monotonic() - t0) < duration:
+        if job.cancelled:
+            raise JobCancelled
+        job.report(elapsed / duration)
+        machine_position[:] = [b + (a - b) * elapsed / duration for a, b in zip((x, y, z), start)]
+        time.sleep(EMULATED_POLL_INTERVAL)
+    machine_position[:] = [x, y, z]
+    res = dict()
+    res['success'] = True
+    res['name'] = 'GRBL1'
+    res['message'] = "Moved to target position"
+    res['target'] = [x, y, z]
+    return res
+
+
+@app.route("/position", exclusive=False)
+def position():
+    res = dict()
+    res['success'] = True
+    res['message'] = "Machine position"
+    res['position'] = list(machine_position)
+    res['state'] = "Run" if app.jobs.running is not None else "Idle"
+    return res
+
+
+Announcer("GRBL1", kind="multiaxis_stages").start()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+"""GRBL_asgi_server.py:
+This module provides web API for
+a remote GRBL compatible G-Code controller, served over ASGI,
+see asgi_device.py. The API is the same as GRBL_server.py,
+and moves can be run as jobs with /moveabs/<x,y,z>?job=1.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+
+from asgi_device import DeviceApp
+from discovery import Announcer
+from grbl_controller import GRBLController
+
+grbl = GRBLController('COM3')
+
+app = DeviceApp("GRBL1")
+
+
+@app.route("/moveabs/<xyz>")
+def moveabs(xyz: str, job):
+    x, y, z = list(map(float, xyz.split(',')))
+    grbl.blocking_moveabs(x, y, z, job=job)
+    res = dict()
+    res['success'] = True
+    res['name'] = 'GRBL1'
+    res['message'] = "Moved to target position"
+    res['target'] = [x, y, z]
+    return res
+
+
+@app.route("/position", exclusive=False)
+def position():
+    res = dict()
+    res['success'] = True
+    res['message'] = "Machine position"
+    res['position'] = [grbl.parser.vars.get(k) for k in ("MachineX", "MachineY", "MachineZ")]
+    res['state'] = grbl.parser.vars.get("State")
+    return res
+
+
+Announcer("GRBL1", kind="multiaxis_stages").start()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""discovery.py:
+This module provides Announcer, which lets labctrl find a device server on the local network by the name of the device
+instead of a host and port pinned down in configs, see labctrl/discovery.py.
+
+Like the Topas4 locator, discovery is done with UDP: a client sends a query to the multicast group, and to the
+loopback broadcast address for servers on the same computer, every server listening replies to the client directly:
+
+    query:  {"op": "discover", "names": ["CRD507", ...]}      names null or missing asks every server
+    reply:  {"op": "announce", "name": "CRD507", "port": 5005, "kind": "linear_stages", "guid": "..."}
+
+The host of the device is the address the reply is sent from. Servers also send the announcement to the group every
+interval seconds, so that a running client notices servers that are started or moved later.
+
+The port is that of the REST API. If not given, it is read from FLASK_RUN_PORT or UVICORN_PORT, so set the port in
+the .bat file with these variables instead of --port.
+
+This file is shared by several servers, copy it next to the server that uses it.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import json
+import os
+import socket
+import struct
+import uuid
+from threading import Thread, Event
+
+DISCOVERY_GROUP = '239.0.0.182'
+DISCOVERY_PORT = 7416
+# works as loopback broadcast for reused sockets
+LOOPBACK_BROADCAST = '127.255.255.255'
+
+
+def port_from_environment(default: int = 5000) -> int:
+    for variable in ("FLASK_RUN_PORT", "UVICORN_PORT"):
+        if variable in os.environ:
+            return int(os.environ[variable])
+    return default
+
+
+class Announcer:
+    def __init__(self, name: str, port: int | None = None, kind: str = "", interval: float = 10.0,
+                 discovery_port: int = DISCOVERY_PORT, group: str = DISCOVERY_GROUP) -> None:
+        """
+        Announces the device name, served at port, kind is the component type, e.g. "linear_stages".
+        interval is the seconds between unsolicited announcements, 0 sends only replies to queries.
+        """
+        self.name = name
+        self.port = port_from_environment() if port is None else port
+        self.kind = kind
+        self.interval = interval
+        self.discovery_port = discovery_port
+        self.group = group
+        self.guid = str(uuid.uuid4())
+        self.stopped = Event()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        # every server on this computer listens on the same port
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self.sock.bind(('', discovery_port))
+        try:
+            membership = struct.pack('4s4s', socket.inet_aton(group), socket.inet_aton('0.0.0.0'))
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        except OSError as e:
+            # no network, still discoverable from this computer
+            print("Discovery: cannot join multicast group {}: {}".format(group, e))
+        self.listener_thread = Thread(target=self.listener_task, daemon=True)
+        self.announcer_thread = Thread(target=self.announcer_task, daemon=True)
+
+    def announcement(self) -> bytes:
+        message = dict()
+        message['op'] = "announce"
+        message['name'] = self.name
+        message['port'] = self.port
+        message['kind'] = self.kind
+        message['guid'] = self.guid
+        return json.dumps(message).encode()
+
+    def start(self):
+        self.listener_thread.start()
+        self.announcer_thread.start()
+        print("Discovery: announcing {} at port {}".format(self.name, self.port))
+
+    def stop(self):
+        self.stopped.set()
+        self.sock.close()
+
+    def listener_task(self):
+        while not self.stopped.is_set():
+            try:
+                data, sender = self.sock.recvfrom(4096)
+            except OSError:
+                return
+            try:
+                query = json.loads(data)
+            except ValueError:
+                continue
+            if not isinstance(query, dict) or query.get('op') != "discover":
+                continue
+            names = query.get('names')
+            if names is None or self.name in names:
+                try:
+                    self.sock.sendto(self.announcement(), sender)
+                except OSError as e:
+                    print("Discovery: cannot reply to {}: {}".format(sender, e))
+
+    def announcer_task(self):
+        while not self.stopped.is_set():
+            for address in (self.group, LOOPBACK_BROADCAST):
+                try:
+                    self.sock.sendto(self.announcement(), (address, self.discovery_port))
+                except OSError:
+                    pass
+            if not self.interval or self.stopped.wait(self.interval):
+                return
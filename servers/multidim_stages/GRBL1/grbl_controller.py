@@ -5,6 +5,7 @@ import json
 import os
 from threading import Thread
 from GRBL_interface_parser import GRBLParser
+from asgi_device import JobCancelled
 
 WRITE_BUFFER_MAX_LEN = 64
 
@@ -155,18 +156,50 @@ current system, homing is recommanded to re-establish absolute coordinates.""")
         state_is_idle = (self.parser.vars["State"] == "Idle")
         return x_in_place and y_in_place and z_in_place and state_is_idle
 
-    def blocking_moveabs(self, x:float, y:float, z:float):
+    def blocking_moveabs(self, x:float, y:float, z:float, job=None):
         """
         Send a movement command gcode to current buffer and wait for state to become idle.
         This is more reliable than the above, because it checks both idle state and
             machine position.
+        If job is given, the fraction of the distance moved is reported to it, and the move is stopped
+            when the job is cancelled.
         """
+        start = [self.parser.vars.get(k, 0.0) for k in ("MachineX", "MachineY", "MachineZ")]
+        distance = sum((a - b) ** 2 for a, b in zip((x, y, z), start)) ** 0.5
         gcode = "G1 X{x:.3f} Y{y:.3f} Z{z:.3f}".format(x=x, y=y, z=z)
         self.stream_gcode(gcode)
         while not self.moved_to_target(x, y, z):
+            if job is not None and job.cancelled:
+                self.stop_motion()
+                raise JobCancelled
+            if job is not None and distance > 0:
+                moved = sum((self.parser.vars[k] - b) ** 2
+                            for k, b in zip(("MachineX", "MachineY", "MachineZ"), start)) ** 0.5
+                job.report(min(moved / distance, 1.0))
             time.sleep(0.1)
         self.dump_state()
 
+    def stop_motion(self, timeout=10):
+        """
+        Stop a running move and drop the queued ones.
+        A feed hold decelerates to a stop without losing the machine position, a soft reset
+            during motion would lose it. Once held, the soft reset flushes the planner buffer.
+        Realtime commands are picked out of the stream by GRBL, so they are written at once
+            instead of queued behind the g-codes in the write buffer.
+        """
+        self.write_buffer.clear()
+        self.ser.write(b'!')
+        time.sleep(0.2)  # state reports lag behind, see blocking_gcode_command
+        t0 = time.time()
+        while self.parser.vars["State"] in ("Run", "Jog", "Hold:1"):
+            if time.time() - t0 > timeout:
+                print("Timeout waiting for feed hold!")
+                break
+            time.sleep(0.05)
+        self.ser.write(b'\x18')
+        time.sleep(0.2)
+        self.dump_state()
+
     def close(self):
         self.running = False
         time.sleep(1)  # wait for last buffers to finish
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+"""batch.py:
+This module provides add_batch_route, which adds the /batch route to a Flask server, so that a client sends several
+commands in one request, see RemoteClient.batch of labctrl:
+
+    POST /batch, body: {"commands": ["setGain/100", ...]}
+        {"success": <all commands succeeded>, "message": ..., "results": [<reply of every command>, ...]}
+
+Copy this file next to the server that uses it.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import json
+
+from flask import Flask, Response, request
+
+
+def add_batch_route(app: Flask):
+    @app.route("/batch", methods=['POST'])
+    def batch():
+        """
+        Executes commands in the order given in the JSON body {"commands": ["setGain/100", ...]}, each the path of a
+        GET API of this server, and replies the results of all of them in the same order. A failed command does not
+        stop the following ones.
+        """
+        commands = request.get_json(force=True)['commands']
+        urls = app.url_map.bind('')
+        results = []
+        for command in commands:
+            try:
+                endpoint, args = urls.match('/' + command.lstrip('/'))
+                response = app.make_response(app.view_functions[endpoint](**args))
+                results.append(json.loads(response.get_data()))
+            except Exception as e:
+                results.append({'success': False, 'message': "{}: {}".format(type(e).__name__, e)})
+        res = dict()
+        res['success'] = all(r.get('success', False) for r in results)
+        res['message'] = "Batch of {} commands executed".format(len(results))
+        res['results'] = results
+        res = json.dumps(res)
+        return Response(res, status=200, mimetype='application/json')
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""chunked_upload.py:
+This module provides ChunkedUpload, REST routes to upload a large binary payload, e.g. a waveform buffer, in the body
+of PUT requests instead of the URL path. The payload is named by its SHA-256 hex digest and sent in chunks, so an
+interrupted upload is resumed from where it stopped, and a payload the device already holds is not sent at all.
+
+With base "/waveform":
+    GET /waveform
+        {"hash": <digest of the payload the device holds, or null>, "length": ...}
+    GET /waveform/<digest>
+        {"received": <bytes of this upload received so far>, "current": <the device holds it>}
+    PUT /waveform/<digest>?offset=<offset>&length=<total length>, body: bytes [offset, offset + len(body))
+        {"received": ..., "complete": ...}
+        Chunks are accepted in order only, a chunk at another offset than received is refused with status 409 and
+        the received offset, from which the client resumes. When all bytes are received and the digest matches, the
+        payload is passed to on_complete and becomes the current one.
+
+Routes or code that write the device buffer without an upload call invalidate().
+
+Copy this file next to the server that uses it.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import hashlib
+import json
+from threading import Lock
+from typing import Callable
+
+from flask import Flask, Response, request
+
+
+class ChunkedUpload:
+    def __init__(self, app: Flask, base: str, on_complete: Callable[[bytes], None],
+                 max_length: int = 1 << 24, max_pending: int = 4) -> None:
+        """
+        Adds the upload routes under base to app. on_complete is called with the payload when an upload completes,
+        and may raise ValueError to refuse it.
+        max_length is the largest payload accepted, max_pending how many unfinished uploads are kept, oldest
+        dropped first.
+        """
+        self.on_complete = on_complete
+        self.max_length = max_length
+        self.max_pending = max_pending
+        self.current_hash = None
+        self.current_length = 0
+        # digest -> received bytes, in the order the uploads were started
+        self.pending: dict[str, bytearray] = dict()
+        self.lock = Lock()
+        name = base.strip('/')
+        app.add_url_rule(base, name + "_current", self.current)
+        app.add_url_rule(base + "/<digest>", name + "_status", self.status)
+        app.add_url_rule(base + "/<digest>", name + "_upload", self.upload, methods=['PUT', 'POST'])
+
+    def invalidate(self):
+        """Forgets the current payload, call it whenever the device buffer is written by other means than an upload,
+        so that uploading the payload again is not skipped as already current."""
+        with self.lock:
+            self.current_hash = None
+            self.current_length = 0
+
+    def current(self):
+        res = dict()
+        res['success'] = True
+        res['message'] = "Current payload"
+        res['hash'] = self.current_hash
+        res['length'] = self.current_length
+        res = json.dumps(res)
+        return Response(res, status=200, mimetype='application/json')
+
+    def status(self, digest: str):
+        with self.lock:
+            received = len(self.pending.get(digest, b''))
+            is_current = digest == self.current_hash
+        res = dict()
+        res['success'] = True
+        res['message'] = "Upload status"
+        res['received'] = self.current_length if is_current else received
+        res['current'] = is_current
+        res = json.dumps(res)
+        return Response(res, status=200, mimetype='application/json')
+
+    def upload(self, digest: str):
+        try:
+            offset = int(request.args.get('offset', 0))
+            length = int(request.args['length'])
+        except (KeyError, ValueError):
+            return self.reply(False, "Query offset and length required", 400)
+        if not 0 <= length <= self.max_length:
+            return self.reply(False, "Length must be within 0 - {}".format(self.max_length), 413)
+        chunk = request.get_data()
+        with self.lock:
+            if digest == self.current_hash:
+                return self.reply(True, "Payload already current", received=length, complete=True)
+            if digest not in self.pending:
+                if len(self.pending) >= self.max_pending:
+                    self.pending.pop(next(iter(self.pending)))
+                self.pending[digest] = bytearray()
+            buffer = self.pending[digest]
+            if offset != len(buffer) or offset + len(chunk) > length:
+                return self.reply(False, "Chunk out of order", 409, received=len(buffer), complete=False)
+            buffer += chunk
+            if len(buffer) < length:
+                return self.reply(True, "Chunk received", received=len(buffer), complete=False)
+            del self.pending[digest]
+        payload = bytes(buffer)
+        if hashlib.sha256(payload).hexdigest() != digest:
+            return self.reply(False, "Hash mismatch, upload discarded", 422, received=0, complete=False)
+        try:
+            self.on_complete(payload)
+        except ValueError as e:
+            return self.reply(False, str(e), 422, received=0, complete=False)
+        with self.lock:
+            self.current_hash = digest
+            self.current_length = length
+        return self.reply(True, "Upload complete", received=length, complete=True)
+
+    def reply(self, success: bool, message: str, status: int = 200, **fields):
+        res = dict()
+        res['success'] = success
+        res['message'] = message
+        res.update(fields)
+        res = json.dumps(res)
+        return Response(res, status=status, mimetype='application/json')
@@ -19,6 +19,9 @@ import base64
 import numpy as np
 from flask import Flask, Response
 
+from batch import add_batch_route
+from chunked_upload import ChunkedUpload
+
 
 app = Flask(__name__)
 
@@ -45,6 +48,8 @@ def update_waveform(waveform_json):
     waveform = waveform_json["waveform"]
     # drv2665.update_buffer(waveform)
     print("Update Waveform:", waveform)
+    # the buffer no longer holds the last upload
+    waveform_upload.invalidate()
     res = dict()
     res['success'] = True
     res['message'] = "Buffer Updated"
@@ -54,6 +59,21 @@ def update_waveform(waveform_json):
     return Response(res, status=200, mimetype='application/json')
 
 
+# the device buffer takes one command of at most 65535 bytes, including the command byte
+MAX_WAVEFORM_LENGTH = 65534
+
+
+def apply_waveform(payload: bytes):
+    """Writes a waveform uploaded to /waveform, one uint8 sample per byte, to the device buffer."""
+    if len(payload) > MAX_WAVEFORM_LENGTH:
+        raise ValueError("Waveform longer than {} samples".format(MAX_WAVEFORM_LENGTH))
+    # drv2665.update_buffer(list(payload))
+    print("Update Waveform: {} samples".format(len(payload)))
+
+
+waveform_upload = ChunkedUpload(app, "/waveform", apply_waveform, max_length=MAX_WAVEFORM_LENGTH)
+
+
 # =========== BEGIN RAW COMMANDS =============
 
 @app.route("/updateBuffer/<buffer_json>")
@@ -62,6 +82,7 @@ def update_buffer(buffer_json: str):
     buffer = buffer_json["buffer"]
     # drv2665.update_buffer(buffer)
     print("Update Buffer:", buffer)
+    waveform_upload.invalidate()
     res = dict()
     res['success'] = True
     res['message'] = "Buffer Updated"
@@ -206,6 +227,7 @@ def standby():
 @app.route("/reset")
 def reset():
     # drv2665.reset()
+    waveform_upload.invalidate()
     res = dict()
     res['success'] = True
     res['message'] = "Device reset"
@@ -234,3 +256,6 @@ def read_chip_id():
     res['chip_id'] = status["ChipID"]
     res = json.dumps(res)
     return Response(res, status=200, mimetype='application/json')
+
+
+add_batch_route(app)
@@ -19,6 +19,9 @@ import base64
 import numpy as np
 from flask import Flask, Response
 
+from batch import add_batch_route
+from chunked_upload import ChunkedUpload
+
 from drv2665_HAL import DRV2665
 
 drv2665 = DRV2665("COM4")
@@ -47,6 +50,8 @@ def update_waveform(waveform_json):
     waveform_json = json.loads(waveform_json)
     waveform = waveform_json["waveform"]
     drv2665.update_buffer(waveform)
+    # the buffer no longer holds the last upload
+    waveform_upload.invalidate()
     res = dict()
     res['success'] = True
     res['message'] = "Buffer Updated"
@@ -56,6 +61,20 @@ def update_waveform(waveform_json):
     return Response(res, status=200, mimetype='application/json')
 
 
+# the device buffer takes one command of at most 65535 bytes, including the command byte
+MAX_WAVEFORM_LENGTH = 65534
+
+
+def apply_waveform(payload: bytes):
+    """Writes a waveform uploaded to /waveform, one uint8 sample per byte, to the device buffer."""
+    if len(payload) > MAX_WAVEFORM_LENGTH:
+        raise ValueError("Waveform longer than {} samples".format(MAX_WAVEFORM_LENGTH))
+    drv2665.update_buffer(list(payload))
+
+
+waveform_upload = ChunkedUpload(app, "/waveform", apply_waveform, max_length=MAX_WAVEFORM_LENGTH)
+
+
 # =========== BEGIN RAW COMMANDS =============
 
 @app.route("/updateBuffer/<buffer_json>")
@@ -63,6 +82,7 @@ def update_buffer(buffer_json: str):
     buffer_json = json.loads(buffer_json)
     buffer = buffer_json["buffer"]
     drv2665.update_buffer(buffer)
+    waveform_upload.invalidate()
     res = dict()
     res['success'] = True
     res['message'] = "Buffer Updated"
@@ -194,6 +214,7 @@ def standby():
 @app.route("/reset")
 def reset():
     drv2665.reset()
+    waveform_upload.invalidate()
     res = dict()
     res['success'] = True
     res['message'] = "Device reset"
@@ -212,3 +233,6 @@ def read_chip_id():
     res['chip_id'] = drv2665.status["ChipID"]
     res = json.dumps(res)
     return Response(res, status=200, mimetype='application/json')
+
+
+add_batch_route(app)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""
+bench_array_transport.py:
+
+Benchmarks transfer of instrument data from the emulators to remote component clients, base64 in JSON (what clients
+used to get) versus raw binary arrays negotiated by RemoteClient.get_arrays.
+Frame rate and bytes transferred per frame are reported for boxcar traces of the ziUHF sync emulator, for a trace as
+large as a 3584x2748 RGB frame, and for real frames of the ToupTek full-color camera emulator if PIL is installed.
+
+Run with: python -m unittest tests.core.bench_array_transport
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import base64
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import time
+import unittest
+from threading import Thread
+
+import numpy as np
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from labctrl.remote_client import remote_client
+
+SERVERS = os.path.join(os.path.dirname(__file__), "..", "..", "servers")
+FRAME_WIDTH = 3584
+FRAME_HEIGHT = 2748
+# seconds to run every case
+DURATION = 3.0
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def import_server(folder: str, name: str):
+    sys.path.insert(0, os.path.join(SERVERS, folder))
+    try:
+        return importlib.import_module(name)
+    finally:
+        sys.path.pop(0)
+
+
+class BenchArrayTransport(unittest.TestCase):
+    def serve(self, app):
+        server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietRequestHandler)
+        thread = Thread(target=server.serve_forever)
+        thread.start()
+        return server, thread
+
+    def bench(self, app, command: str, key: str, dtype, name: str):
+        server, thread = self.serve(app)
+        url = "http://127.0.0.1:{}/{}".format(server.server_port, command)
+
+        def json_base64():
+            response = remote_client.get(url)
+            r = json.loads(response.content.decode())
+            return np.frombuffer(base64.b64decode(r[key]), dtype=dtype), len(response.content)
+
+        def binary():
+            r = remote_client.get_arrays(url, {key: dtype})
+            return r[key], r[key].nbytes
+
+        try:
+            results = dict()
+            for transport, call in (("base64 JSON", json_base64), ("binary", binary)):
+                n_frames = 0
+                t0 = time.perf_counter()
+                while time.perf_counter() - t0 < DURATION or n_frames < 3:
+                    frame, n_bytes = call()
+                    n_frames += 1
+                results[transport] = (n_frames / (time.perf_counter() - t0), n_bytes, frame)
+        finally:
+            remote_client.close()
+            server.shutdown()
+            thread.join()
+        for transport, (fps, n_bytes, _) in results.items():
+            print("{:24s} {:12s} {:8.1f} frames/s, {:10.3f} MB/frame".format(name, transport, fps, n_bytes / 1e6))
+        self.assertEqual(results["binary"][2].size, results["base64 JSON"][2].size)
+        return results
+
+    def test_boxcar_traces(self):
+        emulator = import_server(os.path.join("lockin_and_boxcars", "ziUHF_sync"), "ziUHF_sync_emulator")
+        print()
+        self.bench(emulator.app, "getNewData/1000", "result", np.float64, "boxcar 1000 samples")
+        n = FRAME_WIDTH * FRAME_HEIGHT * 3 // 8
+        self.bench(emulator.app, "getNewData/{}".format(n), "result", np.float64, "boxcar frame-sized")
+
+    @unittest.skipUnless(importlib.util.find_spec("PIL"), "PIL is not installed")
+    def test_camera_frames(self):
+        emulator = import_server(os.path.join("cameras", "ToupTek_Color"), "toupcam_emulator")
+        # the example images are not in the repository, serve a random frame of the emulated size instead.
+        frame = np.random.randint(0, 256, FRAME_WIDTH * FRAME_HEIGHT * 3, dtype=np.uint8).tobytes()
+        emulator.get_fake_image_buffer = lambda: frame
+        print()
+        self.bench(emulator.app, "trigAndGetBuffer", "buffer", np.uint8, "ToupTek RGB frame")
+
+
+if __name__ == '__main__':
+    unittest.main()
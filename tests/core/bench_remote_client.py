@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""
+bench_remote_client.py:
+
+Benchmarks per-call latency of remote component clients against a local emulator, calling requests.get directly
+(a new connection for every call, as remote.py files used to do) versus the shared pooled RemoteClient.
+The emulator is served both by the flask development server, which closes the connection after every response, and by
+an HTTP/1.1 server which keeps connections alive.
+
+Run with: python -m unittest tests.core.bench_remote_client
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import json
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import numpy as np
+import requests
+from flask import Flask, Response
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from labctrl.remote_client import remote_client
+from labctrl.components.linear_stages.remote import RemoteLinearStage
+
+N_CALLS = 1000
+
+app = Flask(__name__)
+
+
+def moveabs_response(pos: str) -> str:
+    res = dict()
+    res['success'] = True
+    res['message'] = "Moved to target position"
+    res['target'] = float(pos)
+    return json.dumps(res)
+
+
+@app.route("/moveabs/<pos>")
+def moveabs(pos):
+    return Response(moveabs_response(pos), status=200, mimetype='application/json')
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    # logging every request would dominate the latency
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class KeepAliveRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, with Nagle the body waits for the delayed ACK of the client, ~40 ms.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = moveabs_response(self.path.split('/')[-1]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def per_call_latency(call) -> np.ndarray:
+    t = np.zeros(N_CALLS)
+    for i in range(N_CALLS):
+        t0 = time.perf_counter()
+        call(i)
+        t[i] = time.perf_counter() - t0
+    return t
+
+
+class BenchRemoteClient(unittest.TestCase):
+    def bench(self, server, name):
+        thread = Thread(target=server.serve_forever)
+        thread.start()
+        url = "http://127.0.0.1:{}/".format(server.server_port)
+        stage = RemoteLinearStage({"Host": "127.0.0.1", "Port": server.server_port})
+        try:
+            results = {
+                "requests.get": per_call_latency(
+                    lambda i: json.loads(requests.get(url + 'moveabs/{:.6f}'.format(i)).content.decode())),
+                "RemoteClient": per_call_latency(lambda i: stage.moveabs(i)),
+            }
+        finally:
+            remote_client.close()
+            server.shutdown()
+            thread.join()
+            server.server_close()
+        for client, t in results.items():
+            print("{:10s} {:14s} mean {:7.1f} us, p50 {:7.1f} us, p99 {:7.1f} us, {:6.0f} calls/s".format(
+                name, client, t.mean() * 1e6, np.percentile(t, 50) * 1e6, np.percentile(t, 99) * 1e6,
+                1 / t.mean()))
+        # timings on a loaded machine are too noisy to assert on, the speedup is only reported.
+        print("{:10s} speedup of RemoteClient: {:.2f}x".format(
+            name, results["requests.get"].mean() / results["RemoteClient"].mean()))
+        return results
+
+    def test_per_call_latency(self):
+        print("\n{} calls of moveabs per client".format(N_CALLS))
+        self.bench(make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietRequestHandler), "flask")
+        self.bench(ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveRequestHandler), "keep-alive")
+
+
+if __name__ == '__main__':
+    unittest.main()
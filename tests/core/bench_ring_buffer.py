@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""
+bench_ring_buffer.py:
+
+Benchmarks appending instrument data to the ring buffer of the streaming servers, in samples/s, for the chunk sizes
+a ziUHF poll or a boxcar record delivers, against appending one sample at a time as CircularBuffer used to do.
+
+Run with: python -m unittest tests.core.bench_ring_buffer
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import importlib.util
+import os
+import time
+import unittest
+
+import numpy as np
+
+SERVERS = os.path.join(os.path.dirname(__file__), "..", "..", "servers")
+spec = importlib.util.spec_from_file_location(
+    "ring_buffer", os.path.join(SERVERS, "lockin_and_boxcars", "ziUHF_sync", "ring_buffer.py"))
+ring_buffer = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(ring_buffer)
+RingBuffer = ring_buffer.RingBuffer
+
+# seconds to run every case
+DURATION = 1.0
+
+
+class BenchRingBuffer(unittest.TestCase):
+    def bench(self, append, chunk: np.ndarray) -> float:
+        n = 0
+        t = time.perf_counter()
+        while time.perf_counter() - t < DURATION:
+            for _ in range(10):
+                append(chunk)
+            n += 10 * np.size(chunk)
+        return n / (time.perf_counter() - t)
+
+    def test_append_bulk(self):
+        print()
+        for chunk_size in (100, 1000, 10000):
+            chunk = np.random.rand(chunk_size)
+            buf = RingBuffer(length=4096)
+
+            def append_one_by_one(values):
+                for value in values:
+                    buf.append(value)
+
+            rate_loop = self.bench(append_one_by_one, chunk)
+            rate_bulk = self.bench(buf.append_bulk, chunk)
+            print("chunks of {:>5d}: one by one {:>12.3e} samples/s, bulk {:>12.3e} samples/s, {:>8.1f}x".format(
+                chunk_size, rate_loop, rate_bulk, rate_bulk / rate_loop))
+
+    def test_latest(self):
+        buf = RingBuffer(length=65536)
+        buf.append_bulk(np.random.rand(100000))
+        n = 0
+        t = time.perf_counter()
+        while time.perf_counter() - t < DURATION:
+            for _ in range(100):
+                buf.latest(60000)
+            n += 100
+        print("\nlatest 60000 of 65536 samples: {:.3e} reads/s".format(n / (time.perf_counter() - t)))
+
+
+if __name__ == '__main__':
+    unittest.main()
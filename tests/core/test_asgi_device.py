@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_asgi_device.py:
+
+Tests the ASGI device server base against the CRD507 ASGI emulator, calling the ASGI app directly
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import asyncio
+import json
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "servers", "linear_stages", "CRD507"))
+import CRD507_asgi_emulator  # noqa: E402
+sys.path.pop(0)
+
+app = CRD507_asgi_emulator.app
+
+
+async def call(method: str, path: str) -> tuple[int, dict]:
+    """Sends one request to app as an ASGI server would, returns status and decoded reply."""
+    scope = {'type': 'http', 'method': method, 'path': path}
+    sent = list()
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent[0]['status'], json.loads(sent[1]['body'])
+
+
+async def call_timed(method: str, path: str, delay: float = 0) -> tuple[int, dict, float]:
+    """Like call after delay seconds, also returns when the reply arrived."""
+    await asyncio.sleep(delay)
+    status, res = await call(method, path)
+    return status, res, time.monotonic()
+
+
+def run(*calls):
+    async def gather_all():
+        return await asyncio.gather(*calls)
+    return asyncio.run(gather_all())
+
+
+class TestAsgiDevice(unittest.TestCase):
+    def setUp(self):
+        CRD507_asgi_emulator.stage.curr_pos = 0
+
+    def test_envelope(self):
+        (status, res), = run(call('GET', '/moveabs/0.1'))
+        self.assertEqual(status, 200)
+        self.assertEqual(res, {"success": True, "message": "Moved to target position", "target": 0.1})
+        (status, res), = run(call('GET', '/position'))
+        self.assertEqual(res["position"], 100)
+
+    def test_online(self):
+        (status, res), = run(call('GET', '/'))
+        self.assertTrue(res["success"])
+        self.assertEqual(res["name"], "CRD507")
+        self.assertIn("/moveabs/<pos_mm>", res["methods"])
+
+    def test_errors(self):
+        (status, res), (status_bad, res_bad), (status_post, _) = run(
+            call('GET', '/noSuchAPI'), call('GET', '/moveabs/abc'), call('POST', '/moveabs/1'))
+        self.assertEqual(status, 404)
+        self.assertFalse(res["success"])
+        self.assertEqual(status_bad, 400)
+        self.assertTrue(res_bad["message"].startswith("ValueError"))
+        self.assertEqual(status_post, 405)
+
+    def test_status_during_move(self):
+        t = time.monotonic()
+        (_, moved, t_moved), (_, status, t_status) = run(
+            call_timed('GET', '/moveabs/3'), call_timed('GET', '/status', delay=0.05))
+        self.assertTrue(moved["success"])
+        self.assertTrue(status["busy"])
+        self.assertEqual(status["running"], "/moveabs/3")
+        # the poll is answered while the 0.3 s move runs
+        self.assertLess(t_status, t_moved)
+        self.assertLess(t_status - t, 0.1)
+
+    def test_moves_in_order(self):
+        results = run(*[call('GET', '/moveabs/{}'.format(pos)) for pos in (0.1, 0.2, 0.3)])
+        self.assertEqual([res["target"] for _, res in results], [0.1, 0.2, 0.3])
+        self.assertEqual(CRD507_asgi_emulator.stage.curr_pos, 300)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_async_remote.py:
+
+Tests concurrent calls through AsyncRemote
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import json
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+from labctrl.async_remote import AsyncRemote, run_concurrently
+from labctrl.remote_client import remote_client
+from labctrl.components.linear_stages.remote import RemoteLinearStage
+
+# every move takes this long on the emulated stages
+MOVE_TIME = 0.2
+
+
+class SlowStageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        time.sleep(MOVE_TIME)
+        body = json.dumps({"success": True, "target": float(self.path.split('/')[-1])}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestAsyncRemote(unittest.TestCase):
+    def setUp(self):
+        self.servers = [ThreadingHTTPServer(("127.0.0.1", 0), SlowStageHandler) for _ in range(2)]
+        self.threads = [Thread(target=server.serve_forever) for server in self.servers]
+        for thread in self.threads:
+            thread.start()
+        self.stages = [AsyncRemote(RemoteLinearStage({"Host": "127.0.0.1", "Port": server.server_port}))
+                       for server in self.servers]
+
+    def tearDown(self):
+        remote_client.close()
+        for server, thread in zip(self.servers, self.threads):
+            server.shutdown()
+            thread.join()
+            server.server_close()
+
+    def test_different_devices_concurrent(self):
+        t = time.monotonic()
+        r1, r2 = run_concurrently(self.stages[0].moveabs(1.0), self.stages[1].moveabs(2.0))
+        dt = time.monotonic() - t
+        self.assertEqual(r1["target"], 1.0)
+        self.assertEqual(r2["target"], 2.0)
+        self.assertLess(dt, 2 * MOVE_TIME)
+
+    def test_same_device_serialized(self):
+        t = time.monotonic()
+        r1, r2 = run_concurrently(self.stages[0].moveabs(1.0), self.stages[0].moveabs(2.0))
+        dt = time.monotonic() - t
+        self.assertEqual((r1["target"], r2["target"]), (1.0, 2.0))
+        self.assertGreaterEqual(dt, 2 * MOVE_TIME)
+
+    def test_attributes_passed_through(self):
+        self.assertEqual(self.stages[0].port, self.servers[0].server_port)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_discovery.py:
+
+Tests finding device servers by name with the Announcer of the servers and the DeviceRegistry of labctrl
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import importlib.util
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from labctrl.components.linear_stages.remote import RemoteLinearStage
+from labctrl.discovery import DeviceRegistry
+
+SERVERS = os.path.join(os.path.dirname(__file__), "..", "..", "servers")
+spec = importlib.util.spec_from_file_location(
+    "server_discovery", os.path.join(SERVERS, "lockin_and_boxcars", "generic_boxcar", "discovery.py"))
+server_discovery = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(server_discovery)
+
+# not the default port, so that servers running on this computer do not reply
+TEST_PORT = 27416
+
+registry = DeviceRegistry()
+
+
+class TestDiscovery(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        registry.cache_file = os.path.join(self.tempdir.name, "discovered_devices.json")
+        registry.discovery_port = TEST_PORT
+        registry.endpoints.clear()
+        self.announcers = [server_discovery.Announcer("CRD507", port=5005, kind="linear_stages", interval=0,
+                                                      discovery_port=TEST_PORT),
+                           server_discovery.Announcer("GRBL1", port=5049, kind="multiaxis_stages", interval=0,
+                                                      discovery_port=TEST_PORT)]
+        for announcer in self.announcers:
+            announcer.start()
+        # skip the announcements sent on start
+        time.sleep(0.1)
+
+    def tearDown(self):
+        for announcer in self.announcers:
+            announcer.stop()
+        registry.stop()
+        registry.threads = list()
+        registry.on_update = None
+        registry.endpoints.clear()
+        registry.configured_endpoints.clear()
+        registry.applied_endpoints.clear()
+        self.tempdir.cleanup()
+
+    def test_port_from_environment(self):
+        os.environ["UVICORN_PORT"] = "5049"
+        try:
+            self.assertEqual(server_discovery.port_from_environment(), 5049)
+        finally:
+            del os.environ["UVICORN_PORT"]
+        self.assertEqual(server_discovery.port_from_environment(5055), 5055)
+
+    def test_discover_by_name(self):
+        t = time.monotonic()
+        found = registry.discover(["CRD507"], timeout=2)
+        # returns once every name is found instead of waiting for the timeout
+        self.assertLess(time.monotonic() - t, 1)
+        self.assertEqual(list(found), ["CRD507"])
+        self.assertEqual(found["CRD507"]["Port"], 5005)
+        self.assertEqual(found["CRD507"]["Kind"], "linear_stages")
+        self.assertEqual(registry.resolve("CRD507")[1], 5005)
+        self.assertIsNone(registry.resolve("GRBL1"))
+
+    def test_discover_all(self):
+        found = registry.discover(timeout=0.3)
+        self.assertEqual(set(found), {"CRD507", "GRBL1"})
+
+    def test_not_found(self):
+        self.assertEqual(registry.discover(["ETHGASN"], timeout=0.2), dict())
+        self.assertIsNone(registry.resolve("ETHGASN"))
+
+    def test_apply(self):
+        registry.discover(["CRD507", "GRBL1"], timeout=2)
+        host = registry.resolve("CRD507")[0]
+        config = {"basic": {"FileStem": "NewSample"},
+                  "linear_stages": {"CRD507": {"Name": "CRD507", "Host": "10.0.0.1", "Port": 1},
+                                    "ETHGASN": {"Name": "ETHGASN", "Host": "10.0.0.2", "Port": 2}},
+                  "multiaxis_stages": {"GRBL1": {"Name": "GRBL1", "Host": "10.0.0.3", "Port": 3,
+                                                 "Axes": [{"Name": "GRBL1.X"}]}}}
+        self.assertEqual(registry.apply(config), 2)
+        self.assertEqual(config["linear_stages"]["CRD507"]["Host"], host)
+        self.assertEqual(config["linear_stages"]["CRD507"]["Port"], 5005)
+        self.assertEqual(config["multiaxis_stages"]["GRBL1"]["Port"], 5049)
+        # not found, configs kept
+        self.assertEqual(config["linear_stages"]["ETHGASN"]["Port"], 2)
+        self.assertEqual(registry.apply(config), 0)
+        # the endpoints found are not saved with the configs
+        saved = registry.configured(config)
+        self.assertEqual(saved["linear_stages"]["CRD507"]["Port"], 1)
+        self.assertEqual(saved["multiaxis_stages"]["GRBL1"]["Host"], "10.0.0.3")
+        self.assertEqual(saved["multiaxis_stages"]["GRBL1"]["Axes"], [{"Name": "GRBL1.X"}])
+        self.assertEqual(config["linear_stages"]["CRD507"]["Port"], 5005)
+        # set by the user after apply, saved as set
+        config["linear_stages"]["CRD507"]["Port"] = 5006
+        self.assertEqual(registry.configured(config)["linear_stages"]["CRD507"]["Port"], 5006)
+        self.assertEqual(registry.apply(config), 1)
+        self.assertEqual(registry.configured(config)["linear_stages"]["CRD507"]["Port"], 5006)
+
+    def test_attach(self):
+        config = {"linear_stages": {"CRD507": {"Name": "CRD507", "Host": "10.0.0.1", "Port": 1}},
+                  "multiaxis_stages": {"GRBL1": {"Name": "GRBL1", "Host": "10.0.0.3", "Port": 3}}}
+        self.assertEqual(registry.names(config), ["CRD507", "GRBL1"])
+        remote = RemoteLinearStage(config["linear_stages"]["CRD507"])
+        self.assertEqual(remote.api_url, "http://10.0.0.1:1/")
+        # no cache, the first start waits for the servers instead of using the configs
+        registry.attach(config, timeout=2, interval=60)
+        self.assertEqual(config["multiaxis_stages"]["GRBL1"]["Port"], 5049)
+        # the remote follows the config rewritten in place
+        self.assertEqual(remote.port, 5005)
+        self.assertTrue(remote.api_url.endswith(":5005/"))
+
+    def test_cache(self):
+        registry.discover(["CRD507"], timeout=2)
+        with open(registry.cache_file, 'r') as f:
+            self.assertEqual(json.load(f)["CRD507"]["Port"], 5005)
+        registry.endpoints.clear()
+        registry.load_cache()
+        self.assertEqual(registry.resolve("CRD507")[1], 5005)
+
+    def test_listener(self):
+        updates = list()
+        registry.start(on_update=lambda: updates.append(registry.resolve("GRBL1")), interval=60)
+        time.sleep(0.7)
+        updates.clear()
+        # a server moved to another port announces itself
+        self.announcers[1].stop()
+        moved = server_discovery.Announcer("GRBL1", port=5050, kind="multiaxis_stages", interval=60,
+                                           discovery_port=TEST_PORT)
+        self.announcers[1] = moved
+        moved.start()
+        deadline = time.monotonic() + 2
+        while not updates and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(updates[-1][1], 5050)
+
+
+if __name__ == '__main__':
+    unittest.main()
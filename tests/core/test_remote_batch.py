@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_remote_batch.py:
+
+Tests batched API calls against the generic boxcar emulator
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import os
+import sys
+import unittest
+from concurrent.futures import Future
+from threading import Thread
+
+from flask import Flask
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from labctrl.remote_client import remote_client
+from labctrl.components.lockin_and_boxcars.remote import RemoteBoxcarController
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "servers", "lockin_and_boxcars",
+                                "generic_boxcar"))
+import boxcar_emulator  # noqa: E402
+sys.path.pop(0)
+
+# (method, path) of every request the servers have seen
+requests_seen = list()
+
+
+class CountingRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        requests_seen.append((self.command, self.path))
+
+
+def serve(app):
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=CountingRequestHandler)
+    thread = Thread(target=server.serve_forever)
+    thread.start()
+    return server, thread
+
+
+class TestRemoteBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server, cls.thread = serve(boxcar_emulator.app)
+        # a server without /batch
+        app = Flask(__name__)
+        app.add_url_rule("/setADCSampleNumber/<n_sample>", view_func=boxcar_emulator.set_adc_sample_number)
+        cls.old_server, cls.old_thread = serve(app)
+
+    @classmethod
+    def tearDownClass(cls):
+        remote_client.close()
+        for server, thread in ((cls.server, cls.thread), (cls.old_server, cls.old_thread)):
+            server.shutdown()
+            thread.join()
+
+    def setUp(self):
+        requests_seen.clear()
+        self.boxcar = RemoteBoxcarController({"Host": "127.0.0.1", "Port": self.server.server_port})
+
+    def test_one_request(self):
+        with self.boxcar.batch():
+            futures = [self.boxcar.set_adc_sample_number(i) for i in range(10)]
+            self.assertTrue(all(isinstance(f, Future) for f in futures))
+            self.assertFalse(any(f.done() for f in futures))
+        self.assertEqual([f.result()["target"] for f in futures], list(range(10)))
+        self.assertEqual(requests_seen, [("POST", "/batch")])
+
+    def test_results(self):
+        with self.boxcar.batch():
+            delay = self.boxcar.set_delay_hold(1e-6)
+            mode = self.boxcar.set_working_mode("Boxcar")
+        self.assertAlmostEqual(delay.result()["target"], 1e-6)
+        self.assertEqual(mode.result()["success"], True)
+        # calls outside the block are sent at once
+        self.assertEqual(self.boxcar.set_adc_sample_number(3)["target"], 3)
+
+    def test_failed_command(self):
+        with self.boxcar.batch():
+            r1 = self.boxcar.set_adc_sample_number(1)
+            r2 = self.boxcar.apicall('noSuchCommand')
+            r3 = self.boxcar.set_adc_sample_number(2)
+        self.assertEqual(r1.result()["target"], 1)
+        self.assertFalse(r2.result()["success"])
+        self.assertEqual(r3.result()["target"], 2)
+
+    def test_exception_in_block(self):
+        with self.assertRaises(RuntimeError):
+            with self.boxcar.batch():
+                future = self.boxcar.set_adc_sample_number(1)
+                raise RuntimeError
+        self.assertTrue(future.cancelled())
+        self.assertEqual(requests_seen, [])
+
+    def test_fallback(self):
+        old = RemoteBoxcarController({"Host": "127.0.0.1", "Port": self.old_server.server_port})
+        with old.batch():
+            futures = [old.set_adc_sample_number(i) for i in range(3)]
+        self.assertEqual([f.result()["target"] for f in futures], [0, 1, 2])
+        self.assertEqual(requests_seen, [("POST", "/batch")] + [
+            ("GET", "/setADCSampleNumber/{}".format(i)) for i in range(3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
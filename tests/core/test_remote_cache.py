@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_remote_cache.py:
+
+Tests caching of replies in the shared HTTP client of remote components
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import json
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+from labctrl.remote_client import remote_client
+
+# seconds the emulated instrument takes to reply
+REPLY_TIME = 0.1
+# paths of the requests the server has seen
+requests_seen = list()
+
+
+class SlowInstrumentHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        requests_seen.append(self.path)
+        time.sleep(REPLY_TIME)
+        body = json.dumps({"success": True, "path": self.path, "n": len(requests_seen)}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestRemoteCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.servers = [ThreadingHTTPServer(("127.0.0.1", 0), SlowInstrumentHandler) for _ in range(2)]
+        cls.threads = [Thread(target=server.serve_forever) for server in cls.servers]
+        for thread in cls.threads:
+            thread.start()
+        cls.urls = ["http://127.0.0.1:{}/".format(server.server_port) for server in cls.servers]
+
+    @classmethod
+    def tearDownClass(cls):
+        remote_client.close()
+        for server, thread in zip(cls.servers, cls.threads):
+            server.shutdown()
+            thread.join()
+            server.server_close()
+
+    def setUp(self):
+        requests_seen.clear()
+        remote_client.set_cache_ttl('getSensorData', 0.5)
+
+    def tearDown(self):
+        remote_client.set_cache_ttl('getSensorData', None)
+        remote_client.set_cache_ttl('readStatus', None, api_url=self.urls[1])
+        remote_client.invalidate()
+
+    def test_ttl(self):
+        url = self.urls[0] + 'getSensorData'
+        first = remote_client.get_json(url)
+        self.assertEqual(remote_client.get_json(url), first)
+        self.assertEqual(len(requests_seen), 1)
+        time.sleep(0.5)
+        self.assertNotEqual(remote_client.get_json(url), first)
+        self.assertEqual(len(requests_seen), 2)
+
+    def test_keyed_by_arguments(self):
+        remote_client.get_json(self.urls[0] + 'getSensorData/1')
+        remote_client.get_json(self.urls[0] + 'getSensorData/2')
+        remote_client.get_json(self.urls[0] + 'getSensorData/1')
+        self.assertEqual(requests_seen, ['/getSensorData/1', '/getSensorData/2'])
+
+    def test_not_cached(self):
+        remote_client.get_json(self.urls[0] + 'readStatus')
+        remote_client.get_json(self.urls[0] + 'readStatus')
+        self.assertEqual(len(requests_seen), 2)
+
+    def test_per_server(self):
+        remote_client.set_cache_ttl('readStatus', 0.5, api_url=self.urls[1])
+        for _ in range(2):
+            remote_client.get_json(self.urls[0] + 'readStatus')
+            remote_client.get_json(self.urls[1] + 'readStatus')
+        self.assertEqual(len(requests_seen), 3)
+
+    def test_coalesce(self):
+        url = self.urls[0] + 'getSensorData'
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            results = list(executor.map(lambda _: remote_client.get_json(url), range(5)))
+        self.assertEqual(len(requests_seen), 1)
+        self.assertTrue(all(res == results[0] for res in results))
+
+    def test_command_invalidates(self):
+        url = self.urls[0] + 'getSensorData'
+        remote_client.get_json(url)
+        remote_client.get_json(self.urls[1] + 'getSensorData')
+        remote_client.get_json(self.urls[0] + 'setSensorConfig/1')
+        remote_client.get_json(url)
+        remote_client.get_json(self.urls[1] + 'getSensorData')
+        # only the server of the command asked again
+        self.assertEqual(len(requests_seen), 4)
+        self.assertEqual(requests_seen[-1], '/getSensorData')
+
+    def test_reply_copied(self):
+        url = self.urls[0] + 'getSensorData'
+        remote_client.get_json(url)["success"] = False
+        self.assertTrue(remote_client.get_json(url)["success"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_remote_client.py:
+
+Tests the shared HTTP client of remote components
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import base64
+import json
+import os
+import socket
+import sys
+import time
+import unittest
+from threading import Thread
+
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from labctrl.remote_client import RemoteClient, remote_client
+from labctrl.components.linear_stages.remote import RemoteLinearStage
+from labctrl.components.lockin_and_boxcars.remote import RemoteBoxcarController
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "servers", "lockin_and_boxcars", "ziUHF_sync"))
+import ziUHF_sync_emulator  # noqa: E402
+sys.path.pop(0)
+
+# client ports of the connections the server has seen
+connections = set()
+
+
+class KeepAliveRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, with Nagle the body waits for the delayed ACK of the client, ~40 ms.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        connections.add(self.client_address[1])
+        body = json.dumps({"success": True, "position": float(self.path.split('/')[-1])}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class TestRemoteClient(unittest.TestCase):
+    def test_singleton(self):
+        self.assertIs(RemoteClient(), remote_client)
+
+    def test_connection_reused(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveRequestHandler)
+        thread = Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            stage = RemoteLinearStage({"Host": "127.0.0.1", "Port": server.server_port})
+            connections.clear()
+            for i in range(10):
+                self.assertEqual(stage.moveabs(i), {"success": True, "position": float(i)})
+            self.assertEqual(len(connections), 1)
+        finally:
+            remote_client.close()
+            server.shutdown()
+            thread.join()
+            server.server_close()
+
+    def test_retry_then_raise(self):
+        remote_client.configure(backoff=0.05)
+        try:
+            url = "http://127.0.0.1:{}/moveabs/1".format(free_port())
+            t = time.monotonic()
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                remote_client.get(url, max_retry=3)
+            # two waits between three tries: 0.05 + 0.1
+            self.assertGreaterEqual(time.monotonic() - t, 0.15)
+        finally:
+            remote_client.configure(backoff=0.1)
+
+    def test_get_arrays(self):
+        server = make_server("127.0.0.1", 0, ziUHF_sync_emulator.app, threaded=True,
+                             request_handler=QuietRequestHandler)
+        thread = Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            boxcar = RemoteBoxcarController({"Host": "127.0.0.1", "Port": server.server_port})
+            data = boxcar.get_new_data(1000)
+            self.assertEqual(data.dtype, np.float64)
+            self.assertEqual(data.shape, (1000,))
+            # clients not asking for binary still get base64 in JSON
+            r = remote_client.get_json(boxcar.api_url + 'getNewData/10')
+            self.assertTrue(r["success"])
+            self.assertEqual(np.frombuffer(base64.b64decode(r["result"]), dtype=np.float64).shape, (10,))
+        finally:
+            remote_client.close()
+            server.shutdown()
+            thread.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
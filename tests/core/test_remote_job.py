@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_remote_job.py:
+
+Tests motion jobs of the CRD507 and GRBL1 ASGI emulators through the Remote* clients
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import asyncio
+import importlib.util
+import os
+import sys
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+from labctrl.remote_client import remote_client
+from labctrl.components.linear_stages.remote import RemoteLinearStage
+from labctrl.components.multiaxis_stages.remote import RemoteThreeAxesStage
+
+SERVERS = os.path.join(os.path.dirname(__file__), "..", "..", "servers")
+
+
+def import_server(folder: str, name: str, as_name: str):
+    """Imports name.py of folder as module as_name, the servers of different folders share module names."""
+    folder = os.path.join(SERVERS, folder)
+    sys.path.insert(0, folder)
+    try:
+        spec = importlib.util.spec_from_file_location(as_name, os.path.join(folder, name + ".py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        sys.path.pop(0)
+        # asgi_device and discovery are copied next to every server that uses them
+        sys.modules.pop("asgi_device", None)
+        sys.modules.pop("discovery", None)
+
+
+CRD507_asgi_emulator = import_server(os.path.join("linear_stages", "CRD507"), "CRD507_asgi_emulator",
+                                     "CRD507_asgi_emulator")
+GRBL1_asgi_emulator = import_server(os.path.join("multidim_stages", "GRBL1"), "GRBL_asgi_emulator",
+                                    "GRBL1_asgi_emulator")
+
+
+class ASGIServer(ThreadingHTTPServer):
+    """Serves an ASGI app over HTTP/1.1 for the tests, running it on an event loop in its own thread, like an ASGI
+    server such as uvicorn would."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = Thread(target=self.loop.run_forever, daemon=True)
+        self.loop_thread.start()
+        super().__init__(("127.0.0.1", 0), ASGIRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.loop_thread.join()
+
+
+class ASGIRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query.encode()}
+        sent = list()
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run_coroutine_threadsafe(self.server.app(scope, receive, send), self.server.loop).result()
+        self.send_response(sent[0]['status'])
+        for key, value in sent[0]['headers']:
+            self.send_header(key.decode(), value.decode())
+        self.end_headers()
+        self.wfile.write(sent[1]['body'])
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(app):
+    server = ASGIServer(app)
+    thread = Thread(target=server.serve_forever)
+    thread.start()
+    return server, thread
+
+
+class TestRemoteJob(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.servers = [serve(CRD507_asgi_emulator.app), serve(GRBL1_asgi_emulator.app)]
+        cls.stage = RemoteLinearStage({"Host": "127.0.0.1", "Port": cls.servers[0][0].server_port})
+        cls.grbl = RemoteThreeAxesStage({"Host": "127.0.0.1", "Port": cls.servers[1][0].server_port})
+
+    @classmethod
+    def tearDownClass(cls):
+        remote_client.close()
+        for server, thread in cls.servers:
+            server.shutdown()
+            thread.join()
+            server.server_close()
+
+    def setUp(self):
+        CRD507_asgi_emulator.stage.curr_pos = 0
+        GRBL1_asgi_emulator.machine_position[:] = [0.0, 0.0, 0.0]
+
+    def test_move_async(self):
+        t = time.monotonic()
+        job = self.stage.move_async(2.0)
+        self.assertLess(time.monotonic() - t, 0.1)
+        self.assertIn(job.state, ("queued", "running"))
+        # the server answers while the 0.2 s move runs
+        self.assertTrue(self.stage.apicall('status')["busy"])
+        result = job.wait(timeout=5)
+        self.assertEqual(result, {"success": True, "message": "Moved to target position", "target": 2.0})
+        self.assertEqual(job.state, "done")
+        self.assertEqual(job.progress, 1.0)
+        self.assertEqual(CRD507_asgi_emulator.stage.curr_pos, 2000)
+
+    def test_progress(self):
+        job = self.stage.move_async(3.0)
+        time.sleep(0.15)
+        job.refresh()
+        self.assertEqual(job.state, "running")
+        self.assertGreater(job.progress, 0)
+        self.assertLess(job.progress, 1)
+        self.assertFalse(job.done())
+        job.wait(timeout=5)
+        self.assertTrue(job.done())
+
+    def test_wait_timeout(self):
+        job = self.stage.move_async(3.0)
+        with self.assertRaises(TimeoutError):
+            job.wait(timeout=0.05)
+        job.wait(timeout=5)
+
+    def test_queued_in_order(self):
+        jobs = [self.stage.move_async(pos) for pos in (0.5, 1.0, 0.2)]
+        self.assertEqual([job.wait(timeout=5)["target"] for job in jobs], [0.5, 1.0, 0.2])
+        self.assertEqual(CRD507_asgi_emulator.stage.curr_pos, 200)
+
+    def test_cancel(self):
+        running = self.stage.move_async(5.0)
+        queued = self.stage.move_async(1.0)
+        time.sleep(0.05)
+        queued.cancel()
+        self.assertEqual(queued.state, "cancelled")
+        running.cancel()
+        result = running.wait(timeout=5)
+        self.assertFalse(result["success"])
+        self.assertEqual(running.state, "cancelled")
+        # stopped on the way
+        self.assertLess(CRD507_asgi_emulator.stage.curr_pos, 5000)
+
+    def test_cancel_all(self):
+        jobs = [self.grbl.move_async(x, 0, 0) for x in (5.0, 1.0)]
+        time.sleep(0.05)
+        self.assertTrue(self.grbl.cancel_jobs()["success"])
+        self.assertEqual([job.wait(timeout=5)["success"] for job in jobs], [False, False])
+        self.assertEqual([job.state for job in jobs], ["cancelled", "cancelled"])
+
+    def test_blocking_call(self):
+        self.assertEqual(self.grbl.moveabs(1.0, 0.5, 0.0)["target"], [1.0, 0.5, 0.0])
+        self.assertEqual(GRBL1_asgi_emulator.machine_position, [1.0, 0.5, 0.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_remote_upload.py:
+
+Tests waveform uploads in request bodies against the DRV2665 emulator
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import unittest
+from threading import Thread
+
+import numpy as np
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from labctrl.remote_client import remote_client
+from labctrl.components.signal_generators.remote import RemoteSignalGenerator
+
+DRV2665 = os.path.join(os.path.dirname(__file__), "..", "..", "servers", "signal_generators", "drv2665")
+sys.path.insert(0, DRV2665)
+spec = importlib.util.spec_from_file_location("drv2665_emulator", os.path.join(DRV2665, "emulator.py"))
+drv2665_emulator = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(drv2665_emulator)
+sys.path.pop(0)
+
+# (method, path) of every request the server has seen
+requests_seen = list()
+
+
+class CountingRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        requests_seen.append((self.command, self.path))
+
+
+class TestRemoteUpload(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.applied = list()
+        cls.apply_waveform = drv2665_emulator.waveform_upload.on_complete
+        drv2665_emulator.waveform_upload.on_complete = cls.applied.append
+        cls.server = make_server("127.0.0.1", 0, drv2665_emulator.app, threaded=True,
+                                 request_handler=CountingRequestHandler)
+        cls.thread = Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+        cls.url = "http://127.0.0.1:{}/waveform".format(cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        drv2665_emulator.waveform_upload.on_complete = cls.apply_waveform
+        remote_client.close()
+        cls.server.shutdown()
+        cls.thread.join()
+
+    def setUp(self):
+        requests_seen.clear()
+        self.applied.clear()
+        self.sg = RemoteSignalGenerator({"Host": "127.0.0.1", "Port": self.server.server_port})
+
+    def test_update_waveform(self):
+        waveform = list(np.arange(3000) % 256)
+        res = self.sg.update_waveform(waveform)
+        self.assertTrue(res["success"])
+        self.assertTrue(res["complete"])
+        self.assertEqual(res["sent"], 3000)
+        self.assertEqual(self.applied, [bytes(waveform)])
+        # same waveform again is not sent
+        res = self.sg.update_waveform(waveform)
+        self.assertTrue(res["success"])
+        self.assertEqual(res["sent"], 0)
+        self.assertEqual(len(self.applied), 1)
+        self.assertEqual(requests_seen[-1][0], "GET")
+
+    def test_legacy_write_invalidates(self):
+        waveform = list(np.arange(500) % 256)
+        self.sg.update_waveform(waveform)
+        # another waveform written through the old path in the URL
+        remote_client.get_json(self.sg.api_url + 'updateWaveform/{}'.format(json.dumps({"waveform": [1, 2, 3]})))
+        res = self.sg.update_waveform(waveform)
+        self.assertEqual(res["sent"], 500)
+        self.assertEqual(self.applied, [bytes(waveform)] * 2)
+
+    def test_chunks(self):
+        payload = (np.arange(1000) % 251).astype(np.uint8).tobytes()
+        res = remote_client.upload(self.url, payload, chunk_size=300)
+        self.assertEqual(res["sent"], 1000)
+        self.assertEqual([method for method, _ in requests_seen], ["GET"] + ["PUT"] * 4)
+        self.assertEqual(self.applied, [payload])
+
+    def test_resume(self):
+        payload = (np.arange(1000) % 253).astype(np.uint8).tobytes()
+        digest = hashlib.sha256(payload).hexdigest()
+        # an upload interrupted after the first chunk
+        remote_client.request("PUT", self.url + '/' + digest, data=payload[:400],
+                              params={'offset': 0, 'length': 1000})
+        res = remote_client.upload(self.url, payload, chunk_size=400)
+        self.assertTrue(res["complete"])
+        self.assertEqual(res["sent"], 600)
+        self.assertEqual(self.applied, [payload])
+
+    def test_hash_mismatch(self):
+        payload = bytes(100)
+        res = remote_client.request("PUT", self.url + '/' + "0" * 64, data=payload,
+                                    params={'offset': 0, 'length': 100})
+        self.assertEqual(res.status_code, 422)
+        self.assertEqual(self.applied, [])
+
+    def test_out_of_range(self):
+        with self.assertRaises(ValueError):
+            self.sg.update_waveform([0, 256])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_ring_buffer.py:
+
+Tests the ring buffer shared by the servers of streaming instruments
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import importlib.util
+import os
+import time
+import unittest
+from threading import Thread
+
+import numpy as np
+
+SERVERS = os.path.join(os.path.dirname(__file__), "..", "..", "servers")
+spec = importlib.util.spec_from_file_location(
+    "ring_buffer", os.path.join(SERVERS, "lockin_and_boxcars", "ziUHF_sync", "ring_buffer.py"))
+ring_buffer = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(ring_buffer)
+RingBuffer = ring_buffer.RingBuffer
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_append(self):
+        buf = RingBuffer(length=8)
+        for i in range(20):
+            buf.append(i)
+            self.assertEqual(buf.get_current(), i)
+        self.assertEqual(buf.count, 20)
+        np.testing.assert_array_equal(buf.latest(8), np.arange(12, 20))
+
+    def test_append_bulk(self):
+        # chunks of every size, wrapping at every position
+        buf = RingBuffer(length=16)
+        i = 0
+        for n in [0, 1, 5, 16, 3, 15, 7, 9, 2, 16, 11] * 3:
+            buf.append_bulk(np.arange(i, i + n))
+            i += n
+            self.assertEqual(buf.count, i)
+            for m in range(min(i, 16) + 1):
+                np.testing.assert_array_equal(buf.latest(m), np.arange(i - m, i))
+            np.testing.assert_array_equal(buf.get_slice(max(i - 16, 0), i), np.arange(max(i - 16, 0), i))
+
+    def test_longer_than_buffer(self):
+        buf = RingBuffer(length=8)
+        buf.append_bulk(np.arange(3))
+        buf.append_bulk(np.arange(3, 30))
+        self.assertEqual(buf.count, 30)
+        np.testing.assert_array_equal(buf.latest(100), np.arange(22, 30))
+
+    def test_latest_zero_copy(self):
+        buf = RingBuffer(length=8)
+        buf.append_bulk(np.arange(13))
+        view = buf.latest(6)
+        self.assertTrue(np.shares_memory(view, buf.data))
+        with self.assertRaises(ValueError):
+            view[0] = 0
+        self.assertEqual(len(RingBuffer().latest(10)), 0)
+
+    def test_get_slice(self):
+        buf = RingBuffer(length=8)
+        buf.append_bulk(np.arange(13))
+        np.testing.assert_array_equal(buf.get_slice(6, 11), np.arange(6, 11))
+        self.assertFalse(np.shares_memory(buf.get_slice(6, 11), buf.data))
+        with self.assertRaises(IndexError):
+            buf.get_slice(10, 15)
+        with self.assertRaises(IndexError):
+            buf.get_slice(2, 8)
+
+    def test_write_in_progress(self):
+        buf = RingBuffer(length=8)
+        buf.append_bulk(np.arange(3))
+        seen = list()
+
+        class Recording(np.ndarray):
+            def __setitem__(self, key, value):
+                seen.append((buf.count, buf.writing))
+                super().__setitem__(key, value)
+
+        buf.data = buf.data.view(Recording)
+        buf.append_bulk(np.arange(3, 30))
+        # count is only published once every sample is copied, writing before any is
+        self.assertEqual(set(seen), {(3, 30)})
+        self.assertEqual((buf.count, buf.writing), (30, 30))
+        # a reader overlapping an append of 4 does not trust the 4 oldest samples, though count is not raised yet
+        buf.writing = 34
+        with self.assertRaises(IndexError):
+            buf.get_slice(22, 30)
+        np.testing.assert_array_equal(buf.get_slice(26, 30), np.arange(26, 30))
+
+    def test_wait_for(self):
+        buf = RingBuffer(length=64)
+        buf.append_bulk(np.arange(5))
+
+        def writer():
+            for i in range(5, 45, 4):
+                time.sleep(0.01)
+                buf.append_bulk(np.arange(i, i + 4))
+
+        thread = Thread(target=writer)
+        thread.start()
+        # new samples only, starting at the next even count
+        np.testing.assert_array_equal(buf.wait_for(10, timeout=5, period=2), np.arange(6, 16))
+        # returned when the last sample landed, before the next chunk 10 ms later
+        self.assertLess(buf.count, 21)
+        np.testing.assert_array_equal(buf.wait_for(3, since=16, timeout=5), np.arange(16, 19))
+        np.testing.assert_array_equal(buf.wait_for(8, since=17, timeout=5, period=8), np.arange(24, 32))
+        thread.join()
+        # already appended, no wait
+        np.testing.assert_array_equal(buf.wait_for(4, since=40, timeout=0), np.arange(40, 44))
+
+    def test_wait_for_timeout(self):
+        buf = RingBuffer(length=64)
+        t = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            buf.wait_for(10, timeout=0.05)
+        self.assertLess(time.monotonic() - t, 0.5)
+        with self.assertRaises(ValueError):
+            buf.wait_for(65)
+
+    def test_concurrent_readers(self):
+        buf = RingBuffer(length=4096)
+        total = 1 << 20
+        errors = list()
+
+        def writer():
+            for i in range(0, total, 1000):
+                buf.append_bulk(np.arange(i, min(i + 1000, total), dtype=np.float64))
+
+        def reader():
+            while buf.count < total:
+                count = buf.count
+                try:
+                    block = buf.get_slice(max(count - 512, 0), count)
+                except IndexError:
+                    # lapped by the writer, which is allowed
+                    continue
+                if not np.array_equal(block, np.arange(count - len(block), count)):
+                    errors.append(count)
+
+        threads = [Thread(target=reader) for _ in range(3)] + [Thread(target=writer)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        np.testing.assert_array_equal(buf.latest(4096), np.arange(total - 4096, total))
+
+
+if __name__ == '__main__':
+    unittest.main()
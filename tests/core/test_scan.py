@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_scan.py:
+
+Tests compiling scan plans and running them with the scan executor, through the adapters of the scan decorators
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import time
+import unittest
+
+import numpy as np
+
+from labctrl.components.filter_wheels.utils import calculate_rate as calculate_angular_rate
+from labctrl.components.linear_stages.utils import calculate_rate
+from labctrl.methods.scan import Axis, ScanPlan, ScanExecutor, nest
+
+
+class FakeLabStat:
+    """stat and messages of LabStat, without the front panel"""
+
+    def __init__(self) -> None:
+        self.stat = dict()
+        self.msg_list = list()
+
+    def expmsg(self, t: str) -> None:
+        self.msg_list.append(t)
+
+
+class TestScan(unittest.TestCase):
+    def setUp(self):
+        self.lstat = FakeLabStat()
+        self.moves = list()
+
+    def axis(self, name, positions, **kwargs):
+        return Axis(name, positions, move=lambda pos: self.moves.append((name, pos)), **kwargs)
+
+    def test_raster(self):
+        plan = ScanPlan([self.axis("pp", [0.0, 1.0]), self.axis("ft", [10, 20, 30])])
+        points = plan.compile()
+        self.assertEqual(len(plan), 6)
+        self.assertEqual([p.indices for p in points], [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2)])
+        self.assertEqual(points[4].positions, (1.0, 20))
+        self.assertEqual([p.lasts[1] for p in points], [False, False, True] * 2)
+        self.assertEqual([p.number for p in points], list(range(6)))
+
+    def test_snake(self):
+        plan = ScanPlan([self.axis("basic", [0, 1], ordering="raster"), self.axis("pp", [0.0, 1.0]),
+                         self.axis("ft", [10, 20, 30])], ordering="snake")
+        points = plan.compile()
+        self.assertEqual([p.indices for p in points],
+                         [(0, 0, 0), (0, 0, 1), (0, 0, 2), (0, 1, 2), (0, 1, 1), (0, 1, 0),
+                          (1, 1, 0), (1, 1, 1), (1, 1, 2), (1, 0, 2), (1, 0, 1), (1, 0, 0)])
+        self.assertEqual([p.steps[2] for p in points[:6]], [0, 1, 2, 0, 1, 2])
+        self.assertTrue(points[5].lasts[2] and points[5].lasts[1])
+
+    def test_random(self):
+        axes = [self.axis("pp", range(4)), self.axis("ft", range(5))]
+        points = ScanPlan(axes, ordering="random", seed=1).compile()
+        self.assertEqual(sorted(p.indices for p in points), [(i, j) for i in range(4) for j in range(5)])
+        # every position of the inner axis once per step of the outer one
+        for i in range(0, 20, 5):
+            self.assertEqual(sorted(p.indices[1] for p in points[i:i + 5]), list(range(5)))
+        self.assertEqual([p.indices for p in points],
+                         [p.indices for p in ScanPlan(axes, ordering="random", seed=1).compile()])
+
+    def test_min_travel(self):
+        # unsorted, like an external file, reversed by the coordinate like a stage in Negative direction
+        inner = self.axis("ft", [3.0, 1.0, 2.0, 0.0], ordering="min_travel", coordinate=lambda pos: -pos)
+        points = ScanPlan([self.axis("pp", [0.0, 1.0, 2.0]), inner]).compile()
+        self.assertEqual([p.positions[1] for p in points],
+                         [3.0, 2.0, 1.0, 0.0, 0.0, 1.0, 2.0, 3.0, 3.0, 2.0, 1.0, 0.0])
+        self.assertEqual([p.indices[1] for p in points[:4]], [0, 2, 1, 3])
+        # the stage only flies between runs as far as needed, which is nowhere
+        self.assertEqual(ScanPlan([inner], ordering="min_travel").order(inner, 1, None, current=0.4), [3, 1, 2, 0])
+        self.assertEqual(ScanPlan([inner]).order(inner, 1, None, current=2.6), [0, 2, 1, 3])
+
+    def test_travel_time(self):
+        axis = self.axis("ft", [0.0, 1.0], speed=10.0, acceleration=100.0, coordinate=lambda pos: 2 * pos)
+        # too short to reach speed: accelerate half way, decelerate the other half
+        self.assertAlmostEqual(axis.travel_time(0.0, 0.25), 2 * (0.5 / 100) ** 0.5)
+        # 10 mm: 0.1 s to reach speed, 0.1 s to stop, 9 mm at speed
+        self.assertAlmostEqual(axis.travel_time(5.0, 0.0), 10 / 10 + 10 / 100)
+        self.assertEqual(self.axis("ft", [0.0]).travel_time(0.0, 1.0), 0.0)
+        self.assertEqual(Axis("ft", [0.0], speed=10.0).travel_time(0.0, 1.0), 0.0)
+
+    def test_driving_units(self):
+        # the stages configs give speeds in their own unit, the axis needs them in the unit of the positions
+        self.assertAlmostEqual(calculate_rate(500, "um/s", "mm"), 0.5)
+        self.assertAlmostEqual(calculate_rate(30, "mm/s^2", "um"), 30000)
+        self.assertAlmostEqual(calculate_angular_rate(np.pi, "radian/s", "degree"), 180)
+        self.assertAlmostEqual(calculate_angular_rate(60, "minute/s^2", "degree"), 1)
+        axis = self.axis("ft", [0.0], speed=calculate_rate(500, "um/s", "mm"))
+        self.assertAlmostEqual(axis.travel_time(0.0, 1.0), 2.0)
+
+    def test_estimate(self):
+        def axes():
+            return [self.axis("pp", [0.0, 10.0], speed=10.0),
+                    self.axis("ft", [0.0, 10.0, 20.0, 30.0], speed=10.0)]
+
+        raster = ScanPlan(axes())
+        snake = ScanPlan(axes(), ordering="snake")
+        # raster: 3 + 3 s along ft twice, 3 s back, 1 s along pp
+        self.assertAlmostEqual(raster.estimate(), 10.0)
+        self.assertAlmostEqual(snake.estimate(), 7.0)
+        self.assertAlmostEqual(snake.estimate(dwell=0.5), 11.0)
+        self.assertAlmostEqual(snake.estimate(snake.compile()[2:]), 5.0)
+
+    def test_unknown_ordering(self):
+        with self.assertRaises(ValueError):
+            ScanPlan([], ordering="spiral")
+
+    def test_executor(self):
+        plan = ScanPlan([self.axis("pp", [0.0, 1.0]), self.axis("ft", [10, 20])], ordering="snake")
+        seen = list()
+
+        def operation(meta=dict()):
+            seen.append((self.lstat.stat["pp"]["iDelay"], self.lstat.stat["ft"]["iDelay"],
+                         self.lstat.stat["ft"]["Delay"]))
+
+        executor = ScanExecutor(self.lstat)
+        self.assertEqual(executor.run(plan, operation), 4)
+        self.assertEqual(seen, [(0, 0, 10), (0, 1, 20), (1, 1, 20), (1, 0, 10)])
+        self.assertEqual(self.lstat.stat["ft"]["iStep"], 1)
+        self.assertTrue(self.lstat.stat["ft"]["LastStep"] and self.lstat.stat["pp"]["LastStep"])
+        # only axes whose position changed are moved, ft stays at 20 when pp steps
+        self.assertEqual(self.moves, [("pp", 0.0), ("ft", 10), ("ft", 20), ("pp", 1.0), ("ft", 10)])
+
+    def test_terminate_and_resume(self):
+        plan = ScanPlan([self.axis("pp", [0.0, 1.0]), self.axis("ft", [10, 20, 30])])
+        meta = dict(TERMINATE=False)
+        seen = list()
+
+        def operation(meta=dict()):
+            seen.append((self.lstat.stat["pp"]["iDelay"], self.lstat.stat["ft"]["iDelay"]))
+            if len(seen) == 4:
+                meta["TERMINATE"] = True
+
+        executor = ScanExecutor(self.lstat)
+        self.assertEqual(executor.run(plan, operation, meta), 4)
+        meta["TERMINATE"] = False
+        self.moves.clear()
+        self.assertEqual(executor.run(plan, operation, meta, start=executor.next), 6)
+        self.assertEqual(seen, [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2)])
+        # every axis is moved to the point resumed from
+        self.assertEqual(self.moves[:2], [("pp", 1.0), ("ft", 20)])
+
+    def test_pipeline(self):
+        plan = ScanPlan([self.axis("pp", [0.0, 1.0]), self.axis("ft", [10, 20, 30, 40])], ordering="snake")
+        processed = list()
+        pending = list()
+        depths = list()
+
+        def operation(meta=dict()):
+            time.sleep(0.02)  # acquire
+            i = (self.lstat.stat["pp"]["iDelay"], self.lstat.stat["ft"]["iDelay"])
+            pending.append(i)
+            depths.append(len(pending))
+
+            def process():
+                time.sleep(0.02)
+                processed.append(i)
+                pending.remove(i)
+
+            return process
+
+        t = time.monotonic()
+        self.assertEqual(ScanExecutor(self.lstat).run(plan, operation, pipeline=2), 8)
+        pipelined = time.monotonic() - t
+        # every point processed, in the order of the points, before the scan returns
+        self.assertEqual(processed, [p.indices for p in plan.compile()])
+        # at most 2 pending, plus the one just acquired
+        self.assertLessEqual(max(depths), 3)
+        processed.clear()
+        pending.clear()
+        t = time.monotonic()
+        ScanExecutor(self.lstat).run(plan, operation)
+        serial = time.monotonic() - t
+        self.assertEqual(processed, [p.indices for p in plan.compile()])
+        self.assertEqual(max(depths[8:]), 1)
+        # processing overlapped with acquisition
+        self.assertLess(pipelined, 0.8 * serial)
+
+    def test_pipeline_error(self):
+        plan = ScanPlan([self.axis("ft", range(10))])
+        seen = list()
+
+        def operation(meta=dict()):
+            i = self.lstat.stat["ft"]["iDelay"]
+            seen.append(i)
+
+            def process():
+                if i == 2:
+                    raise RuntimeError("process failed")
+                time.sleep(0.01)
+
+            return process
+
+        executor = ScanExecutor(self.lstat)
+        with self.assertRaises(RuntimeError):
+            executor.run(plan, operation, pipeline=1)
+        # stopped soon after the failed point, not at the end of the scan
+        self.assertLess(len(seen), 10)
+
+    def test_nest(self):
+        rounds = 2
+
+        def scan_round(func):
+            return nest(lambda: Axis("basic", range(rounds), value_key="Round", index_key="iRound",
+                                     ordering="raster"), func, self.lstat)
+
+        def scan_range(name, positions):
+            def decorator(func):
+                return nest(lambda: self.axis(name, positions), func, self.lstat)
+            return decorator
+
+        seen = list()
+
+        @scan_round
+        @scan_range("pp", [0.0, 1.0])
+        @scan_range("ft", [10, 20, 30])
+        def unit_operation(meta=dict()):
+            stat = self.lstat.stat
+            seen.append((stat["basic"]["iRound"], stat["pp"]["iDelay"], stat["ft"]["iDelay"]))
+
+        plan = unit_operation.plan()
+        self.assertEqual([axis.name for axis in plan.axes], ["basic", "pp", "ft"])
+        self.assertEqual(len(plan.compile()), 12)
+        self.assertEqual(unit_operation(meta=dict(TERMINATE=False)), 12)
+        self.assertEqual(seen[:4], [(0, 0, 0), (0, 0, 1), (0, 0, 2), (0, 1, 0)])
+        # axes are built when the scan starts, from the configs of that time
+        rounds = 1
+        unit_operation.ordering = "snake"
+        seen.clear()
+        unit_operation(meta=dict(TERMINATE=False))
+        self.assertEqual(seen, [(0, 0, 0), (0, 0, 1), (0, 0, 2), (0, 1, 2), (0, 1, 1), (0, 1, 0)])
+        self.assertEqual(unit_operation.pipeline, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
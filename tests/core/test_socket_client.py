@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""
+test_socket_client.py:
+
+Tests the socket API client against the generic boxcar emulator
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import os
+import sys
+import unittest
+from threading import Thread, Event
+
+import numpy as np
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from labctrl.remote_client import remote_client
+from labctrl.components.socket_client import SocketClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "servers", "lockin_and_boxcars",
+                                "generic_boxcar"))
+import boxcar_emulator  # noqa: E402
+sys.path.pop(0)
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class TestSocketClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = make_server("127.0.0.1", 0, boxcar_emulator.app, threaded=True,
+                                 request_handler=QuietRequestHandler)
+        cls.thread = Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        remote_client.close()
+        cls.server.shutdown()
+        cls.thread.join()
+
+    def setUp(self):
+        self.client = SocketClient({"Host": "127.0.0.1", "Port": self.server.server_port})
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_topics(self):
+        self.assertEqual(self.client.topics, ["boxcar_data", "PWA_data"])
+        with self.assertRaises(ValueError):
+            self.client.subscribe("no_such_topic")
+
+    def test_subscribe_receive(self):
+        self.client.subscribe("boxcar_data")
+        for _ in range(3):
+            result = self.client.receive("boxcar_data", timeout=2)
+            self.assertIsNotNone(result)
+            self.assertTrue(result["success"])
+            self.assertEqual(result["result"].dtype, np.float64)
+            self.assertEqual(result["result"].shape, (1000,))
+        self.client.unsubscribe("boxcar_data")
+
+    def test_subscribe_callback(self):
+        received = Event()
+        self.client.subscribe("boxcar_data", callback=lambda result: received.set())
+        self.assertTrue(received.wait(2))
+
+    def test_command(self):
+        result = self.client.command("setADCSampleNumber/8", timeout=2)
+        self.assertEqual(result, {"success": True, "message": "ADC Sample Number Set", "target": 8})
+        # binary replies of the REST API arrive as arrays
+        result = self.client.command("getPWAData", timeout=2)
+        self.assertEqual(result["result"].shape, (1000,))
+
+    def test_commands_in_order(self):
+        futures = [self.client.command_async("setADCSampleNumber/{}".format(i)) for i in range(20)]
+        self.assertEqual([f.result(2)["target"] for f in futures], list(range(20)))
+
+    def test_close_fails_pending(self):
+        self.client.close()
+        with self.assertRaises(ConnectionError):
+            self.client.command("setADCSampleNumber/8", timeout=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
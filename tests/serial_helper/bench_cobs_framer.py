@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+"""bench_cobs_framer.py:
+This benchmark module measures COBSFramer throughput when 64 KiB binary payloads arrive split into reads of
+1 byte to 4 KiB.
+
+The framer is driven directly with process_stream, so no threads or mocked ports are involved and only the framing
+cost is measured. The old accumulate-and-split algorithm is measured as a reference for the larger read sizes, it is
+quadratic in the number of reads per frame and too slow to run with tiny reads.
+
+Run with:
+    python -m unittest tests.serial_helper.bench_cobs_framer
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import unittest
+
+import random
+import time
+import logging
+
+from cobs import cobs
+
+from serial_helper import SerialManager, COBSFramer
+from logging_helper import TestingLogFormatter
+
+
+# configure root logger to output all logs to stdout
+lg = logging.getLogger()
+lg.setLevel(logging.INFO)
+ch = logging.StreamHandler()
+ch.setLevel(logging.INFO)
+ch.setFormatter(TestingLogFormatter())
+lg.addHandler(ch)
+# configure logger for this module.
+lg = logging.getLogger(__name__)
+
+PAYLOAD_SIZE = 64 * 1024
+READ_SIZES = (1, 16, 256, 4096)
+REFERENCE_READ_SIZES = (256, 4096)
+BYTES_PER_RUN = 2 * 1024 * 1024
+
+
+def split_stream(stream: bytes, read_size: int) -> list[bytes]:
+    return [stream[i:i+read_size] for i in range(0, len(stream), read_size)]
+
+
+class SplitFramer:
+    """
+    The accumulate-and-split algorithm used by COBSFramer before the stream buffer was introduced, for reference.
+    """
+
+    def __init__(self) -> None:
+        self.stream_content = b''
+        self.received_packets = []
+
+    def process_stream(self, msg: bytes):
+        self.stream_content += msg
+        encoded_packets = self.stream_content.split(b'\x00')
+        for i in range(len(encoded_packets)-1):
+            if encoded_packets[i]:
+                self.received_packets.append(cobs.decode(encoded_packets[i]))
+        self.stream_content = encoded_packets[-1]
+
+
+class BenchCOBSFramer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        random.seed(0)
+        cls.payload = random.randbytes(PAYLOAD_SIZE)
+        n_frames = max(1, BYTES_PER_RUN // PAYLOAD_SIZE)
+        cls.n_frames = n_frames
+        cls.stream = (cobs.encode(cls.payload) + b'\x00') * n_frames
+
+    def run_framer(self, framer, read_size: int, get_frames) -> float:
+        """
+        Returns throughput in MB/s
+        """
+        chunks = split_stream(self.stream, read_size)
+        t0 = time.perf_counter()
+        for chunk in chunks:
+            framer.process_stream(chunk)
+        t1 = time.perf_counter()
+        frames = get_frames()
+        self.assertEqual(len(frames), self.n_frames)
+        self.assertEqual(frames[-1], self.payload)
+        return len(self.stream) / (t1 - t0) / 1e6
+
+    def test_throughput(self):
+        lg.debug("==== START bench COBSFramer throughput ====")
+        for read_size in READ_SIZES:
+            framer = COBSFramer(SerialManager("COM1"))
+
+            def get_frames():
+                frames = []
+                while framer.received_packets.qsize():
+                    frames.append(framer.receive_frame())
+                return frames
+            mbps = self.run_framer(framer, read_size, get_frames)
+            lg.info("COBSFramer, {} bytes payload, {} bytes per read: {:.2f} MB/s".format(
+                PAYLOAD_SIZE, read_size, mbps))
+        for read_size in REFERENCE_READ_SIZES:
+            framer = SplitFramer()
+            mbps = self.run_framer(framer, read_size, lambda: framer.received_packets)
+            lg.info("Reference split framer, {} bytes payload, {} bytes per read: {:.2f} MB/s".format(
+                PAYLOAD_SIZE, read_size, mbps))
+
+
+if __name__ == '__main__':
+    unittest.main()
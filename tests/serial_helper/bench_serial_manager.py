@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""bench_serial_manager.py:
+This benchmark module measures the CPU time consumed by the SerialManager read thread for every MB received from a
+mocked stream, in each read mode.
+
+The CPU time is taken from the per-thread CPU clock of the read thread, so the time spent by SerialMocker threads
+generating the stream is not counted. Per-thread CPU clocks are only available on POSIX systems.
+
+Run with:
+    python -m unittest tests.serial_helper.bench_serial_manager
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import unittest
+
+import time
+import logging
+
+from serial_helper import SerialManager, SerialMocker
+from logging_helper import TestingLogFormatter
+
+
+# configure root logger to output all logs to stdout
+lg = logging.getLogger()
+lg.setLevel(logging.INFO)
+ch = logging.StreamHandler()
+ch.setLevel(logging.INFO)
+ch.setFormatter(TestingLogFormatter())
+lg.addHandler(ch)
+# configure logger for this module.
+lg = logging.getLogger(__name__)
+
+BENCH_DURATION = 3.0
+BENCH_IDLE_DURATION = 1.0
+
+
+def thread_cpu_time(ident: int) -> float:
+    """
+    Returns CPU time consumed by the thread with given ident, unit in s.
+    """
+    return time.clock_gettime(time.pthread_getcpuclockid(ident))
+
+
+@unittest.skipUnless(hasattr(time, "pthread_getcpuclockid"), "per-thread CPU clock not available")
+class BenchSerialManagerReadModes(unittest.TestCase):
+    def run_read_mode(self, baudrate: int, read_mode: str, poll_interval: float) -> tuple[float, float]:
+        """
+        Streams mocked data at given baudrate for BENCH_DURATION seconds, then stays idle for BENCH_IDLE_DURATION
+        seconds.
+        Returns (cpu seconds per MB received, cpu seconds per second when idle)
+        """
+        ser = SerialMocker("COM1", timeout=0.1, baudrate=baudrate,
+                           mock_stream_content=bytes(range(256)), mock_stream_bps=0)
+        mgr = SerialManager("COM1", baudrate=baudrate, timeout=0.1,
+                            read_mode=read_mode, poll_interval=poll_interval)
+        mgr.ser = ser
+        mgr.start()
+        ident = mgr.serial_read_thread.ident
+        # streaming
+        cpu_0 = thread_cpu_time(ident)
+        ser.mock_stream_bps = baudrate
+        time.sleep(BENCH_DURATION)
+        ser.mock_stream_bps = 0
+        time.sleep(0.2)
+        cpu_1 = thread_cpu_time(ident)
+        bytes_received = 0
+        while mgr.received_queue.qsize():
+            _, msg = mgr.receive()
+            bytes_received += len(msg)
+        # idle
+        cpu_2 = thread_cpu_time(ident)
+        time.sleep(BENCH_IDLE_DURATION)
+        cpu_3 = thread_cpu_time(ident)
+        mgr.stop()
+        ser.close()
+        cpu_per_mb = (cpu_1 - cpu_0) / (bytes_received / 1e6)
+        cpu_idle = (cpu_3 - cpu_2) / BENCH_IDLE_DURATION
+        lg.info("baudrate={}, read_mode={}, poll_interval={}: {} bytes received, {:.3f} CPU s/MB, idle load {:.1%}".format(
+            baudrate, read_mode, poll_interval, bytes_received, cpu_per_mb, cpu_idle))
+        self.assertGreater(bytes_received, 0)
+        return cpu_per_mb, cpu_idle
+
+    def run_baudrate(self, baudrate: int):
+        lg.debug("==== START bench at {} baud ====".format(baudrate))
+        # poll_interval = 0 reproduces the busy-spinning loop
+        spin_per_mb, spin_idle = self.run_read_mode(baudrate, "polling", 0)
+        poll_per_mb, poll_idle = self.run_read_mode(baudrate, "polling", 0.001)
+        block_per_mb, block_idle = self.run_read_mode(baudrate, "blocking", 0.001)
+        lg.info("Summary at {} baud (CPU s/MB): spinning={:.3f}, polling={:.3f}, blocking={:.3f}".format(
+            baudrate, spin_per_mb, poll_per_mb, block_per_mb))
+        self.assertLess(block_idle, spin_idle)
+
+    def test_115200(self):
+        self.run_baudrate(115200)
+
+    def test_921600(self):
+        self.run_baudrate(921600)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""test_async_serial_manager.py:
+This test module tests AsyncSerialManager and async framers with SerialMocker, both through the event loop file
+descriptor path (SerialMocker with use_fileno) and through the executor path.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import unittest
+
+import asyncio
+import os
+import logging
+
+from serial_helper import SerialMocker, AsyncSerialManager, AsyncCOBSFramer, AsyncPatternFramer
+from logging_helper import TestingLogFormatter
+
+
+# configure root logger to output all logs to stdout
+lg = logging.getLogger()
+lg.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+ch.setFormatter(TestingLogFormatter())
+lg.addHandler(ch)
+# configure logger for this module.
+lg = logging.getLogger(__name__)
+
+
+def echoer(b: bytes) -> bytes:
+    lg.debug("Echoer received: {}".format(b))
+    return b
+
+
+class TestAsyncSerialManager(unittest.IsolatedAsyncioTestCase):
+    use_fileno = os.name == 'posix'
+
+    async def asyncSetUp(self):
+        self.ser = SerialMocker("COM1", timeout=0.2, baudrate=115200,
+                                response_map={b'foo': b'bar'}, response_generator=echoer,
+                                use_fileno=self.use_fileno)
+        self.mgr = AsyncSerialManager("COM1", baudrate=115200, timeout=0.2)
+        # Replace the mgr.ser with a mocking ser!
+        self.mgr.ser = self.ser
+        await self.mgr.start()
+
+    async def asyncTearDown(self):
+        await self.mgr.stop()
+
+    async def test_command_and_response(self):
+        lg.debug("==== START test_command_and_response ====")
+        self.assertEqual(self.mgr.read_fd is not None, self.use_fileno)
+        n = await self.mgr.send(b'foo')
+        self.assertEqual(n, 3)
+        t, result = await self.mgr.receive(timeout=1.0)
+        lg.info("Read result: {}, received time: {}".format(result, t))
+        self.assertIsNotNone(t)
+        # the response may be split into several messages
+        while len(result) < 3:
+            _, msg = await self.mgr.receive(timeout=1.0)
+            result += msg
+        self.assertEqual(result, b'bar')
+
+    async def test_receive_timeout(self):
+        lg.debug("==== START test_receive_timeout ====")
+        t, result = await self.mgr.receive(timeout=0.1)
+        self.assertIsNone(t)
+        self.assertIsNone(result)
+
+    async def test_concurrent_send(self):
+        lg.debug("==== START test_concurrent_send ====")
+        lg.info("Sending 20 messages concurrently, they should be written in order.")
+        await asyncio.gather(*(self.mgr.send('echo {:02d};'.format(i).encode()) for i in range(20)))
+        expected = b''.join('echo {:02d};'.format(i).encode() for i in range(20))
+        received = b''
+        while len(received) < len(expected):
+            _, msg = await self.mgr.receive(timeout=1.0)
+            self.assertIsNotNone(msg)
+            received += msg
+        self.assertEqual(received, expected)
+
+    async def test_cobs_framer(self):
+        lg.debug("==== START test_cobs_framer ====")
+        framer = AsyncCOBSFramer(self.mgr)
+        await framer.send_frame(b'Hello\x00World!')
+        await framer.send_frame(b'\x00\x00')
+        r = await framer.receive_frame(timeout=1.0)
+        self.assertEqual(r, b'Hello\x00World!')
+        r = await framer.receive_frame(timeout=1.0)
+        self.assertEqual(r, b'\x00\x00')
+        r = await framer.receive_frame(timeout=0.1)
+        self.assertIsNone(r)
+        self.assertEqual(framer.counters["frames_received"], 2)
+        self.assertEqual(framer.counters["decode_errors"], 0)
+
+    async def test_pattern_framer_iteration(self):
+        lg.debug("==== START test_pattern_framer_iteration ====")
+        framer = AsyncPatternFramer(self.mgr, b'\xA5\x5A\xC3\x3C')
+        for i in range(5):
+            await framer.send_frame(bytes([i]) * i)
+        frames = []
+        async for frame in framer:
+            frames.append(frame)
+            if len(frames) == 5:
+                break
+        self.assertEqual(frames, [bytes([i]) * i for i in range(5)])
+        self.assertEqual(framer.counters["frames_accepted"], 5)
+
+    async def test_bounded_queue_policy(self):
+        lg.debug("==== START test_bounded_queue_policy ====")
+        lg.info("A bounded 'block' queue would block the event loop, it is refused.")
+        with self.assertRaises(ValueError):
+            AsyncCOBSFramer(self.mgr, queue_size=2)
+        with self.assertRaises(ValueError):
+            AsyncPatternFramer(self.mgr, b'\xA5\x5A\xC3\x3C', queue_size=2, queue_policy="block")
+        framer = AsyncCOBSFramer(self.mgr, queue_size=2, queue_policy="drop_oldest")
+        # more frames in one read than the queue holds
+        await self.mgr.send(b''.join(framer.parser.encode_frame(bytes([i])) for i in range(1, 6)))
+        frames = []
+        while (r := await framer.receive_frame(timeout=0.3)) is not None:
+            frames.append(r)
+        # the oldest frames of a read may be dropped, never the latest
+        self.assertEqual(frames[-1], b'\x05')
+        self.assertEqual(len(frames) + framer.parser.received_packets.dropped, 5)
+
+
+class TestAsyncSerialManagerExecutor(TestAsyncSerialManager):
+    use_fileno = False
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+"""test_bounded_queue.py:
+This test module tests the policies of BoundedQueue, and bounded queues in SerialManager and framers.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import unittest
+
+import logging
+import time
+from queue import Full
+from threading import Thread
+
+from serial_helper import BoundedQueue, SerialManager, SerialMocker, COBSFramer, PatternFramer, RecordFramer
+from logging_helper import TestingLogFormatter
+
+
+# configure root logger to output all logs to stdout
+lg = logging.getLogger()
+lg.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+ch.setFormatter(TestingLogFormatter())
+lg.addHandler(ch)
+# configure logger for this module.
+lg = logging.getLogger(__name__)
+
+
+def drain(q: BoundedQueue) -> list:
+    items = []
+    while q.qsize():
+        items.append(q.get())
+        q.task_done()
+    return items
+
+
+class TestBoundedQueue(unittest.TestCase):
+    def test_block(self):
+        q = BoundedQueue(2, "block")
+        q.put(0)
+        q.put(1)
+        with self.assertRaises(Full):
+            q.put(2, timeout=0.05)
+        Thread(target=lambda: (time.sleep(0.1), q.get())).start()
+        q.put(2, timeout=1.0)
+        self.assertEqual(q.dropped, 0)
+
+    def test_drop_oldest(self):
+        q = BoundedQueue(3, "drop_oldest")
+        for i in range(10):
+            q.put(i)
+        self.assertEqual(q.dropped, 7)
+        self.assertEqual(drain(q), [7, 8, 9])
+        # discarded items are done, join returns at once.
+        q.join()
+
+    def test_drop_newest(self):
+        q = BoundedQueue(3, "drop_newest")
+        for i in range(10):
+            q.put_nowait(i)
+        self.assertEqual(q.dropped, 7)
+        self.assertEqual(drain(q), [0, 1, 2])
+
+    def test_latest(self):
+        q = BoundedQueue(policy="latest")
+        for i in range(10):
+            q.put(i)
+        self.assertEqual(q.get(), 9)
+        self.assertEqual(q.qsize(), 0)
+
+    def test_force_put_and_clear(self):
+        q = BoundedQueue(2, "drop_newest")
+        q.put(0)
+        q.put(1)
+        q.force_put(None)
+        self.assertEqual(q.qsize(), 3)
+        self.assertEqual(q.clear(), 3)
+        q.join()
+
+    def test_put_while(self):
+        q = BoundedQueue(1, "block")
+        self.assertTrue(q.put_while(0, lambda: True))
+        running = [True]
+        Thread(target=lambda: (time.sleep(0.15), running.clear())).start()
+        t = time.monotonic()
+        self.assertFalse(q.put_while(1, lambda: bool(running), step=0.05))
+        self.assertLess(time.monotonic() - t, 1.0)
+        self.assertEqual(q.dropped, 1)
+        self.assertEqual(drain(q), [0])
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            BoundedQueue(2, "drop_random")
+
+
+class TestBoundedSerialQueues(unittest.TestCase):
+    def test_stalled_consumer(self):
+        lg.debug("==== START test_stalled_consumer ====")
+        lg.info("Nobody consumes frames, only the latest 4 frames should be kept.")
+        ser = SerialMocker("COM1", timeout=0.1, baudrate=115200, bulk=True, response_generator=lambda x: x)
+        mgr = SerialManager("COM1", timeout=0.1, received_queue_size=16, received_queue_policy="drop_oldest",
+                            send_queue_size=16, send_queue_policy="drop_newest")
+        mgr.ser = ser
+        framer = COBSFramer(mgr, queue_size=4, queue_policy="drop_oldest")
+        framer.start()
+        for i in range(20):
+            framer.send_frame(i.to_bytes(2, 'big'), timeout=1.0)
+        time.sleep(0.3)
+        framer.stop()
+        self.assertEqual(framer.received_packets.qsize(), 4)
+        self.assertEqual(framer.counters["queue_dropped"], 16)
+        self.assertEqual(framer.receive_frame(timeout=0.1), (16).to_bytes(2, 'big'))
+        self.assertEqual(mgr.counters["send_dropped"], 0)
+
+    def test_stop_with_full_blocking_queue(self):
+        lg.debug("==== START test_stop_with_full_blocking_queue ====")
+        lg.info("Nobody consumes messages from a full 'block' queue, stop should still return.")
+        ser = SerialMocker("COM1", timeout=0.1, baudrate=115200, bulk=True)
+        mgr = SerialManager("COM1", timeout=0.1, received_queue_size=1, received_queue_policy="block")
+        mgr.ser = ser
+        mgr.start()
+        for i in range(3):
+            ser.feed(bytes([i]))
+            time.sleep(0.2)
+        # the read thread is waiting for room for the second message
+        self.assertEqual(mgr.received_queue.qsize(), 1)
+        stopping = Thread(target=mgr.stop)
+        stopping.start()
+        stopping.join(timeout=5.0)
+        self.assertFalse(stopping.is_alive())
+        self.assertEqual(mgr.receive(timeout=0.1)[1], b'\x00')
+        self.assertGreaterEqual(mgr.counters["received_dropped"], 1)
+
+    def test_framers_stop_with_full_blocking_queue(self):
+        lg.debug("==== START test_framers_stop_with_full_blocking_queue ====")
+        lg.info("Nobody consumes frames from a full 'block' queue of a framer, stop should still return.")
+        framers = [lambda mgr: COBSFramer(mgr, queue_size=1, queue_policy="block"),
+                   lambda mgr: PatternFramer(mgr, b'\xAA\x55', queue_size=1, queue_policy="block"),
+                   lambda mgr: RecordFramer(mgr, 2, batch_size=1, queue_size=1, queue_policy="block")]
+        for make_framer in framers:
+            ser = SerialMocker("COM1", timeout=0.1, baudrate=115200, bulk=True)
+            mgr = SerialManager("COM1", timeout=0.1)
+            mgr.ser = ser
+            framer = make_framer(mgr)
+            # records of RecordFramer are raw bytes, the others frame messages
+            encode = getattr(framer, "encode_frame", lambda msg: msg + b'\x00')
+            with self.subTest(framer=type(framer).__name__):
+                framer.start()
+                for i in range(3):
+                    ser.feed(encode(bytes([i + 1])))
+                    time.sleep(0.2)
+                # the framer thread is waiting for room for the second frame
+                self.assertEqual(framer.received_packets.qsize(), 1)
+                stopping = Thread(target=framer.stop)
+                stopping.start()
+                stopping.join(timeout=5.0)
+                self.assertFalse(stopping.is_alive())
+                self.assertGreaterEqual(framer.received_packets.dropped, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -161,3 +161,16 @@ class TestCOBSFramer(unittest.TestCase):
         lg.info("Content of stream: {}".format(self.framer.stream_content))
         self.assertEqual(self.framer.received_packets.qsize(), 0)
         self.assertEqual(self.framer.stream_content, b'')
+
+    def test_large_frame_in_small_chunks(self):
+        lg.debug("==== START test_large_frame_in_small_chunks ====")
+        lg.info("Sending a 8 KiB binary frame with serial manager, seperated in 100 bytes messages.")
+        lg.info("The framer should grow its stream buffer and combine them into one packet.")
+        payload = bytes(i % 7 for i in range(8192))
+        packet = cobs.encode(payload) + b'\x00'
+        for i in range(0, len(packet), 100):
+            self.mgr.send(packet[i:i+100])
+        r = self.framer.receive_frame(timeout=2.0)
+        lg.info("Received: {} bytes".format(len(r)))
+        self.assertEqual(r, payload)
+        self.assertEqual(self.framer.stream_content, b'')
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""test_pattern_framer.py:
+This test module tests the PatternFramer class by a serial echoer, and by feeding corrupted streams to the framer
+directly.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import unittest
+
+import struct
+import logging
+
+from serial_helper import SerialManager, SerialMocker, PatternFramer
+from logging_helper import TestingLogFormatter
+
+
+# configure root logger to output all logs to stdout
+lg = logging.getLogger()
+lg.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+ch.setFormatter(TestingLogFormatter())
+lg.addHandler(ch)
+# configure logger for this module.
+lg = logging.getLogger(__name__)
+
+PATTERN = b'\xA5\x5A\xC3\x3C'
+
+
+def make_frame(msg: bytes) -> bytes:
+    return struct.pack('>1H', len(msg)) + msg + PATTERN
+
+
+class TestPatternFramer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        def echoer(b: bytes) -> bytes:
+            lg.debug("Pattern Echoer received: {}".format(b))
+            return b
+        lg.info("Constructing echoer SerialMocker object.")
+        cls.ser = SerialMocker("COM1", timeout=1, baudrate=115200,
+                               response_generator=echoer)
+        cls.mgr = SerialManager("COM1", baudrate=115200, timeout=1)
+        # Replace the mgr.ser with a mocking ser!
+        cls.mgr.ser = cls.ser
+        cls.framer = PatternFramer(cls.mgr, PATTERN)
+        cls.framer.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        lg.info("Stopping SerialManager service")
+        cls.framer.stop()
+
+    def test_send_frame(self):
+        lg.debug("==== START test_send_frame ====")
+        lg.info("Sending b'Hello'")
+        self.framer.send_frame(b'Hello')
+        r = self.framer.receive_frame(timeout=0.2)
+        lg.info("Received: {}".format(r))
+        self.assertEqual(r, b'Hello')
+
+    def test_pattern_in_content(self):
+        lg.debug("==== START test_pattern_in_content ====")
+        lg.info("Sending a frame that contains the pattern in its content, seperated in two messages.")
+        lg.info("The framer should not cut the frame at the pattern inside content.")
+        msg = b'Hello' + PATTERN + b'World!'
+        frame = make_frame(msg)
+        self.mgr.send(frame[:6])
+        self.mgr.send(frame[6:])
+        r = self.framer.receive_frame(timeout=0.2)
+        lg.info("Received: {}".format(r))
+        self.assertEqual(r, msg)
+
+
+class TestPatternFramerResync(unittest.TestCase):
+    def setUp(self):
+        # garbage is likely to look like a very long frame, a tight max_msg_len lets the framer find out early.
+        self.framer = PatternFramer(SerialManager("COM1"), PATTERN, max_msg_len=1024)
+
+    def receive_all(self) -> list[bytes]:
+        frames = []
+        while self.framer.received_packets.qsize():
+            frames.append(self.framer.receive_frame())
+        return frames
+
+    def test_byte_by_byte(self):
+        lg.debug("==== START test_byte_by_byte ====")
+        stream = make_frame(b'Hello') + make_frame(b'') + make_frame(bytes(range(256)))
+        for i in range(len(stream)):
+            self.framer.process_stream(stream[i:i+1])
+        self.assertEqual(self.receive_all(), [b'Hello', b'', bytes(range(256))])
+        self.assertEqual(self.framer.counters["frames_accepted"], 3)
+        self.assertEqual(self.framer.stream_content, b'')
+
+    def test_corrupted_length(self):
+        lg.debug("==== START test_corrupted_length ====")
+        lg.info("The second frame has a wrong length, it should be dropped and the third frame should be kept.")
+        bad_frame = struct.pack('>1H', 3) + b'Hello' + PATTERN
+        self.framer.process_stream(make_frame(b'first') + bad_frame + make_frame(b'third'))
+        self.assertEqual(self.receive_all(), [b'first', b'third'])
+        counters = self.framer.counters
+        lg.info("Counters: {}".format(counters))
+        self.assertEqual(counters["frames_accepted"], 2)
+        self.assertEqual(counters["frames_dropped"], 1)
+        self.assertEqual(counters["frames_resynced"], 1)
+        self.assertEqual(counters["bytes_dropped"], len(bad_frame))
+
+    def test_garbage_between_frames(self):
+        lg.debug("==== START test_garbage_between_frames ====")
+        lg.info("Garbage without pattern arrives in many reads, framer should resync on the next pattern.")
+        self.framer.process_stream(make_frame(b'first'))
+        for _ in range(100):
+            self.framer.process_stream(b'\xFF\xFE\xA5')
+        self.framer.process_stream(PATTERN + make_frame(b'second'))
+        self.assertEqual(self.receive_all(), [b'first', b'second'])
+        self.assertEqual(self.framer.counters["frames_resynced"], 1)
+        self.assertEqual(self.framer.counters["bytes_dropped"], 300 + len(PATTERN))
+
+    def test_invalid_length(self):
+        lg.debug("==== START test_invalid_length ====")
+        lg.info("A length larger than max_msg_len is dropped without waiting for that many bytes.")
+        self.framer.process_stream(b'\xFF\xFF' + PATTERN + make_frame(b'Hello'))
+        self.assertEqual(self.receive_all(), [b'Hello'])
+        self.assertEqual(self.framer.counters["frames_dropped"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""test_record_framer.py:
+This test module tests the RecordFramer class by feeding records split in random reads, and by a mocked ADC stream.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import unittest
+
+import random
+import time
+import logging
+
+import numpy as np
+
+from serial_helper import SerialManager, SerialMocker, RecordFramer
+from logging_helper import TestingLogFormatter
+
+
+# configure root logger to output all logs to stdout
+lg = logging.getLogger()
+lg.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+ch.setFormatter(TestingLogFormatter())
+lg.addHandler(ch)
+# configure logger for this module.
+lg = logging.getLogger(__name__)
+
+N_SAMPLES = 512
+SCALE = 5 / 8388607
+
+
+class TestRecordFramer(unittest.TestCase):
+    def setUp(self):
+        self.framer = RecordFramer(SerialManager("COM1"), N_SAMPLES * 4, dtype='<i4', scale=SCALE)
+
+    def receive_all(self) -> np.ndarray:
+        batches = []
+        while self.framer.received_packets.qsize():
+            batches.append(self.framer.receive_batch())
+        return np.concatenate(batches)
+
+    def test_split_and_merged_reads(self):
+        lg.debug("==== START test_split_and_merged_reads ====")
+        lg.info("Feeding 20 records in random read sizes, every record should be decoded.")
+        random.seed(0)
+        raw = np.arange(20 * N_SAMPLES, dtype='<i4').reshape(20, N_SAMPLES) - 5000
+        stream = raw.tobytes()
+        i = 0
+        while i < len(stream):
+            n = random.randint(1, 3 * N_SAMPLES * 4)
+            self.framer.process_stream(stream[i:i+n])
+            i += n
+        decoded = self.receive_all()
+        self.assertEqual(decoded.shape, (20, N_SAMPLES))
+        np.testing.assert_allclose(decoded, raw * SCALE)
+        np.testing.assert_allclose(self.framer.latest_record, raw[-1] * SCALE)
+        self.assertEqual(self.framer.counters["records_received"], 20)
+
+    def test_resync_gap(self):
+        lg.debug("==== START test_resync_gap ====")
+        lg.info("An incomplete record followed by an idle gap should be dropped.")
+        self.framer = RecordFramer(SerialManager("COM1"), 8, dtype='<u2', resync_gap=0.05)
+        record = np.array([1, 2, 3, 4], dtype='<u2').tobytes()
+        self.framer.process_stream(b'\x00\x01\x02', time_ns=0)
+        self.framer.process_stream(record, time_ns=int(0.1e9))
+        self.framer.process_stream(record[:3], time_ns=int(0.11e9))
+        self.framer.process_stream(record[3:], time_ns=int(0.12e9))
+        decoded = self.receive_all()
+        np.testing.assert_array_equal(decoded, [[1, 2, 3, 4], [1, 2, 3, 4]])
+        self.assertEqual(self.framer.counters["bytes_dropped"], 3)
+
+    def test_callback(self):
+        lg.debug("==== START test_callback ====")
+        batches = []
+        self.framer = RecordFramer(SerialManager("COM1"), 4, dtype='<u2', scale=2.0, offset=1.0,
+                                   callback=lambda batch: batches.append(batch.copy()))
+        self.framer.process_stream(np.arange(6, dtype='<u2').tobytes())
+        self.assertEqual(self.framer.received_packets.qsize(), 0)
+        np.testing.assert_array_equal(batches[0], [[1, 3], [5, 7], [9, 11]])
+
+    def test_mocked_adc_stream(self):
+        lg.debug("==== START test_mocked_adc_stream ====")
+        lg.info("Streaming 12-bit ADC records at 921600 baud for 1 second, no record should be lost.")
+        raw = (np.arange(1024) % 4096).astype('<u2')
+        ser = SerialMocker("COM1", timeout=0.1, baudrate=921600,
+                           mock_stream_content=raw.tobytes(), mock_stream_bps=0)
+        mgr = SerialManager("COM1", baudrate=921600, timeout=0.1)
+        mgr.ser = ser
+        framer = RecordFramer(mgr, raw.nbytes, dtype='<u2', scale=3.3/4096)
+        framer.start()
+        ser.mock_stream_bps = 921600
+        time.sleep(1.0)
+        ser.mock_stream_bps = 0
+        time.sleep(0.2)
+        framer.stop()
+        ser.close()
+        n_bytes = ser.bytes_read
+        lg.info("{} bytes streamed, {} records decoded".format(n_bytes, framer.records_received))
+        self.assertEqual(framer.records_received, n_bytes // raw.nbytes)
+        np.testing.assert_allclose(framer.latest_record, raw * 3.3 / 4096)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""test_request_channel.py:
+This test module tests the RequestChannel class with a mocked COBS device that replies with the sequence ID of each
+request, sometimes out of order, and sometimes not at all.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import unittest
+
+import time
+import logging
+
+from cobs import cobs
+
+from serial_helper import SerialManager, SerialMocker, COBSFramer, RequestChannel
+from logging_helper import TestingLogFormatter
+
+
+# configure root logger to output all logs to stdout
+lg = logging.getLogger()
+lg.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+ch.setFormatter(TestingLogFormatter())
+lg.addHandler(ch)
+# configure logger for this module.
+lg = logging.getLogger(__name__)
+
+
+class MockedDevice:
+    """
+    Replies b'ACK:' + payload with the same sequence ID.
+    payload b'drop' is never replied, payload b'hold' is replied after the next request.
+    """
+
+    def __init__(self) -> None:
+        self.held = b''
+
+    def __call__(self, b: bytes) -> bytes:
+        response = b''
+        for encoded in b.split(b'\x00')[:-1]:
+            frame = cobs.decode(encoded)
+            seq, payload = frame[:2], frame[2:]
+            if payload == b'drop':
+                continue
+            reply = cobs.encode(seq + b'ACK:' + payload) + b'\x00'
+            if payload == b'hold':
+                self.held = reply
+                continue
+            response += reply + self.held
+            self.held = b''
+        return response
+
+
+class TestRequestChannel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        lg.info("Constructing mocked device.")
+        cls.ser = SerialMocker("COM1", timeout=1, baudrate=115200,
+                               response_generator=MockedDevice())
+        cls.mgr = SerialManager("COM1", baudrate=115200, timeout=1)
+        # Replace the mgr.ser with a mocking ser!
+        cls.mgr.ser = cls.ser
+        cls.channel = RequestChannel(COBSFramer(cls.mgr), max_outstanding=4, timeout=0.5)
+        cls.channel.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        lg.info("Stopping RequestChannel")
+        cls.channel.stop()
+
+    def test_request(self):
+        lg.debug("==== START test_request ====")
+        r = self.channel.request(b'Hello').result(timeout=1.0)
+        lg.info("Reply: {}".format(r))
+        self.assertEqual(r, b'ACK:Hello')
+
+    def test_pipelining(self):
+        lg.debug("==== START test_pipelining ====")
+        lg.info("Issuing 50 requests with at most 4 outstanding.")
+        futures = [self.channel.request('cmd {}'.format(i).encode()) for i in range(50)]
+        for i, future in enumerate(futures):
+            self.assertEqual(future.result(timeout=1.0), 'ACK:cmd {}'.format(i).encode())
+
+    def test_out_of_order_reply(self):
+        lg.debug("==== START test_out_of_order_reply ====")
+        lg.info("First reply arrives after the second one, both should be matched to their requests.")
+        f1 = self.channel.request(b'hold')
+        f2 = self.channel.request(b'second')
+        self.assertEqual(f2.result(timeout=1.0), b'ACK:second')
+        self.assertEqual(f1.result(timeout=1.0), b'ACK:hold')
+
+    def test_timeout(self):
+        lg.debug("==== START test_timeout ====")
+        t0 = time.monotonic()
+        future = self.channel.request(b'drop', timeout=0.2)
+        self.assertRaises(TimeoutError, future.result, 1.0)
+        lg.info("Timed out after {} s".format(time.monotonic() - t0))
+        lg.info("Other requests still work after a timeout.")
+        self.assertEqual(self.channel.request(b'Hello').result(timeout=1.0), b'ACK:Hello')
+        self.assertGreaterEqual(self.channel.counters["requests_timed_out"], 1)
+
+    def test_cancelled_request(self):
+        lg.debug("==== START test_cancelled_request ====")
+        lg.info("The reply to a cancelled request is discarded, the dispatcher keeps matching replies.")
+        held = self.channel.request(b'hold')
+        self.assertTrue(held.cancel())
+        expired = self.channel.request(b'drop', timeout=0.2)
+        self.assertTrue(expired.cancel())
+        # releases the reply of the cancelled request
+        self.assertEqual(self.channel.request(b'second').result(timeout=1.0), b'ACK:second')
+        time.sleep(0.4)
+        self.assertTrue(self.channel.dispatcher_thread.is_alive())
+        self.assertEqual(self.channel.request(b'Hello').result(timeout=1.0), b'ACK:Hello')
+        self.assertEqual(self.channel.counters["requests_outstanding"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""test_serial_hub.py:
+This test module tests SerialHub with many mocked ports, both registered with the selector (SerialMocker with use_fileno)
+and read in their own threads.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import unittest
+
+import os
+import logging
+import time
+
+from serial_helper import SerialMocker, SerialHub, COBSFramer, PatternFramer
+from logging_helper import TestingLogFormatter
+
+
+# configure root logger to output all logs to stdout
+lg = logging.getLogger()
+lg.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+ch.setFormatter(TestingLogFormatter())
+lg.addHandler(ch)
+# configure logger for this module.
+lg = logging.getLogger(__name__)
+
+N_PORTS = 8
+
+
+class TestSerialHub(unittest.TestCase):
+    use_fileno = os.name == 'posix'
+
+    def setUp(self):
+        self.hub = SerialHub()
+        self.framers = []
+        self.ports = []
+        for i in range(N_PORTS):
+            ser = SerialMocker("COM{}".format(i), timeout=0.1, baudrate=115200, bulk=True,
+                               response_generator=lambda x: x, use_fileno=self.use_fileno)
+            framer = COBSFramer(None) if i % 2 else PatternFramer(None, b'\xA5\x5A\xC3\x3C')
+            self.ports.append(self.hub.add_port(ser=ser, parser=framer))
+            self.framers.append(framer)
+        self.hub.start()
+
+    def tearDown(self):
+        self.hub.stop()
+
+    def test_echo_all_ports(self):
+        lg.debug("==== START test_echo_all_ports ====")
+        lg.info("Sending 20 frames to each of {} ports, every frame should come back to its own framer.".format(N_PORTS))
+        for j in range(20):
+            for i, framer in enumerate(self.framers):
+                framer.send_frame("port {} frame {}".format(i, j).encode())
+        for i, framer in enumerate(self.framers):
+            for j in range(20):
+                self.assertEqual(framer.receive_frame(timeout=1.0), "port {} frame {}".format(i, j).encode())
+        for port in self.ports:
+            self.assertEqual(port.counters["messages_sent"], 20)
+            self.assertEqual(port.counters["parser_errors"], 0)
+            self.assertEqual(port.read_fd is not None, self.use_fileno)
+
+    def test_raw_port_and_remove(self):
+        lg.debug("==== START test_raw_port_and_remove ====")
+        ser = SerialMocker("COM99", timeout=0.1, baudrate=115200, bulk=True,
+                           response_map={b'foo': b'bar'}, use_fileno=self.use_fileno)
+        port = self.hub.add_port(ser=ser)
+        port.send(b'foo', message_id=7)
+        _, msg_id = port.sent_id_queue.get(timeout=1.0)
+        self.assertEqual(msg_id, 7)
+        result = b''
+        while len(result) < 3:
+            t, msg = port.receive(timeout=1.0)
+            self.assertIsNotNone(t)
+            result += msg
+        self.assertEqual(result, b'bar')
+        self.hub.remove_port(port)
+        # receivers are woken up when the port is removed
+        self.assertEqual(port.receive(timeout=1.0), (None, None))
+        self.assertFalse(ser.is_open)
+
+
+class TestSerialHubThreaded(TestSerialHub):
+    use_fileno = False
+
+    def test_slow_write(self):
+        lg.debug("==== START test_slow_write ====")
+        lg.info("Writing 11520 bytes at 115200 baud to port 0 takes 0.8 s, the other ports should not wait for it.")
+        self.ports[0].send(b'0' * 11520)
+        time.sleep(0.05)
+        t = time.monotonic()
+        self.framers[1].send_frame(b'hello')
+        self.assertEqual(self.framers[1].receive_frame(timeout=1.0), b'hello')
+        self.assertLess(time.monotonic() - t, 0.4)
+        for port in self.ports:
+            self.assertIsNotNone(port.read_thread)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+"""test_serial_metrics.py:
+This test module tests the counters of SerialManager and COBSFramer, and their collection with MetricsRegistry.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import unittest
+
+import logging
+import time
+import urllib.request
+
+from serial_helper import SerialManager, SerialMocker, COBSFramer, MetricsRegistry, LatencyHistogram
+from logging_helper import TestingLogFormatter
+
+
+# configure root logger to output all logs to stdout
+lg = logging.getLogger()
+lg.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+ch.setFormatter(TestingLogFormatter())
+lg.addHandler(ch)
+# configure logger for this module.
+lg = logging.getLogger(__name__)
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_buckets(self):
+        h = LatencyHistogram(bounds=(0.001, 0.01, 0.1))
+        for v in (0.0005, 0.001, 0.005, 0.05, 1.0):
+            h.observe(v)
+        snapshot = h.snapshot()
+        self.assertEqual(snapshot["buckets"], [2, 3, 4, 5])
+        self.assertEqual(snapshot["count"], 5)
+        self.assertAlmostEqual(snapshot["sum"], 1.0565)
+
+
+class TestSerialMetrics(unittest.TestCase):
+    def setUp(self):
+        self.ser = SerialMocker("COM1", timeout=0.1, baudrate=115200, bulk=True,
+                                response_generator=lambda x: x)
+        self.mgr = SerialManager("COM1", baudrate=115200, timeout=0.1)
+        self.mgr.ser = self.ser
+        self.framer = COBSFramer(self.mgr)
+        self.registry = MetricsRegistry()
+        self.registry.register("COM1", self.mgr)
+        self.registry.register("COM1 framer", self.framer)
+        self.framer.start()
+
+    def tearDown(self):
+        self.framer.stop()
+        self.registry.stop_server()
+
+    def test_snapshot(self):
+        lg.debug("==== START test_snapshot ====")
+        for i in range(10):
+            self.framer.send_frame(b'Hello' * i, timeout=1.0)
+        # a malformed frame, the first code byte points beyond the delimiter
+        self.mgr.send(b'\x05\x01\x00')
+        for i in range(10):
+            self.assertEqual(self.framer.receive_frame(timeout=1.0), b'Hello' * i)
+        time.sleep(0.2)
+        snapshot = self.registry.snapshot()
+        lg.info("Snapshot: {}".format(snapshot))
+        mgr_metrics = snapshot["COM1"]
+        n_bytes = sum(len(self.framer.encode_frame(b'Hello' * i)) for i in range(10)) + 3
+        self.assertEqual(mgr_metrics["counters"]["bytes_sent"], n_bytes)
+        self.assertEqual(mgr_metrics["counters"]["messages_sent"], 11)
+        self.assertEqual(mgr_metrics["counters"]["bytes_received"], n_bytes)
+        self.assertGreater(mgr_metrics["rates"]["bytes_received"], 0)
+        self.assertEqual(mgr_metrics["gauges"]["to_send_queue_depth"], 0)
+        self.assertEqual(mgr_metrics["histograms"]["write_latency_seconds"]["count"], 11)
+        framer_metrics = snapshot["COM1 framer"]
+        self.assertEqual(framer_metrics["counters"], {"frames_received": 10, "decode_errors": 1, "queue_dropped": 0})
+        # no traffic since last snapshot
+        self.assertEqual(self.registry.snapshot()["COM1"]["rates"]["bytes_sent"], 0)
+
+    def test_prometheus_endpoint(self):
+        lg.debug("==== START test_prometheus_endpoint ====")
+        self.framer.send_frame(b'Hello', timeout=1.0)
+        self.assertEqual(self.framer.receive_frame(timeout=1.0), b'Hello')
+        self.registry.start_server(port=0)
+        url = "http://127.0.0.1:{}/metrics".format(self.registry.http_server.server_port)
+        with urllib.request.urlopen(url, timeout=1.0) as response:
+            text = response.read().decode()
+        lg.info("Metrics:\n{}".format(text))
+        self.assertIn('serial_bytes_sent_total{source="COM1"} 7', text)
+        self.assertIn('serial_frames_received_total{source="COM1 framer"} 1', text)
+        self.assertIn('serial_write_latency_seconds_bucket{source="COM1",le="+Inf"} 1', text)
+        self.assertEqual(text.count("# TYPE serial_write_latency_seconds histogram"), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+"""test_serial_mocker_bulk.py:
+This test module tests the bulk mode of SerialMocker, and the deterministic timings with a VirtualClock.
+"""
+
+__author__ = "Zhi Zi"
+__email__ = "x@zzi.io"
+__version__ = "20231123"
+
+import unittest
+
+import time
+import logging
+
+from serial_helper import SerialMocker, SerialManager, COBSFramer, VirtualClock
+from logging_helper import TestingLogFormatter
+
+
+# configure root logger to output all logs to stdout
+lg = logging.getLogger()
+lg.setLevel(logging.DEBUG)
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+ch.setFormatter(TestingLogFormatter())
+lg.addHandler(ch)
+# configure logger for this module.
+lg = logging.getLogger(__name__)
+
+
+class TestSerialMockerBulk(unittest.TestCase):
+    def setUp(self):
+        self.ser = SerialMocker("COM1", timeout=0.5, baudrate=921600, bulk=True,
+                                response_map={b'foo': b'bar'}, response_generator=lambda x: x,
+                                mock_stream_content=bytes(range(256)), mock_stream_bps=0)
+
+    def tearDown(self):
+        self.ser.close()
+
+    def test_command_and_response(self):
+        lg.debug("==== START test_command_and_response ====")
+        self.ser.write(b'foo')
+        self.assertEqual(self.ser.read(3), b'bar')
+        self.ser.write(b'echo')
+        self.assertEqual(self.ser.read(2), b'ec')
+        self.assertEqual(self.ser.read_all(), b'ho')
+
+    def test_read_timeout(self):
+        lg.debug("==== START test_read_timeout ====")
+        self.ser.write(b'abc')
+        t0 = time.monotonic()
+        result = self.ser.read(10)
+        t1 = time.monotonic()
+        self.assertEqual(result, b'abc')
+        self.assertAlmostEqual(t1 - t0, 0.5, delta=0.1)
+
+    def test_stream(self):
+        lg.debug("==== START test_stream ====")
+        lg.info("Streaming at 8 Mbps for 0.5 second, expecting around 500 kB.")
+        self.ser.mock_stream_bps = 8_000_000
+        received = bytearray()
+        t0 = time.monotonic()
+        while time.monotonic() - t0 < 0.5:
+            received += self.ser.read(max(1, self.ser.in_waiting))
+        self.ser.mock_stream_bps = 0
+        lg.info("Received {} bytes".format(len(received)))
+        self.assertGreater(len(received), 300_000)
+        self.assertEqual(bytes(received[:512]), bytes(range(256)) * 2)
+        self.assertEqual(self.ser.bytes_read, len(received))
+
+
+class TestSerialMockerVirtualClock(unittest.TestCase):
+    def setUp(self):
+        self.clock = VirtualClock()
+        self.ser = SerialMocker("COM1", timeout=1.0, baudrate=115200, clock=self.clock,
+                                response_map={b'foo': b'bar'},
+                                mock_stream_content=bytes(range(256)), mock_stream_bps=0,
+                                mock_stream_packet_size=64)
+
+    def tearDown(self):
+        self.ser.close()
+
+    def test_write_delay_and_timeout(self):
+        lg.debug("==== START test_write_delay_and_timeout ====")
+        self.ser.write(bytes(1440))
+        # 1440 bytes at 115200 baud take exactly 0.1 s
+        self.assertEqual(self.clock.time_ns(), 100_000_000)
+        self.assertEqual(self.ser.read(1), b'')
+        self.assertEqual(self.clock.time_ns(), 1_100_000_000)
+        self.ser.write(b'foo')
+        self.assertEqual(self.ser.read_all(), b'bar')
+
+    def test_stream_timing(self):
+        lg.debug("==== START test_stream_timing ====")
+        lg.info("Streaming 100 MB at 80 Mbps, which takes 10 s of virtual time.")
+        self.ser.mock_stream_bps = 80_000_000
+        t0 = time.monotonic()
+        n = 0
+        while n < 100_000_000:
+            chunk = self.ser.read(1_000_000)
+            self.assertEqual(len(chunk), 1_000_000)
+            n += len(chunk)
+        lg.info("Took {} s in real time".format(time.monotonic() - t0))
+        self.assertEqual(self.clock.time_ns(), 10_000_000_000)
+        self.assertEqual(chunk[-256:], bytes(range(256)))
+
+    def test_packet_arrival(self):
+        lg.debug("==== START test_packet_arrival ====")
+        self.ser.mock_stream_bps = 512_000
+        # one 64 bytes packet every 1 ms
+        self.assertEqual(self.ser.read(1), bytes(range(1)))
+        self.assertEqual(self.clock.time_ns(), 1_000_000)
+        self.assertEqual(self.ser.in_waiting, 63)
+        self.clock.advance(0.0105)
+        self.assertEqual(self.ser.in_waiting, 63 + 640)
+
+    def test_burst_message(self):
+        lg.debug("==== START test_burst_message ====")
+        self.ser.burst_message_interval = 0.25
+        self.ser.start_burst_message()
+        self.assertEqual(self.ser.read(6), b'foofoo')
+        self.assertEqual(self.clock.time_ns(), 500_000_000)
+        self.ser.stop_burst_message()
+        self.assertEqual(self.ser.read(3), b'')
+
+    def test_serial_manager_timestamps(self):
+        lg.debug("==== START test_serial_manager_timestamps ====")
+        lg.info("COBS frames of 254 bytes sent in bursts every 10 ms should be stamped exactly 10 ms apart.")
+        self.ser.timeout = 0.1
+        self.ser.burst_message_interval = 0.01
+        self.ser.burst_message_generator = lambda: b'\xff' + b'\x01' * 254 + b'\x00'
+        mgr = SerialManager("COM1", timeout=0.1, clock=self.clock)
+        mgr.ser = self.ser
+        framer = COBSFramer(mgr)
+        # schedule bursts before the read thread starts, or it advances the clock by read timeouts while idle.
+        self.ser.start_burst_message()
+        mgr.start()
+        timestamps = []
+        while len(timestamps) < 10:
+            t, msg = mgr.receive(timeout=1.0)
+            self.assertEqual(msg, b'\xff' + b'\x01' * 254 + b'\x00')
+            framer.process_stream(msg)
+            timestamps.append(t)
+        self.ser.stop_burst_message()
+        mgr.stop()
+        self.assertEqual(timestamps, [10_000_000 * (i + 1) for i in range(10)])
+        self.assertEqual(framer.received_packets.qsize(), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -51,6 +51,11 @@ foo1 = column(
     Div(text="Signal Generator Working Mode:"),
     tester.sg_bundle.working_mode,
     tester.sg_bundle.change_working_mode,
+    Div(text="Gain, Input Type and Timeout:"),
+    tester.sg_bundle.gain,
+    tester.sg_bundle.input_type,
+    tester.sg_bundle.timeout,
+    tester.sg_bundle.submit_config,
     tester.sg_bundle.waveform_file,
     tester.sg_bundle.update_waveform_button
 )